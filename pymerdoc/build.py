@@ -0,0 +1,396 @@
+"""Incremental HTML builds of Markdown documentation trees.
+
+`pymerdoc build` converts every Markdown file under a source directory to
+HTML, renders its Mermaid diagrams to SVG files and copies the local
+images it shows next to the pages. A manifest in the
+output directory maps each input's content hash, together with the
+mermaid version and theme, to the outputs built from it, so later builds
+only redo documents that changed and only render diagrams that have not
+been rendered before. With ``--watch`` the tree is polled and rebuilt as
+files change.
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import posixpath
+import shutil
+import sys
+import time
+from dataclasses import dataclass, field
+
+from pymerdoc import bundle, mermaid_parser
+from pymerdoc.core import document
+
+MANIFEST_NAME = ".pymerdoc-manifest.json"
+MANIFEST_VERSION = 2
+DIAGRAM_DIR = "_diagrams"
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>{title}</title>
+    <style>
+        body {{
+            max-width: 960px;
+            margin: 0 auto;
+            padding: 20px;
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+            line-height: 1.6;
+            color: #24292e;
+        }}
+        pre {{ background-color: #f6f8fa; padding: 16px; border-radius: 6px; overflow: auto; }}
+        code {{ font-family: SFMono-Regular, Consolas, 'Liberation Mono', Menlo, monospace; font-size: 85%; }}
+        .mermaid, .diagram {{ text-align: center; margin: 20px 0; }}
+        .diagram img {{ max-width: 100%; }}
+        .diagram-error {{ color: #cb2431; }}
+        table {{ border-collapse: collapse; margin: 15px 0; }}
+        th, td {{ border: 1px solid #ddd; padding: 8px; }}
+        th {{ background-color: #f6f8fa; }}
+    </style>
+{scripts}</head>
+<body>
+{body}
+</body>
+</html>
+'''
+
+CLIENT_SIDE_SCRIPTS = '''    <script src="{url}"></script>
+    <script>mermaid.initialize({{startOnLoad: true, theme: '{theme}'}});</script>
+'''
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def diagram_key(source, theme, mermaid_url):
+    """Cache key of a diagram: its structure, the mermaid it renders with and the theme"""
+    try:
+        return mermaid_parser.structure_key(source, mermaid_url, theme)[:20]
+    except mermaid_parser.MermaidSyntaxError:
+        # Let mermaid report the error, keyed by the exact source
+        return content_hash(f"{source}|{mermaid_url}|{theme}".encode())[:20]
+
+
+@dataclass
+class BuildReport:
+    built: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    failed: list = field(default_factory=list)
+    diagrams_rendered: int = 0
+    assets_copied: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def changed(self):
+        return bool(self.built or self.removed or self.failed or self.assets_copied)
+
+    def describe(self):
+        text = (f"Built {len(self.built)} document(s), rendered {self.diagrams_rendered} "
+                f"diagram(s), removed {len(self.removed)} in {self.seconds:.2f} s")
+        if self.assets_copied:
+            text += f", copied {self.assets_copied} image(s)"
+        if self.errors:
+            text += f" ({len(self.errors)} error(s))"
+        return text
+
+
+class DocBuilder:
+    """Build a Markdown tree into HTML, redoing only what changed
+
+    ``renderer`` is anything with a ``render_sync(source)`` method returning
+    a result with ``ok``, ``svg`` and ``error`` (a MermaidRenderer). Without
+    one, pages load mermaid and render their diagrams in the browser.
+    """
+
+    def __init__(self, source_dir, output_dir, theme="default", renderer=None):
+        self.source_dir = os.path.abspath(source_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.theme = theme
+        self.renderer = renderer
+        # Rendered diagrams depend on the mermaid actually loaded, which
+        # PYMERDOC_MERMAID_URL can point away from the pinned version;
+        # client-side pages always load the CDN copy
+        self.mermaid_url = document.mermaid_url() if renderer is not None else document.MERMAID_CDN_URL
+        self.manifest_path = os.path.join(self.output_dir, MANIFEST_NAME)
+        self.manifest = self._load_manifest()
+
+    def _settings(self):
+        return {
+            'version': MANIFEST_VERSION,
+            'mermaid': self.mermaid_url,
+            'theme': self.theme,
+            'render': self.renderer is not None,
+        }
+
+    def _load_manifest(self):
+        empty = dict(self._settings(), documents={}, diagrams={}, assets={})
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return empty
+        # A different mermaid, theme or mode invalidates everything
+        if any(manifest.get(key) != value for key, value in self._settings().items()):
+            return empty
+        return manifest
+
+    def _save_manifest(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        temp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def scan(self):
+        """Map relative paths of Markdown sources to (mtime_ns, size)"""
+        sources = {}
+        for root, dirs, files in os.walk(self.source_dir):
+            # Never build our own output when it lives inside the source tree
+            dirs[:] = [d for d in dirs if not d.startswith('.')
+                       and os.path.join(root, d) != self.output_dir]
+            for name in files:
+                if name.lower().endswith(MARKDOWN_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    relative = os.path.relpath(path, self.source_dir).replace(os.sep, '/')
+                    sources[relative] = (stat.st_mtime_ns, stat.st_size)
+        return sources
+
+    def output_path(self, relative):
+        return os.path.splitext(relative)[0] + '.html'
+
+    def build(self):
+        """Bring the output up to date and return a BuildReport"""
+        started = time.perf_counter()
+        report = BuildReport()
+        documents = self.manifest['documents']
+        sources = self.scan()
+        touched = False
+
+        for relative, (mtime_ns, size) in sorted(sources.items()):
+            entry = documents.get(relative)
+            if entry and entry['mtime_ns'] == mtime_ns and entry['size'] == size:
+                if entry.get('error'):
+                    report.errors.append(entry['error'])
+                continue
+            with open(os.path.join(self.source_dir, relative), 'rb') as f:
+                data = f.read()
+            digest = content_hash(data)
+            if entry and entry['hash'] == digest:
+                # Touched but unchanged
+                entry.update(mtime_ns=mtime_ns, size=size)
+                touched = True
+                if entry.get('error'):
+                    report.errors.append(entry['error'])
+                continue
+            try:
+                content = data.decode('utf-8')
+            except UnicodeDecodeError as e:
+                # Recorded, so the file is only read again once it changes
+                error = f"{relative}: not UTF-8 ({e})"
+                output = self.output_path(relative)
+                self._remove(os.path.join(self.output_dir, output))
+                documents[relative] = {'output': output, 'diagrams': [], 'assets': [],
+                                       'error': error, 'hash': digest,
+                                       'mtime_ns': mtime_ns, 'size': size}
+                report.errors.append(error)
+                report.failed.append(relative)
+                continue
+            errors = len(report.errors)
+            documents[relative] = self._build_document(relative, content, report)
+            if len(report.errors) == errors:
+                documents[relative].update(hash=digest, mtime_ns=mtime_ns, size=size)
+            else:
+                # Left dirty so the next build renders the failed diagrams again
+                documents[relative].update(hash=None, mtime_ns=None, size=None)
+            report.built.append(relative)
+
+        for relative in sorted(set(documents) - set(sources)):
+            self._remove(os.path.join(self.output_dir, documents.pop(relative)['output']))
+            report.removed.append(relative)
+
+        self._collect_diagrams()
+        self._copy_assets(report)
+        if report.changed or touched or not os.path.exists(self.manifest_path):
+            self._save_manifest()
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def _build_document(self, relative, content, report):
+        output = self.output_path(relative)
+        output_dir = os.path.dirname(os.path.join(self.output_dir, output))
+        keys = []
+
+        def replace(source):
+            if self.renderer is None:
+                return document.mermaid_div(source)
+            key = diagram_key(source, self.theme, self.mermaid_url)
+            svg_path = self._render_diagram(key, source, report)
+            if svg_path is None:
+                return f'<pre class="diagram-error">{html.escape(source)}</pre>'
+            keys.append(key)
+            src = os.path.relpath(os.path.join(self.output_dir, svg_path), output_dir)
+            return f'<div class="diagram"><img src="{src.replace(os.sep, "/")}" alt="diagram"></div>'
+
+        body = document.convert_markdown_to_html(content, replace)
+        scripts = '' if self.renderer is not None else CLIENT_SIDE_SCRIPTS.format(
+            url=document.MERMAID_CDN_URL, theme=self.theme)
+        title = os.path.splitext(os.path.basename(relative))[0]
+        page = PAGE_TEMPLATE.format(title=html.escape(title), scripts=scripts, body=body)
+
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, output), 'w', encoding='utf-8') as f:
+            f.write(page)
+        return {'output': output, 'diagrams': keys, 'assets': self._images(relative, content)}
+
+    def _images(self, relative, content):
+        """Source tree paths of the existing local images a document shows"""
+        folder = posixpath.dirname(relative)
+        paths = []
+        for name in bundle.image_references(content):
+            path = posixpath.normpath(posixpath.join(folder, name))
+            if path.startswith('../') or path == '..' or path in paths:
+                continue  # Outside the source tree
+            if os.path.isfile(os.path.join(self.source_dir, path)):
+                paths.append(path)
+        return paths
+
+    def _render_diagram(self, key, source, report):
+        """Return the manifest path of the diagram's SVG, rendering it if needed"""
+        diagrams = self.manifest['diagrams']
+        svg_path = diagrams.get(key)
+        if svg_path and os.path.exists(os.path.join(self.output_dir, svg_path)):
+            return svg_path
+
+        result = self.renderer.render_sync(source)
+        if not result.ok:
+            report.errors.append(f"diagram {key}: {result.error}")
+            return None
+        svg_path = f"{DIAGRAM_DIR}/{key}.svg"
+        os.makedirs(os.path.join(self.output_dir, DIAGRAM_DIR), exist_ok=True)
+        with open(os.path.join(self.output_dir, svg_path), 'w', encoding='utf-8') as f:
+            f.write(result.svg)
+        diagrams[key] = svg_path
+        report.diagrams_rendered += 1
+        return svg_path
+
+    def _collect_diagrams(self):
+        """Delete rendered diagrams no document uses any more"""
+        used = {key for entry in self.manifest['documents'].values() for key in entry['diagrams']}
+        for key in set(self.manifest['diagrams']) - used:
+            self._remove(os.path.join(self.output_dir, self.manifest['diagrams'].pop(key)))
+
+    def _copy_assets(self, report):
+        """Copy new and changed images into the output and delete unused ones
+
+        Images keep their path relative to the source tree, so the links in
+        the pages work unchanged.
+        """
+        assets = self.manifest['assets']
+        used = {path for entry in self.manifest['documents'].values()
+                for path in entry['assets']}
+        for path in sorted(used):
+            source = os.path.join(self.source_dir, path)
+            try:
+                stat = os.stat(source)
+            except FileNotFoundError:
+                continue
+            target = os.path.join(self.output_dir, path)
+            if assets.get(path) == [stat.st_mtime_ns, stat.st_size] and os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source, target)
+            assets[path] = [stat.st_mtime_ns, stat.st_size]
+            report.assets_copied += 1
+        for path in set(assets) - used:
+            del assets[path]
+            self._remove(os.path.join(self.output_dir, path))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def watch(self, interval=0.5, report_callback=None):
+        """Build, then keep rebuilding whenever sources change (until interrupted)
+
+        ``report_callback`` receives the BuildReport of the first build and
+        of every build that changed something.
+        """
+        report_callback = report_callback or print_report
+        report_callback(self.build())
+        while True:
+            time.sleep(interval)
+            report = self.build()
+            if report.changed:
+                report_callback(report)
+
+
+def print_report(report):
+    print(report.describe())
+    for error in report.errors:
+        print(f"pymerdoc: {error}", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pymerdoc build",
+        description="Build a tree of Markdown files with Mermaid diagrams into HTML, "
+                    "rebuilding only what changed since the last build."
+    )
+    parser.add_argument("source", help="directory containing Markdown files")
+    parser.add_argument("-o", "--output", required=True, help="output directory")
+    parser.add_argument("--theme", default="default",
+                        help="mermaid theme (default: %(default)s)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and rebuild when files change")
+    parser.add_argument("--interval", type=float, default=0.5,
+                        help="seconds between checks in watch mode (default: %(default)s)")
+    parser.add_argument("--client-side", action="store_true",
+                        help="leave diagrams to mermaid in the browser instead of "
+                             "rendering SVG files")
+    return parser
+
+
+def main(argv=None):
+    """Command line entry point for `pymerdoc build`"""
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.source):
+        print(f"pymerdoc: no such directory: {args.source}", file=sys.stderr)
+        return 2
+
+    renderer = None
+    if not args.client_side:
+        # Nothing is shown, so run without a display unless one was requested
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt6.QtWidgets import QApplication
+        from pymerdoc.mermaid_render import MermaidRenderer
+        app = QApplication.instance() or QApplication([sys.argv[0]])
+        renderer = MermaidRenderer(args.theme, app)
+
+    builder = DocBuilder(args.source, args.output, args.theme, renderer)
+    try:
+        if args.watch:
+            builder.watch(args.interval)
+        else:
+            report = builder.build()
+            print_report(report)
+            return 1 if report.errors else 0
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"pymerdoc: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
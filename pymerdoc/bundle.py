@@ -0,0 +1,208 @@
+"""`.pmdoc` document bundles.
+
+A bundle is a zip file holding a Markdown document, the local images it
+references and renders cached at save time, so reopening it can show the
+last preview before anything is rendered again:
+
+- ``manifest.json``         format version, mermaid version, document hash
+                            and the cached members below
+- ``document.md``           the Markdown source
+- ``assets/<path>``         images, stored under their path relative to
+                            the document
+- ``cache/pages/<theme>.html``  the rendered preview page per theme, valid
+                            for the document hash it was saved with
+- ``cache/diagrams/<key>.svg``  rendered diagrams by structure key
+
+Opening a bundle only reads the zip directory and the manifest; members are
+read when asked for. Cached diagrams are ignored after a mermaid upgrade,
+cached pages are still shown until their diagrams are re-rendered.
+"""
+import hashlib
+import json
+import os
+import posixpath
+import re
+import zipfile
+
+from pymerdoc.core import document
+
+BUNDLE_EXTENSION = ".pmdoc"
+BUNDLE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+DOCUMENT_NAME = "document.md"
+ASSET_DIR = "assets/"
+PAGE_DIR = "cache/pages/"
+DIAGRAM_DIR = "cache/diagrams/"
+
+# Markdown images and HTML img tags
+_IMAGE_REFERENCE = re.compile(
+    r'!\[[^\]]*\]\(\s*<?([^)\s>]+)>?(?:\s+["\'][^)]*["\'])?\s*\)'
+    r'|<img\b[^>]*?\bsrc\s*=\s*["\']([^"\']+)["\']',
+    re.IGNORECASE
+)
+# Formats that are compressed already
+_STORED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+
+class BundleError(Exception):
+    """A file that is not a readable pmdoc bundle"""
+
+
+def is_bundle(path):
+    return path.lower().endswith(BUNDLE_EXTENSION)
+
+
+def document_hash(markdown):
+    return hashlib.sha256(markdown.encode('utf-8')).hexdigest()
+
+
+def image_references(markdown):
+    """Normalized relative paths of the local images a document shows
+
+    URLs and absolute paths are left out; paths may lead out of the
+    document's folder with '../'.
+    """
+    references = []
+    for match in _IMAGE_REFERENCE.finditer(markdown):
+        target = (match.group(1) or match.group(2)).split('#')[0].split('?')[0]
+        if not target or re.match(r'^[a-z][a-z0-9+.-]*:', target, re.IGNORECASE):
+            continue
+        name = posixpath.normpath(target.replace('\\', '/'))
+        if name.startswith('/') or name == '.' or name in references:
+            continue
+        references.append(name)
+    return references
+
+
+def asset_references(markdown):
+    """Relative local image paths referenced by a document, in bundle form
+
+    URLs, absolute paths and paths leading out of the document's folder
+    are left out.
+    """
+    return [name for name in image_references(markdown)
+            if not name.startswith('../') and name != '..']
+
+
+class DocumentBundle:
+    """A pmdoc bundle opened for lazy reading"""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            self._zip = zipfile.ZipFile(path)
+            self.manifest = json.loads(self._zip.read(MANIFEST_NAME))
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            raise BundleError(f"{path} is not a pmdoc bundle: {e}")
+        if self.manifest.get('version', 0) > BUNDLE_VERSION:
+            self._zip.close()
+            raise BundleError(f"{path} was saved by a newer pymerdoc")
+        self._markdown = None
+
+    def close(self):
+        self._zip.close()
+
+    @property
+    def markdown(self):
+        if self._markdown is None:
+            self._markdown = self._zip.read(DOCUMENT_NAME).decode('utf-8')
+        return self._markdown
+
+    @property
+    def current(self):
+        """True when the cached renders come from this mermaid version"""
+        return self.manifest.get('mermaid') == document.MERMAID_VERSION
+
+    def asset_names(self):
+        return [name[len(ASSET_DIR):] for name in self._zip.namelist()
+                if name.startswith(ASSET_DIR) and not name.endswith('/')]
+
+    def read_asset(self, name):
+        """Bytes of an asset by its path relative to the document"""
+        return self._zip.read(ASSET_DIR + name)
+
+    def cached_page(self, theme):
+        """The preview page saved for theme, or None
+
+        The page is returned even after a mermaid upgrade, so it can be
+        shown while its diagrams are rendered again.
+        """
+        page = self.manifest.get('pages', {}).get(theme)
+        if not page or page['hash'] != self.manifest.get('hash'):
+            return None
+        return self._zip.read(page['path']).decode('utf-8')
+
+    def has_diagram(self, key):
+        return self.current and key in self.manifest.get('diagrams', {})
+
+    def diagram(self, key):
+        """Cached SVG for a diagram structure key, or None"""
+        if not self.has_diagram(key):
+            return None
+        return self._zip.read(self.manifest['diagrams'][key]).decode('utf-8')
+
+
+def _compression(name):
+    if name.lower().endswith(_STORED_EXTENSIONS):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def save_bundle(path, markdown, base_dir=None, diagrams=None, pages=None, previous=None):
+    """Write a bundle and return the asset references that could not be found
+
+    Assets are taken from ``previous`` (the bundle being re-saved) when it
+    has them, otherwise read from ``base_dir``. ``diagrams`` maps structure
+    keys to SVG and ``pages`` themes to preview pages for this markdown.
+    ``previous`` is closed before the file is replaced.
+    """
+    digest = document_hash(markdown)
+    manifest = {
+        'version': BUNDLE_VERSION,
+        'mermaid': document.MERMAID_VERSION,
+        'hash': digest,
+        'document': DOCUMENT_NAME,
+        'assets': [],
+        'pages': {},
+        'diagrams': {},
+    }
+    missing = []
+    previous_assets = set(previous.asset_names()) if previous is not None else set()
+    temp_path = f"{path}.{os.getpid()}.tmp"
+
+    try:
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as bundle:
+            bundle.writestr(DOCUMENT_NAME, markdown)
+
+            for name in asset_references(markdown):
+                if name in previous_assets:
+                    data = previous.read_asset(name)
+                elif base_dir and os.path.isfile(os.path.join(base_dir, name)):
+                    with open(os.path.join(base_dir, name), 'rb') as f:
+                        data = f.read()
+                else:
+                    missing.append(name)
+                    continue
+                bundle.writestr(ASSET_DIR + name, data, _compression(name))
+                manifest['assets'].append(name)
+
+            for theme, page in (pages or {}).items():
+                member = f"{PAGE_DIR}{theme}.html"
+                bundle.writestr(member, page)
+                manifest['pages'][theme] = {'path': member, 'hash': digest}
+
+            for key, svg in (diagrams or {}).items():
+                member = f"{DIAGRAM_DIR}{key}.svg"
+                bundle.writestr(member, svg)
+                manifest['diagrams'][key] = member
+
+            bundle.writestr(MANIFEST_NAME, json.dumps(manifest, indent=1, sort_keys=True))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if previous is not None:
+        previous.close()
+    os.replace(temp_path, path)
+    return missing
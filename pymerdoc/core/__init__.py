@@ -0,0 +1,20 @@
+"""Qt-free building blocks of pymerdoc.
+
+``pymerdoc.core`` imports in milliseconds and never pulls in Qt, so
+scripts, CI jobs and servers can parse documents and assemble preview
+HTML without a display. The editor, GIF maker and converter are thin
+layers over it.
+
+- ``document``: Markdown with mermaid blocks to HTML, and the preview page
+- ``frames``: decoding, normalizing and encoding animation frames (Pillow);
+  import it explicitly, it is not loaded with the package
+"""
+from pymerdoc.core.document import (convert_markdown_to_html, mermaid_div, preview_page,
+                                    process_mermaid_blocks)
+from pymerdoc.mermaid_parser import (MermaidSyntaxError, markdown_structure_key, parse,
+                                     structure_key)
+
+__all__ = [
+    'MermaidSyntaxError', 'convert_markdown_to_html', 'markdown_structure_key', 'mermaid_div',
+    'parse', 'preview_page', 'process_mermaid_blocks', 'structure_key',
+]
@@ -0,0 +1,118 @@
+"""Markdown documents with Mermaid blocks, converted to HTML without Qt."""
+import os
+
+from pymerdoc.mermaid_parser import MARKDOWN_BLOCK as MERMAID_BLOCK
+
+MERMAID_VERSION = "10.6.1"
+MERMAID_CDN_URL = f"https://cdn.jsdelivr.net/npm/mermaid@{MERMAID_VERSION}/dist/mermaid.min.js"
+
+
+def mermaid_url():
+    """URL mermaid is loaded from: $PYMERDOC_MERMAID_URL (e.g. a local copy) or the CDN"""
+    return os.environ.get("PYMERDOC_MERMAID_URL") or MERMAID_CDN_URL
+
+
+RENDERED_TITLE = "pymerdoc-rendered-"  # Page title prefix announcing a painted update
+
+
+def mermaid_div(diagram_content):
+    """Default HTML for a diagram: a div rendered by mermaid in the page"""
+    return f'<div class="mermaid">\n{diagram_content}\n</div>'
+
+
+def process_mermaid_blocks(content, replace=mermaid_div):
+    """Replace ```mermaid blocks with the HTML returned by replace(source)"""
+    return MERMAID_BLOCK.sub(lambda match: replace(match.group(1)), content)
+
+
+def convert_markdown_to_html(content, replace=mermaid_div):
+    """Convert markdown to HTML while preserving mermaid diagrams"""
+    # Imported here so importing the core stays cheap
+    import markdown
+
+    # First process mermaid blocks
+    processed_content = process_mermaid_blocks(content, replace)
+
+    # Convert to HTML using the markdown library
+    md = markdown.Markdown(extensions=['fenced_code', 'tables', 'codehilite'])
+    return md.convert(processed_content)
+
+
+def preview_page(html_content, theme="light"):
+    """Wrap converted markdown in the themed page the editor previews
+
+    The page defines ``showDiagram(index, svg, error)`` to fill in rendered
+    diagrams and ``previewRendered(token)``, which sets the title to
+    RENDERED_TITLE + token once the update has been painted.
+    """
+    light = theme == "light"
+    preview_bg = "#ffffff" if light else "#1e1e1e"
+    preview_color = "#24292e" if light else "#ffffff"
+
+    # Create complete HTML document
+    html = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <style>
+                body {{
+                    margin: 0;
+                    padding: 20px;
+                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+                    line-height: 1.6;
+                    color: {preview_color};
+                    background-color: {preview_bg};
+                }}
+                pre {{
+                    background-color: {'#f6f8fa' if light else '#2d2d2d'};
+                    padding: 16px;
+                    border-radius: 6px;
+                    overflow: auto;
+                }}
+                code {{
+                    font-family: SFMono-Regular, Consolas, 'Liberation Mono', Menlo, monospace;
+                    font-size: 85%;
+                }}
+                .mermaid {{
+                    text-align: center;
+                    margin: 20px 0;
+                    background: {'white' if light else '#1e1e1e'};
+                }}
+                table {{
+                    border-collapse: collapse;
+                    margin: 15px 0;
+                }}
+                th, td {{
+                    border: 1px solid {'#ddd' if light else '#3c3c3c'};
+                    padding: 8px;
+                }}
+                th {{
+                    background-color: {'#f6f8fa' if light else '#2d2d2d'};
+                }}
+            </style>
+        </head>
+        <body>
+            {html_content}
+            <script>
+                function showDiagram(index, svg, error) {{
+                    const block = document.querySelectorAll('div.mermaid')[index];
+                    if (!block) return;
+                    if (error) {{
+                        block.textContent = error;
+                    }} else {{
+                        block.innerHTML = svg;
+                    }}
+                }}
+
+                function previewRendered(token) {{
+                    // Two animation frames later the diagrams have been painted
+                    requestAnimationFrame(() => requestAnimationFrame(() => {{
+                        document.title = '{RENDERED_TITLE}' + token;
+                    }}));
+                }}
+            </script>
+        </body>
+        </html>
+        """
+    return html
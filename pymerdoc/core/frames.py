@@ -0,0 +1,370 @@
+"""Frame processing shared by the GIF maker, the animation export and the CLI.
+
+Decodes frame files, fits them onto a common canvas and encodes them as
+animated GIF, WebP or APNG. Pure Pillow; nothing here imports Qt.
+"""
+import io
+import os
+import time
+from dataclasses import dataclass
+
+from PIL import Image
+
+from pymerdoc.gif_optimizer import GifSizeOptimizer
+
+DEFAULT_DELAY = 1000
+DEFAULT_BACKGROUND = (255, 255, 255)
+
+# Output format key -> (Pillow format name, file extension, display name)
+ANIMATION_FORMATS = {
+    'gif': ('GIF', '.gif', 'GIF'),
+    'webp': ('WEBP', '.webp', 'Animated WebP'),
+    'apng': ('PNG', '.png', 'APNG'),
+}
+
+DEFAULT_QUALITY = 80
+DEFAULT_METHOD = 4
+DEFAULT_COMPRESS_LEVEL = 6
+
+
+def limit_size(size, max_size=None, scale=None):
+    """Shrink a (width, height) by ``scale`` and to fit within ``max_size``
+
+    ``max_size`` is a (width, height) pair where either may be None for no
+    limit; ``scale`` is a factor up to 1. The aspect ratio is kept and the
+    size is never enlarged.
+    """
+    width, height = size
+    factor = 1.0
+    if scale is not None:
+        if not 0 < scale <= 1:
+            raise ValueError(f"Scale must be between 0 and 1, got {scale}")
+        factor = scale
+    if max_size:
+        max_width, max_height = max_size
+        if max_width:
+            factor = min(factor, max_width / width)
+        if max_height:
+            factor = min(factor, max_height / height)
+    if factor >= 1:
+        return (width, height)
+    return (max(1, int(width * factor)), max(1, int(height * factor)))
+
+
+def largest_size(sizes):
+    """The largest width and the largest height among (width, height) pairs"""
+    sizes = list(sizes)
+    return (max(width for width, _ in sizes), max(height for _, height in sizes))
+
+
+def canvas_size(images, size=None, max_size=None, scale=None):
+    """``size`` when given, otherwise the largest width and height in the set
+
+    Either way the canvas is then limited by ``max_size`` and ``scale``.
+    """
+    return limit_size(tuple(size) if size else largest_size(img.size for img in images),
+                      max_size, scale)
+
+
+def frame_size(path):
+    """Width and height of a frame file, read from its header only"""
+    with Image.open(path) as img:
+        return img.size
+
+
+def output_canvas(paths, size=None, max_size=None, scale=None):
+    """canvas_size for frame files, without decoding them"""
+    return limit_size(tuple(size) if size else largest_size(frame_size(path) for path in paths),
+                      max_size, scale)
+
+
+def normalize_frame(img, canvas, bg_color=DEFAULT_BACKGROUND):
+    """Scale one image to fit the canvas, keeping its aspect ratio, and center it"""
+    max_width, max_height = canvas
+
+    # Calculate scaling factor while maintaining aspect ratio
+    width_ratio = max_width / img.size[0]
+    height_ratio = max_height / img.size[1]
+    scale_factor = min(width_ratio, height_ratio)
+
+    # Scale the image, unless it already has the size it would be scaled to
+    new_width = max(1, int(img.size[0] * scale_factor))
+    new_height = max(1, int(img.size[1] * scale_factor))
+    scaled_img = img
+    if img.size != (new_width, new_height):
+        scaled_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    if scaled_img.size == (max_width, max_height):
+        # Covers the whole canvas, so there is no background to paste onto
+        return scaled_img if scaled_img.mode == 'RGB' else scaled_img.convert('RGB')
+
+    # Create new image with canvas dimensions and background color
+    new_img = Image.new('RGB', (max_width, max_height), bg_color)
+
+    # Paste the scaled image centered on the background
+    left = (max_width - new_width) // 2
+    top = (max_height - new_height) // 2
+    new_img.paste(scaled_img, (left, top))
+    return new_img
+
+
+def normalize_frames(images, bg_color=DEFAULT_BACKGROUND, size=None, max_size=None, scale=None):
+    """Fit all images onto a common canvas with the given background color
+
+    The canvas is ``size`` when given, otherwise the largest width and height
+    found in the set, shrunk to ``max_size`` and by ``scale`` when given.
+    Each image is scaled to fit while keeping its aspect ratio and is
+    centered on the canvas.
+    """
+    canvas = canvas_size(images, size, max_size, scale)
+    return [normalize_frame(img, canvas, bg_color) for img in images]
+
+
+def format_from_path(path, default='gif'):
+    """Guess the output format key from a file extension"""
+    ext = os.path.splitext(path)[1].lower()
+    for key, (_, format_ext, _) in ANIMATION_FORMATS.items():
+        if ext == format_ext:
+            return key
+    return default
+
+
+class _ReportingFrames:
+    """Frames that call on_frame(number) as an encoder iterates over them
+
+    Re-iterable, since some Pillow encoders go over the frames twice.
+    """
+
+    def __init__(self, images, on_frame):
+        self.images = images
+        self.on_frame = on_frame
+
+    def __len__(self):
+        return len(self.images)
+
+    def __iter__(self):
+        for number, img in enumerate(self.images, 2):
+            self.on_frame(number)
+            yield img
+
+
+def save_animation(images, fp, fmt='gif', delay=DEFAULT_DELAY, loop=0,
+                   quality=DEFAULT_QUALITY, method=DEFAULT_METHOD, lossless=False,
+                   compress_level=DEFAULT_COMPRESS_LEVEL, on_frame=None):
+    """Encode images as an animation to a path or file object
+
+    ``quality``, ``method`` and ``lossless`` apply to WebP; ``compress_level``
+    applies to APNG. GIF output ignores them. ``on_frame(number)`` is called
+    as the encoder takes each frame after the first; raising from it aborts
+    the encode. GIF and APNG take frames one at a time, WebP all at once.
+    """
+    if fmt not in ANIMATION_FORMATS:
+        raise ValueError(f"Unsupported output format '{fmt}'")
+    pil_format = ANIMATION_FORMATS[fmt][0]
+
+    options = {}
+    if fmt == 'gif':
+        options['optimize'] = False
+    elif fmt == 'webp':
+        options.update(quality=int(quality), method=int(method), lossless=bool(lossless))
+    elif fmt == 'apng':
+        options['compress_level'] = int(compress_level)
+
+    append_images = images[1:]
+    if on_frame is not None:
+        append_images = _ReportingFrames(append_images, on_frame)
+
+    images[0].save(
+        fp,
+        format=pil_format,
+        save_all=True,
+        append_images=append_images,
+        duration=delay,
+        loop=loop,
+        **options
+    )
+
+
+def encode_frames(images, fmt='gif', delay=DEFAULT_DELAY, loop=0, target_size=None,
+                  **encoder_settings):
+    """Encode normalized images in memory and return (data, details)
+
+    With a GIF ``target_size`` the size optimizer picks the settings and
+    ``details`` describes its choice; otherwise ``details`` is empty.
+    """
+    if target_size:
+        if fmt != 'gif':
+            raise ValueError("A target size is only supported for GIF output")
+        result = GifSizeOptimizer(images, delay, loop).optimize(target_size)
+        return result.data, describe_optimization(result, target_size)
+    buffer = io.BytesIO()
+    save_animation(images, buffer, fmt, delay, loop, **encoder_settings)
+    return buffer.getvalue(), ""
+
+
+def compare_formats(images, delay=DEFAULT_DELAY, loop=0, quality=DEFAULT_QUALITY,
+                    method=DEFAULT_METHOD, compress_level=DEFAULT_COMPRESS_LEVEL):
+    """Encode images in memory with every format and report size and time
+
+    Returns a list of dicts with ``label``, ``format``, ``lossless``,
+    ``bytes`` and ``seconds``, smallest output first.
+    """
+    variants = [
+        ('GIF', 'gif', False),
+        ('WebP (lossy)', 'webp', False),
+        ('WebP (lossless)', 'webp', True),
+        ('APNG', 'apng', False),
+    ]
+    results = []
+    for label, fmt, lossless in variants:
+        buffer = io.BytesIO()
+        start = time.perf_counter()
+        save_animation(images, buffer, fmt, delay, loop, quality=quality,
+                       method=method, lossless=lossless,
+                       compress_level=compress_level)
+        results.append({
+            'label': label,
+            'format': fmt,
+            'lossless': lossless,
+            'bytes': buffer.tell(),
+            'seconds': time.perf_counter() - start,
+        })
+    return sorted(results, key=lambda r: r['bytes'])
+
+
+def format_comparison(results):
+    """Render compare_formats results as a plain text table"""
+    lines = [f"{'Format':<16}{'Size':>12}{'Encode':>10}"]
+    for r in results:
+        lines.append(f"{r['label']:<16}{r['bytes'] / 1024:>10.1f}KB"
+                     f"{r['seconds'] * 1000:>8.0f}ms")
+    return "\n".join(lines)
+
+
+def describe_optimization(result, budget):
+    """One line summary of a size optimizer result"""
+    verdict = "fits" if result.fits else "does NOT fit"
+    return (f"{result.size / 1024:.1f} KB {verdict} {budget / 1024:.0f} KB budget: "
+            f"{result.settings.describe()}")
+
+
+def load_frame(path, fit=None):
+    """Open a frame file and return it as an RGB image
+
+    With ``fit`` (a canvas size) a frame at least twice too large is shrunk
+    while it is decoded: JPEG decodes at a reduced scale (``draft``), other
+    formats get a fast integer ``reduce``. The result is never smaller than
+    the size that fits, so normalize_frame still does the final resize.
+    """
+    with Image.open(path) as img:
+        target = None
+        if fit is not None:
+            scale = min(fit[0] / img.size[0], fit[1] / img.size[1])
+            if scale <= 0.5:
+                target = (max(1, int(img.size[0] * scale)), max(1, int(img.size[1] * scale)))
+                img.draft('RGB', target)
+        frame = img.convert('RGB')
+    if target is not None:
+        factor = min(frame.size[0] // target[0], frame.size[1] // target[1])
+        if factor >= 2:
+            frame = frame.reduce(factor)
+    return frame
+
+
+class ConversionCancelled(Exception):
+    """Raised when a conversion is cancelled between two frames"""
+
+
+@dataclass
+class StageTimings:
+    """Seconds spent in each stage of a conversion"""
+    decode: float = 0.0
+    normalize: float = 0.0
+    quantize: float = 0.0
+    encode: float = 0.0
+
+    @property
+    def total(self):
+        return self.decode + self.normalize + self.quantize + self.encode
+
+    def describe(self):
+        return (f"decode {self.decode:.2f} s, normalize {self.normalize:.2f} s, "
+                f"quantize {self.quantize:.2f} s, encode {self.encode:.2f} s")
+
+
+STAGES = ('decode', 'normalize', 'quantize', 'encode')
+
+
+def convert_frames(paths, fmt='gif', delay=DEFAULT_DELAY, bg_color=DEFAULT_BACKGROUND,
+                   size=None, loop=0, target_size=None, progress=None, cancel_event=None,
+                   max_size=None, scale=None, **encoder_settings):
+    """Decode, normalize and encode frame files into animation bytes
+
+    The output size is worked out from the frame headers first (see
+    output_canvas), so frames much larger than it are shrunk while decoding.
+    Returns (data, details, timings) where ``details`` describes the size
+    optimizer's choice when a GIF ``target_size`` is given and timings is
+    a StageTimings. ``progress(stage, done, total)`` is called after every
+    frame of every stage. When ``cancel_event`` (a threading.Event) is set,
+    ConversionCancelled is raised before the next frame.
+    """
+    if not paths:
+        raise ValueError("No frames to convert")
+    if target_size and fmt != 'gif':
+        raise ValueError("A target size is only supported for GIF output")
+    timings = StageTimings()
+    total = len(paths)
+
+    def step(stage, done, count=total):
+        if cancel_event is not None and cancel_event.is_set():
+            raise ConversionCancelled()
+        if progress is not None:
+            progress(stage, done, count)
+
+    started = time.perf_counter()
+    canvas = output_canvas(paths, size, max_size, scale)
+    images = []
+    for path in paths:
+        step('decode', len(images))
+        images.append(load_frame(path, canvas))
+    timings.decode = time.perf_counter() - started
+    step('decode', total)
+
+    started = time.perf_counter()
+    for index in range(total):
+        step('normalize', index)
+        images[index] = normalize_frame(images[index], canvas, bg_color)
+    timings.normalize = time.perf_counter() - started
+    step('normalize', total)
+
+    if target_size:
+        optimizer = GifSizeOptimizer(images, delay, loop,
+                                     on_frame=lambda done, count: step('quantize', done, count))
+        result = optimizer.optimize(target_size)
+        timings.quantize = optimizer.quantize_seconds
+        timings.encode = optimizer.encode_seconds
+        step('encode', total)
+        return result.data, describe_optimization(result, target_size), timings
+
+    if fmt == 'gif':
+        # The same adaptive palette Pillow would pick while saving
+        started = time.perf_counter()
+        for index in range(total):
+            step('quantize', index)
+            images[index] = images[index].convert('P', palette=Image.Palette.ADAPTIVE)
+        timings.quantize = time.perf_counter() - started
+        step('quantize', total)
+
+    started = time.perf_counter()
+    encoded = [0]
+
+    def on_frame(number):
+        # Encoders that scan the frames first would otherwise report twice
+        encoded[0] = max(encoded[0], number - 1)
+        step('encode', encoded[0])
+
+    step('encode', 0)
+    buffer = io.BytesIO()
+    save_animation(images, buffer, fmt, delay, loop, on_frame=on_frame, **encoder_settings)
+    timings.encode = time.perf_counter() - started
+    step('encode', total)
+    return buffer.getvalue(), "", timings
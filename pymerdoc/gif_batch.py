@@ -0,0 +1,363 @@
+"""Headless GIF building for pymerdoc-gm.
+
+Builds animated GIFs (or animated WebP/APNG) from directories, glob patterns
+or explicit file lists, either from command line arguments or from a
+YAML/JSON job file. Frames are processed by pymerdoc.core.frames; this
+module does not import Qt so it can run on CI machines without a display.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from PIL import ImageColor
+
+from pymerdoc.core.frames import (ANIMATION_FORMATS, DEFAULT_BACKGROUND, DEFAULT_COMPRESS_LEVEL,
+                                  DEFAULT_DELAY, DEFAULT_METHOD, DEFAULT_QUALITY, compare_formats,
+                                  convert_frames, format_comparison, format_from_path, load_frame,
+                                  normalize_frames, output_canvas)
+from pymerdoc.gif_optimizer import parse_byte_size
+
+FRAME_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp')
+
+
+def natural_sort_key(path):
+    """Sort key that orders frame2 before frame10"""
+    name = os.path.basename(path)
+    return [int(part) if part.isdigit() else part.lower()
+            for part in re.split(r'(\d+)', name)]
+
+
+def collect_frames(sources, base_dir=None):
+    """Expand directories, glob patterns and files into an ordered frame list
+
+    Directories and glob patterns are sorted naturally; explicit files keep
+    the order they were given in. Duplicates are dropped.
+    """
+    frames = []
+    seen = set()
+
+    def add(paths):
+        for path in paths:
+            if path not in seen:
+                seen.add(path)
+                frames.append(path)
+
+    for source in sources:
+        if base_dir and not os.path.isabs(source):
+            source = os.path.join(base_dir, source)
+
+        if os.path.isdir(source):
+            entries = [os.path.join(source, name) for name in os.listdir(source)
+                       if name.lower().endswith(FRAME_EXTENSIONS)]
+            add(sorted(entries, key=natural_sort_key))
+        elif glob.has_magic(source):
+            matches = [path for path in glob.glob(source) if os.path.isfile(path)]
+            add(sorted(matches, key=natural_sort_key))
+        elif os.path.isfile(source):
+            add([source])
+        else:
+            raise FileNotFoundError(f"No such frame source: {source}")
+
+    return frames
+
+
+def parse_color(value):
+    """Parse a color name, hex string or RGB sequence into an RGB tuple"""
+    if isinstance(value, (list, tuple)):
+        return tuple(int(c) for c in value[:3])
+    return ImageColor.getrgb(str(value))[:3]
+
+
+def parse_size(value):
+    """Parse 'WIDTHxHEIGHT' (or a two item sequence) into a size tuple"""
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        width, height = value
+    else:
+        match = re.fullmatch(r'\s*(\d+)\s*[xX]\s*(\d+)\s*', str(value))
+        if not match:
+            raise ValueError(f"Invalid size '{value}', expected WIDTHxHEIGHT")
+        width, height = match.groups()
+    return int(width), int(height)
+
+
+def parse_max_size(value):
+    """Parse a size limit such as '1280x720', '1280x' or 'x720' into (width, height)
+
+    A missing side is None, meaning no limit on it.
+    """
+    if value in (None, ''):
+        return None
+    if isinstance(value, (list, tuple)):
+        width, height = value
+    else:
+        match = re.fullmatch(r'\s*(\d*)\s*[xX]\s*(\d*)\s*', str(value))
+        if not match or not any(match.groups()):
+            raise ValueError(f"Invalid maximum size '{value}', expected WIDTHxHEIGHT, "
+                             "WIDTHx or xHEIGHT")
+        width, height = match.groups()
+    return (int(width) if width else None, int(height) if height else None)
+
+
+def parse_scale(value):
+    """Parse an optional output scale such as 0.5 or '50%'"""
+    if value in (None, ''):
+        return None
+    text = str(value).strip()
+    scale = float(text[:-1]) / 100 if text.endswith('%') else float(text)
+    if not 0 < scale <= 1:
+        raise ValueError(f"Invalid scale '{value}', expected a value up to 1 (or 100%)")
+    return scale
+
+
+def parse_target_size(value):
+    """Parse an optional byte budget such as '2MB'"""
+    if value in (None, '', 0):
+        return None
+    return parse_byte_size(value)
+
+
+@dataclass
+class GifJob:
+    """Settings for building one animated GIF"""
+    output: str
+    frames: List[str] = field(default_factory=list)
+    delay: int = DEFAULT_DELAY
+    background: Tuple[int, int, int] = DEFAULT_BACKGROUND
+    size: Optional[Tuple[int, int]] = None
+    loop: int = 0
+    format: Optional[str] = None
+    quality: int = DEFAULT_QUALITY
+    method: int = DEFAULT_METHOD
+    lossless: bool = False
+    compress_level: int = DEFAULT_COMPRESS_LEVEL
+    target_size: Optional[int] = None
+    max_size: Optional[Tuple[Optional[int], Optional[int]]] = None
+    scale: Optional[float] = None
+
+    @property
+    def output_format(self):
+        """Explicit format, or the one implied by the output extension"""
+        return self.format or format_from_path(self.output)
+
+    @classmethod
+    def from_dict(cls, data, base_dir=None):
+        """Build a job from a job file entry, resolving paths against base_dir"""
+        if 'output' not in data:
+            raise ValueError("Job is missing 'output'")
+        sources = data.get('frames') or data.get('inputs') or []
+        if isinstance(sources, str):
+            sources = [sources]
+        output = data['output']
+        if base_dir and not os.path.isabs(output):
+            output = os.path.join(base_dir, output)
+        return cls(
+            output=output,
+            frames=collect_frames(sources, base_dir),
+            delay=int(data.get('delay', DEFAULT_DELAY)),
+            background=parse_color(data.get('background', DEFAULT_BACKGROUND)),
+            size=parse_size(data.get('size')),
+            loop=int(data.get('loop', 0)),
+            format=data.get('format'),
+            quality=int(data.get('quality', DEFAULT_QUALITY)),
+            method=int(data.get('method', DEFAULT_METHOD)),
+            lossless=bool(data.get('lossless', False)),
+            compress_level=int(data.get('compress_level', DEFAULT_COMPRESS_LEVEL)),
+            target_size=parse_target_size(data.get('target_size')),
+            max_size=parse_max_size(data.get('max_size')),
+            scale=parse_scale(data.get('scale')),
+        )
+
+
+def build_gif(job):
+    """Render a GifJob to disk and return (output path, frame count, details)
+
+    ``details`` describes the settings the size optimizer chose when the job
+    has a target size, and is empty otherwise.
+    """
+    if not job.frames:
+        raise ValueError(f"No frames found for {job.output}")
+
+    data, details, _ = convert_frames(
+        job.frames,
+        job.output_format,
+        job.delay,
+        job.background,
+        job.size,
+        job.loop,
+        job.target_size,
+        quality=job.quality,
+        method=job.method,
+        lossless=job.lossless,
+        compress_level=job.compress_level,
+        max_size=job.max_size,
+        scale=job.scale
+    )
+
+    output_dir = os.path.dirname(job.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(job.output, 'wb') as f:
+        f.write(data)
+    return job.output, len(job.frames), details
+
+
+def load_job_file(path):
+    """Load jobs from a YAML or JSON job file
+
+    The file holds either a list of jobs or a mapping with a ``jobs`` list
+    and optional ``defaults`` applied to every job. Relative paths are
+    resolved against the job file's directory.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    if path.lower().endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError("PyYAML is required for YAML job files "
+                               "(pip install 'pymerdoc[yaml]')") from None
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get('defaults') or {}
+        entries = data.get('jobs') or []
+    else:
+        entries = data or []
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    return [GifJob.from_dict({**defaults, **entry}, base_dir) for entry in entries]
+
+
+def run_jobs(jobs, workers=None):
+    """Build jobs concurrently and return a list of (job, result, error)"""
+    results = []
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            try:
+                results.append((job, build_gif(job), None))
+            except Exception as e:
+                results.append((job, None, e))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(build_gif, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                results.append((job, future.result(), None))
+            except Exception as e:
+                results.append((job, None, e))
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pymerdoc-gm",
+        description="Build animated GIFs, WebP or APNG files from image frames. "
+                    "Run without arguments to open the GIF Maker window."
+    )
+    parser.add_argument("frames", nargs="*",
+                        help="frame files, directories or glob patterns")
+    parser.add_argument("-o", "--output", help="output file (.gif, .webp or .png)")
+    parser.add_argument("--job-file", help="YAML or JSON file describing one or more jobs")
+    parser.add_argument("-d", "--delay", type=int, default=DEFAULT_DELAY,
+                        help="delay between frames in ms (default: %(default)s)")
+    parser.add_argument("-b", "--background", default="white",
+                        help="background color name or #rrggbb (default: %(default)s)")
+    parser.add_argument("-s", "--size", help="output size as WIDTHxHEIGHT "
+                                             "(default: largest frame)")
+    parser.add_argument("--max-size",
+                        help="largest output size as WIDTHxHEIGHT, WIDTHx or xHEIGHT; "
+                             "larger frames are shrunk while decoding")
+    parser.add_argument("--scale",
+                        help="shrink the output by this factor, such as 0.5 or 50%%")
+    parser.add_argument("--loop", type=int, default=0,
+                        help="loop count, 0 loops forever (default: %(default)s)")
+    parser.add_argument("-f", "--format", choices=sorted(ANIMATION_FORMATS),
+                        help="output format (default: from the output extension)")
+    parser.add_argument("--quality", type=int, default=DEFAULT_QUALITY,
+                        help="WebP quality 0-100 (default: %(default)s)")
+    parser.add_argument("--method", type=int, default=DEFAULT_METHOD,
+                        help="WebP encoder effort 0-6 (default: %(default)s)")
+    parser.add_argument("--lossless", action="store_true",
+                        help="use lossless WebP encoding")
+    parser.add_argument("--compress-level", type=int, default=DEFAULT_COMPRESS_LEVEL,
+                        help="APNG zlib level 0-9 (default: %(default)s)")
+    parser.add_argument("--target-size",
+                        help="GIF size budget such as 2MB; searches scale, palette, "
+                             "dithering and frame dropping to fit it")
+    parser.add_argument("--compare", action="store_true",
+                        help="print a size and encode time comparison of all formats")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of jobs to build concurrently (default: CPU count)")
+    return parser
+
+
+def main(argv=None):
+    """Command line entry point for headless GIF building"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        if args.job_file:
+            jobs = load_job_file(args.job_file)
+        else:
+            if not args.frames or not args.output:
+                parser.error("frames and --output are required unless --job-file is given")
+            jobs = [GifJob(
+                output=args.output,
+                frames=collect_frames(args.frames),
+                delay=args.delay,
+                background=parse_color(args.background),
+                size=parse_size(args.size),
+                loop=args.loop,
+                format=args.format,
+                quality=args.quality,
+                method=args.method,
+                lossless=args.lossless,
+                compress_level=args.compress_level,
+                target_size=parse_target_size(args.target_size),
+                max_size=parse_max_size(args.max_size),
+                scale=parse_scale(args.scale),
+            )]
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"pymerdoc-gm: {e}", file=sys.stderr)
+        return 2
+
+    if args.compare:
+        for job in jobs:
+            canvas = output_canvas(job.frames, job.size, job.max_size, job.scale)
+            images = normalize_frames([load_frame(p, canvas) for p in job.frames],
+                                      job.background, canvas)
+            print(f"{job.output} ({len(images)} frames)")
+            print(format_comparison(compare_formats(
+                images, job.delay, job.loop, job.quality, job.method,
+                job.compress_level)))
+        return 0
+
+    failures = 0
+    for job, result, error in run_jobs(jobs, args.workers):
+        if error:
+            failures += 1
+            print(f"FAILED {job.output}: {error}", file=sys.stderr)
+        else:
+            output, frame_count, details = result
+            print(f"{output} ({frame_count} frames)" + (f" {details}" if details else ""))
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
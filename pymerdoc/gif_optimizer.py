@@ -0,0 +1,218 @@
+"""Fit animated GIFs into a byte budget.
+
+GifSizeOptimizer searches over output scale, palette size, dithering and
+frame dropping for the best looking settings whose encoded size fits the
+budget. Scaled and quantized frames are cached, and every quantization is
+encoded at all frame steps at once, so each search step only redoes the
+work that the changed setting invalidates.
+"""
+import io
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PIL import Image
+
+SCALES = (1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3, 0.2)
+PALETTE_SIZES = (256, 128, 64, 32)
+FRAME_STEPS = (1, 2, 3, 4)
+
+# Frame lists kept per cache; each entry holds a full copy of the frames
+SCALED_CACHE_SIZE = 2
+QUANTIZED_CACHE_SIZE = 4
+
+
+def parse_byte_size(value):
+    """Parse sizes like 2MB, 500k or 2048 into a byte count"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r'\s*([\d.]+)\s*([kKmMgG]?)[iI]?[bB]?\s*', str(value))
+    if not match:
+        raise ValueError(f"Invalid size '{value}', expected e.g. 2MB or 500KB")
+    number, unit = match.groups()
+    factor = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}[unit.lower()]
+    return int(float(number) * factor)
+
+
+@dataclass(frozen=True)
+class GifSettings:
+    """One point in the optimizer's search space"""
+    scale: float = 1.0
+    colors: int = 256
+    dither: bool = True
+    frame_step: int = 1
+
+    @property
+    def quality(self):
+        """Heuristic quality score used to rank settings that fit the budget
+
+        Resolution dominates; fewer colors, no dithering and dropped frames
+        each cost a little.
+        """
+        color_factor = 0.85 + 0.15 * math.log2(self.colors) / 8
+        dither_factor = 1.0 if self.dither else 0.97
+        step_factor = 1 / math.sqrt(self.frame_step)
+        return self.scale ** 2 * color_factor * dither_factor * step_factor
+
+    def describe(self):
+        frames = "every frame" if self.frame_step == 1 else f"every {self.frame_step} frames"
+        return (f"scale {self.scale:.2f}, {self.colors} colors, "
+                f"dithering {'on' if self.dither else 'off'}, {frames}")
+
+
+@dataclass
+class OptimizationResult:
+    settings: GifSettings
+    data: bytes
+    quantizations: int
+    fits: bool
+
+    @property
+    def size(self):
+        return len(self.data)
+
+
+class GifSizeOptimizer:
+    """Search GIF encoder settings for a set of normalized frames"""
+
+    def __init__(self, images, delay=1000, loop=0, on_frame=None):
+        """``on_frame(done, total)`` is called for every frame quantized"""
+        if not images:
+            raise ValueError("No frames to optimize")
+        self.images = list(images)
+        self.delay = delay
+        self.loop = loop
+        self.on_frame = on_frame
+        self._scaled = OrderedDict()
+        self._quantized = OrderedDict()
+        self._sizes = {}
+        self.quantizations = 0
+        self.quantize_seconds = 0.0
+        self.encode_seconds = 0.0
+
+    @staticmethod
+    def _cached(cache, key, limit, build):
+        """Return cache[key], building it and evicting the oldest entries as needed"""
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        value = cache[key] = build()
+        while len(cache) > limit:
+            cache.popitem(last=False)
+        return value
+
+    def scaled_frames(self, scale):
+        """Frames resized to scale, cached per scale"""
+        def build():
+            if scale >= 1.0:
+                return self.images
+            width, height = self.images[0].size
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            return [img.resize(size, Image.Resampling.LANCZOS) for img in self.images]
+        return self._cached(self._scaled, scale, SCALED_CACHE_SIZE, build)
+
+    def quantized_frames(self, scale, colors, dither):
+        """Palette frames for a scale, palette size and dither mode, cached"""
+        def build():
+            self.quantizations += 1
+            frames = []
+            scaled = self.scaled_frames(scale)
+            started = time.perf_counter()
+            for img in scaled:
+                if self.on_frame is not None:
+                    self.on_frame(len(frames), len(scaled))
+                quantized = img.quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+                if dither:
+                    # Pillow only dithers when remapping onto an existing palette
+                    quantized = img.quantize(palette=quantized,
+                                             dither=Image.Dither.FLOYDSTEINBERG)
+                frames.append(quantized)
+            self.quantize_seconds += time.perf_counter() - started
+            return frames
+        return self._cached(self._quantized, (scale, colors, dither),
+                            QUANTIZED_CACHE_SIZE, build)
+
+    def encode(self, settings):
+        """Encode the frames with settings and return the GIF bytes"""
+        frames = self.quantized_frames(settings.scale, settings.colors, settings.dither)
+        frames = frames[::settings.frame_step]
+        started = time.perf_counter()
+        buffer = io.BytesIO()
+        frames[0].save(
+            buffer,
+            format='GIF',
+            save_all=True,
+            append_images=frames[1:],
+            duration=self.delay * settings.frame_step,
+            loop=self.loop,
+            optimize=False
+        )
+        data = buffer.getvalue()
+        self.encode_seconds += time.perf_counter() - started
+        self._sizes[settings] = len(data)
+        return data
+
+    def encoded_size(self, settings):
+        """Encoded size in bytes for settings, remembered across the search
+
+        Encoding is cheap next to quantizing, so a new quantization is
+        measured at every frame step straight away.
+        """
+        if settings not in self._sizes:
+            for step in FRAME_STEPS:
+                self.encode(GifSettings(settings.scale, settings.colors,
+                                        settings.dither, step))
+            if settings not in self._sizes:
+                self.encode(settings)
+        return self._sizes[settings]
+
+    def _known_too_big(self, settings, budget):
+        """True when a cheaper setting at the same scale already missed the budget
+
+        Fewer colors, no dithering or more dropped frames never make a GIF
+        larger, so settings that are more expensive on all three can be
+        skipped without encoding.
+        """
+        for other, size in self._sizes.items():
+            if (size > budget and other.scale == settings.scale
+                    and (other.dither == settings.dither or not other.dither)
+                    and other.colors <= settings.colors
+                    and other.frame_step >= settings.frame_step):
+                return True
+        return False
+
+    def optimize(self, budget):
+        """Find the highest quality settings whose output fits in budget bytes
+
+        Settings are tried in order of decreasing quality, so the first one
+        that fits is the answer. The cheapest setting at each scale is
+        measured first, which rules out whole scales with one quantization.
+        When nothing fits, the smallest setting tried is returned with
+        ``fits`` False.
+        """
+        grid = [
+            GifSettings(scale, colors, dither, step)
+            for scale in SCALES
+            for colors in PALETTE_SIZES
+            for dither in (True, False)
+            for step in FRAME_STEPS
+        ]
+        grid.sort(key=lambda s: s.quality, reverse=True)
+
+        for settings in grid:
+            cheapest = GifSettings(settings.scale, PALETTE_SIZES[-1], False, settings.frame_step)
+            if self.encoded_size(cheapest) > budget or self._known_too_big(settings, budget):
+                continue
+            if self.encoded_size(settings) <= budget:
+                return OptimizationResult(settings, self.encode(settings),
+                                          self.quantizations, True)
+
+        smallest = min(self._sizes, key=self._sizes.get)
+        return OptimizationResult(smallest, self.encode(smallest), self.quantizations, False)
+
+
+def optimize_gif(images, budget, delay=1000, loop=0):
+    """Convenience wrapper returning an OptimizationResult for a byte budget"""
+    return GifSizeOptimizer(images, delay, loop).optimize(parse_byte_size(budget))
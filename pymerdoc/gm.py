@@ -1,10 +1,42 @@
-from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QListWidget,
-                             QPushButton, QLabel, QFileDialog, QMessageBox,
-                             QInputDialog, QWidget, QFrame)
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPixmap, QColor
+from PyQt6.QtWidgets import (QApplication, QDialog, QVBoxLayout, QHBoxLayout, QListWidget,
+                             QListWidgetItem, QPushButton, QLabel, QFileDialog, QMessageBox,
+                             QInputDialog, QWidget, QFrame, QComboBox, QSpinBox,
+                             QCheckBox, QFormLayout, QProgressBar)
+from PyQt6.QtCore import Qt, QTimer, QObject, QRunnable, QThreadPool, QSize, pyqtSignal
+from PyQt6.QtGui import QPixmap, QColor, QIcon
 from PIL import Image, ImageQt
+from collections import OrderedDict
+from functools import lru_cache
+import io
 import os
+import sys
+import threading
+
+from pymerdoc import gif_batch, profiling
+from pymerdoc.core import frames
+from pymerdoc.theme_manager import ThemeManager
+from pymerdoc.thumbnails import ThumbnailCache
+
+PROGRESS_STEPS = 1000  # Progress bar steps per conversion stage
+
+
+@lru_cache(maxsize=None)
+def color_button_stylesheet(color_name, is_dark_mode):
+    border_color = "#555555" if is_dark_mode else "#cccccc"
+    hover_color = "#666666" if is_dark_mode else "#3daee9"
+    return f"""
+        QPushButton {{
+            background-color: {color_name};
+            border: 2px solid {border_color};
+            border-radius: 15px;
+        }}
+        QPushButton:checked {{
+            border: 2px solid {hover_color};
+        }}
+        QPushButton:hover {{
+            border: 2px solid {hover_color};
+        }}
+    """
 
 
 class ColorButton(QPushButton):
@@ -14,40 +46,210 @@ class ColorButton(QPushButton):
         self.setCheckable(True)
         self.color_name = color_name
         self.rgb = rgb
+        self.is_dark_mode = None
         self.update_style(is_dark_mode)
 
     def update_style(self, is_dark_mode):
-        border_color = "#555555" if is_dark_mode else "#cccccc"
-        hover_color = "#666666" if is_dark_mode else "#3daee9"
-        self.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {self.color_name};
-                border: 2px solid {border_color};
-                border-radius: 15px;
-            }}
-            QPushButton:checked {{
-                border: 2px solid {hover_color};
-            }}
-            QPushButton:hover {{
-                border: 2px solid {hover_color};
-            }}
-        """)
+        # Restyling repolishes the button, so only do it when the mode changes
+        if is_dark_mode == self.is_dark_mode:
+            return
+        self.is_dark_mode = is_dark_mode
+        self.setStyleSheet(color_button_stylesheet(self.color_name, is_dark_mode))
+
+
+class LazyFrameDecoder:
+    """Decode animation frames on demand with a small LRU pixmap cache
+
+    ``source`` is a file path, bytes or a binary file object such as an
+    in-memory BytesIO encode. Only ``cache_size`` frames are kept as
+    QPixmaps at any time.
+    """
+
+    def __init__(self, source, default_delay=1000, cache_size=8):
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        self.image = Image.open(source)
+        self.frame_count = getattr(self.image, 'n_frames', 1)
+        self.default_delay = default_delay
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def frame(self, index):
+        """Return (QPixmap, delay in ms) for the given frame index"""
+        if index in self._cache:
+            self._cache.move_to_end(index)
+            return self._cache[index]
+
+        self.image.seek(index)
+        delay = self.image.info.get('duration') or self.default_delay
+        pixmap = QPixmap.fromImage(ImageQt.ImageQt(self.image.convert('RGBA')))
+
+        self._cache[index] = (pixmap, delay)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return pixmap, delay
+
+    def close(self):
+        self._cache.clear()
+        self.image.close()
+
+
+class AnimationPreviewDialog(QDialog):
+    """Play an animation file or in-memory encode, decoding frames lazily"""
+
+    def __init__(self, source, default_delay=1000, title="Animation Preview", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.decoder = LazyFrameDecoder(source, default_delay)
+        self.current_frame = 0
+
+        layout = QVBoxLayout(self)
+        self.label = QLabel()
+        self.label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.label)
+
+        controls = QHBoxLayout()
+        self.play_button = QPushButton("Pause")
+        self.play_button.clicked.connect(self.toggle_playback)
+        controls.addWidget(self.play_button)
+        self.frame_label = QLabel()
+        controls.addWidget(self.frame_label)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        # Single shot timer so each frame can use its own duration
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self.next_frame)
+        self.finished.connect(self._stop)
+
+        self.show_frame(0)
+
+    def show_frame(self, index):
+        """Display a frame and schedule the next one"""
+        pixmap, delay = self.decoder.frame(index)
+        self.current_frame = index
+        self.label.setPixmap(pixmap)
+        self.frame_label.setText(f"Frame {index + 1} / {self.decoder.frame_count}")
+        if self.decoder.frame_count > 1 and self.play_button.text() == "Pause":
+            self.frame_timer.start(delay)
+
+    def next_frame(self):
+        if self.isVisible():
+            self.show_frame((self.current_frame + 1) % self.decoder.frame_count)
+
+    def toggle_playback(self):
+        if self.frame_timer.isActive():
+            self.frame_timer.stop()
+            self.play_button.setText("Play")
+        else:
+            self.play_button.setText("Pause")
+            self.next_frame()
+
+    def _stop(self):
+        self.frame_timer.stop()
+        self.decoder.close()
+
+
+class ThumbnailSignals(QObject):
+    ready = pyqtSignal(str, str)  # source path, thumbnail path
+
+
+class ThumbnailTask(QRunnable):
+    """Create or fetch one cached thumbnail on a worker thread"""
+
+    def __init__(self, cache, path, signals):
+        super().__init__()
+        self.cache = cache
+        self.path = path
+        self.signals = signals
+
+    def run(self):
+        try:
+            thumb_path = self.cache.get(self.path)
+        except Exception:
+            # Unreadable frames keep their text-only list entry
+            return
+        self.signals.ready.emit(self.path, thumb_path)
+
+
+class ConversionSignals(QObject):
+    progress = pyqtSignal(str, int, int)  # stage, frames done, frames in stage
+    finished = pyqtSignal(str, str)  # output path, details
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class ConversionTask(QRunnable):
+    """Convert frame files to an animation file on a worker thread"""
+
+    def __init__(self, paths, output_file, signals, cancel_event, **options):
+        super().__init__()
+        self.paths = list(paths)
+        self.output_file = output_file
+        self.signals = signals
+        self.cancel_event = cancel_event
+        self.options = options
+
+    def run(self):
+        try:
+            with profiling.section(profiling.GIF) as capture:
+                data, details, timings = frames.convert_frames(
+                    self.paths, progress=self.signals.progress.emit,
+                    cancel_event=self.cancel_event, **self.options)
+                with open(self.output_file, 'wb') as f:
+                    f.write(data)
+        except frames.ConversionCancelled:
+            self.signals.cancelled.emit()
+            return
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+
+        details = "\n\n".join(part for part in (
+            details,
+            f"{len(self.paths)} frames, {len(data) / 1024:.1f} KB in {timings.total:.2f} s:\n"
+            f"{timings.describe()}",
+            capture.report.describe() if capture is not None and capture.report else "",
+        ) if part)
+        self.signals.finished.emit(self.output_file, details)
 
 
 class GifMakerDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("PNG to Animated GIF Converter")
+        self.setWindowTitle("PNG to Animated GIF/WebP/APNG Converter")
         self.setMinimumSize(800, 600)
 
-        # Get theme from parent
+        # Get theme from parent, or from saved settings when run standalone
         self.parent_window = parent
-        self.is_dark_mode = self.parent_window.theme_manager.get_theme() == "dark"
+        self.theme_manager = getattr(parent, 'theme_manager', None) or ThemeManager(None)
+        self.is_dark_mode = self.theme_manager.is_dark()
 
         # Initialize variables
         self.image_list = []
         self.delay = 1000
         self.bg_color = (255, 255, 255)  # Default white background
+        self.output_format = 'gif'
+
+        # Thumbnails are generated in the background and filled in as they arrive
+        self.thumbnail_cache = ThumbnailCache()
+        self.thumbnail_items = {}
+        self.thumbnail_pool = QThreadPool(self)
+        self.thumbnail_signals = ThumbnailSignals(self)
+        self.thumbnail_signals.ready.connect(self.set_thumbnail)
+        self.finished.connect(self.thumbnail_pool.clear)
+
+        # Conversions run one at a time off the GUI thread
+        self.conversion_pool = QThreadPool(self)
+        self.conversion_pool.setMaxThreadCount(1)
+        self.conversion_signals = ConversionSignals(self)
+        self.conversion_signals.progress.connect(self.show_conversion_progress)
+        self.conversion_signals.finished.connect(self.conversion_finished)
+        self.conversion_signals.failed.connect(self.conversion_failed)
+        self.conversion_signals.cancelled.connect(self.conversion_cancelled)
+        self.cancel_event = None
+        self.finished.connect(self.stop_conversion)
 
         self.setup_ui()
         self.apply_theme()
@@ -70,6 +272,8 @@ class GifMakerDialog(QDialog):
 
         # List widget
         self.list_widget = QListWidget()
+        self.list_widget.setIconSize(QSize(*self.thumbnail_cache.size))
+        self.list_widget.setUniformItemSizes(True)
         left_layout.addWidget(self.list_widget)
 
         # Color picker section
@@ -107,6 +311,69 @@ class GifMakerDialog(QDialog):
         color_layout.addLayout(color_grid)
         left_layout.addWidget(color_section)
 
+        # Output format section
+        output_section = QWidget()
+        output_layout = QVBoxLayout(output_section)
+        output_layout.setSpacing(10)
+
+        output_label = QLabel("Output Format")
+        output_label.setStyleSheet("font-size: 14px; font-weight: bold;")
+        output_layout.addWidget(output_label)
+
+        output_form = QFormLayout()
+        self.format_combo = QComboBox()
+        for key, (_, _, display_name) in frames.ANIMATION_FORMATS.items():
+            self.format_combo.addItem(display_name, key)
+        self.format_combo.currentIndexChanged.connect(self.set_output_format)
+        output_form.addRow("Format:", self.format_combo)
+
+        self.quality_spin = QSpinBox()
+        self.quality_spin.setRange(0, 100)
+        self.quality_spin.setValue(frames.DEFAULT_QUALITY)
+        output_form.addRow("WebP quality:", self.quality_spin)
+
+        self.method_spin = QSpinBox()
+        self.method_spin.setRange(0, 6)
+        self.method_spin.setValue(frames.DEFAULT_METHOD)
+        output_form.addRow("WebP method:", self.method_spin)
+
+        self.lossless_check = QCheckBox("Lossless WebP")
+        output_form.addRow("", self.lossless_check)
+
+        self.compress_spin = QSpinBox()
+        self.compress_spin.setRange(0, 9)
+        self.compress_spin.setValue(frames.DEFAULT_COMPRESS_LEVEL)
+        output_form.addRow("APNG compression:", self.compress_spin)
+
+        self.target_size_spin = QSpinBox()
+        self.target_size_spin.setRange(0, 1024 * 1024)
+        self.target_size_spin.setSuffix(" KB")
+        self.target_size_spin.setSpecialValueText("Off")
+        self.target_size_spin.setToolTip(
+            "Search scale, palette, dithering and frame dropping to fit this size")
+        output_form.addRow("GIF target size:", self.target_size_spin)
+
+        # Output size limits; 0 and 100% mean no limit
+        self.max_width_spin = QSpinBox()
+        self.max_height_spin = QSpinBox()
+        for spin in (self.max_width_spin, self.max_height_spin):
+            spin.setRange(0, 16384)
+            spin.setSuffix(" px")
+            spin.setSpecialValueText("Any")
+            spin.setToolTip("Frames larger than this are shrunk, the largest ones while decoding")
+        output_form.addRow("Max width:", self.max_width_spin)
+        output_form.addRow("Max height:", self.max_height_spin)
+
+        self.scale_spin = QSpinBox()
+        self.scale_spin.setRange(1, 100)
+        self.scale_spin.setValue(100)
+        self.scale_spin.setSuffix("%")
+        output_form.addRow("Scale:", self.scale_spin)
+
+        output_layout.addLayout(output_form)
+        left_layout.addWidget(output_section)
+        self.set_output_format()
+
         # Add left panel to main layout
         main_layout.addWidget(left_panel, stretch=2)
 
@@ -124,6 +391,10 @@ class GifMakerDialog(QDialog):
         self.add_button.clicked.connect(self.add_files)
         file_buttons_layout.addWidget(self.add_button)
 
+        self.add_folder_button = QPushButton("Add Folder")
+        self.add_folder_button.clicked.connect(self.add_folder)
+        file_buttons_layout.addWidget(self.add_folder_button)
+
         self.remove_button = QPushButton("Remove Selected")
         self.remove_button.clicked.connect(self.remove_selected)
         file_buttons_layout.addWidget(self.remove_button)
@@ -154,10 +425,34 @@ class GifMakerDialog(QDialog):
         self.delay_button.clicked.connect(self.set_delay)
         action_buttons_layout.addWidget(self.delay_button)
 
-        self.convert_button = QPushButton("Convert to GIF")
+        self.preview_button = QPushButton("Preview")
+        self.preview_button.clicked.connect(self.preview_current)
+        action_buttons_layout.addWidget(self.preview_button)
+
+        self.compare_button = QPushButton("Compare Formats")
+        self.compare_button.clicked.connect(self.compare_formats)
+        action_buttons_layout.addWidget(self.compare_button)
+
+        self.convert_button = QPushButton("Convert")
+        self.convert_button.setObjectName("primaryButton")
         self.convert_button.clicked.connect(self.convert_to_gif)
         action_buttons_layout.addWidget(self.convert_button)
 
+        # Conversion progress, shown while a conversion runs
+        self.progress_label = QLabel()
+        self.progress_label.setWordWrap(True)
+        self.progress_label.hide()
+        action_buttons_layout.addWidget(self.progress_label)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.hide()
+        action_buttons_layout.addWidget(self.progress_bar)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_conversion)
+        self.cancel_button.hide()
+        action_buttons_layout.addWidget(self.cancel_button)
+
         right_layout.addWidget(action_buttons)
         right_layout.addStretch()
 
@@ -166,96 +461,13 @@ class GifMakerDialog(QDialog):
 
     def apply_theme(self):
         """Apply the current theme to all widgets"""
-        is_dark = self.is_dark_mode
-
-        # Colors for dark/light themes
-        bg_color = "#2e2e2e" if is_dark else "#ffffff"
-        text_color = "#ffffff" if is_dark else "#000000"
-        list_bg = "#3c3c3c" if is_dark else "#ffffff"
-        border_color = "#555555" if is_dark else "#cccccc"
-        button_bg = "#424242" if is_dark else "#f0f0f0"
-        button_hover = "#4f4f4f" if is_dark else "#e0e0e0"
-        accent_color = "#3daee9"
-
-        # Update dialog background
-        self.setStyleSheet(f"""
-            QDialog {{
-                background-color: {bg_color};
-                color: {text_color};
-            }}
-            QLabel {{
-                color: {text_color};
-            }}
-        """)
-
-        # Update list widget
-        self.list_widget.setStyleSheet(f"""
-            QListWidget {{
-                background-color: {list_bg};
-                border: 1px solid {border_color};
-                border-radius: 4px;
-                color: {text_color};
-            }}
-            QListWidget::item {{
-                padding: 5px;
-                border-radius: 2px;
-            }}
-            QListWidget::item:selected {{
-                background-color: {accent_color};
-                color: white;
-            }}
-            QListWidget::item:hover {{
-                background-color: {"#4a4a4a" if is_dark else "#f0f0f0"};
-            }}
-        """)
-
-        # Button style
-        button_style = f"""
-            QPushButton {{
-                background-color: {button_bg};
-                color: {text_color};
-                border: 1px solid {border_color};
-                border-radius: 4px;
-                padding: 8px 16px;
-                min-width: 120px;
-            }}
-            QPushButton:hover {{
-                background-color: {button_hover};
-                border: 1px solid {accent_color};
-            }}
-            QPushButton:pressed {{
-                background-color: {"#383838" if is_dark else "#d0d0d0"};
-            }}
-        """
-
-        # Apply button style to all buttons
-        for button in [self.add_button, self.remove_button,
-                       self.move_up_button, self.move_down_button,
-                       self.delay_button]:
-            button.setStyleSheet(button_style)
-
-        # Special style for convert button
-        self.convert_button.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {accent_color};
-                color: white;
-                border: none;
-                border-radius: 4px;
-                padding: 8px 16px;
-                min-width: 120px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: #3498db;
-            }}
-            QPushButton:pressed {{
-                background-color: #2980b9;
-            }}
-        """)
+        # One shared stylesheet on the dialog instead of one per widget
+        self.theme_manager.apply_dialog_theme(self, self.is_dark_mode)
 
         # Update color buttons
         for btn in self.color_buttons:
-            btn.update_style(is_dark)
+            btn.update_style(self.is_dark_mode)
+
     def set_bg_color(self, color):
         """Set the background color for GIF conversion"""
         self.bg_color = color
@@ -263,37 +475,57 @@ class GifMakerDialog(QDialog):
         for btn in self.color_buttons:
             btn.setChecked(btn.rgb == color)
 
-    def normalize_images(self, images):
+    def set_output_format(self):
+        """Enable only the encoder settings that apply to the chosen format"""
+        self.output_format = self.format_combo.currentData()
+        is_webp = self.output_format == 'webp'
+        self.quality_spin.setEnabled(is_webp)
+        self.method_spin.setEnabled(is_webp)
+        self.lossless_check.setEnabled(is_webp)
+        self.compress_spin.setEnabled(self.output_format == 'apng')
+        self.target_size_spin.setEnabled(self.output_format == 'gif')
+
+    def encoder_settings(self):
+        """Collect the encoder settings from the output format controls"""
+        return {
+            'quality': self.quality_spin.value(),
+            'method': self.method_spin.value(),
+            'lossless': self.lossless_check.isChecked(),
+            'compress_level': self.compress_spin.value(),
+        }
+
+    def output_limits(self):
+        """Collect the output size limits as convert_frames keyword arguments"""
+        max_size = (self.max_width_spin.value() or None, self.max_height_spin.value() or None)
+        scale = self.scale_spin.value()
+        return {
+            'max_size': max_size if any(max_size) else None,
+            'scale': scale / 100 if scale < 100 else None,
+        }
+
+    def encode_current(self, normalized_images):
+        """Encode frames with the current settings and return (bytes, details)
+
+        With a GIF target size the size optimizer picks the settings and
+        ``details`` describes its choice.
+        """
+        target_kb = self.target_size_spin.value()
+        target_size = target_kb * 1024 if self.output_format == 'gif' and target_kb else None
+        return frames.encode_frames(normalized_images, self.output_format, self.delay,
+                                    target_size=target_size, **self.encoder_settings())
+
+    def load_normalized_images(self):
+        """Load the current frame list and normalize it"""
+        canvas = frames.output_canvas(self.image_list, **self.output_limits())
+        original_images = []
+        for file in self.image_list:
+            original_images.append(frames.load_frame(file, canvas))
+        return self.normalize_images(original_images, canvas)
+
+    def normalize_images(self, images, size=None):
         """Normalize all images to the same size with the selected background"""
         try:
-            # Find maximum dimensions
-            max_width = max(img.size[0] for img in images)
-            max_height = max(img.size[1] for img in images)
-
-            normalized_images = []
-            for img in images:
-                # Calculate scaling factor while maintaining aspect ratio
-                width_ratio = max_width / img.size[0]
-                height_ratio = max_height / img.size[1]
-                scale_factor = min(width_ratio, height_ratio)
-
-                # Scale the image
-                new_width = int(img.size[0] * scale_factor)
-                new_height = int(img.size[1] * scale_factor)
-                scaled_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-                # Create new image with max dimensions and background color
-                new_img = Image.new('RGB', (max_width, max_height), self.bg_color)
-
-                # Calculate position to center the scaled image
-                left = (max_width - new_width) // 2
-                top = (max_height - new_height) // 2
-
-                # Paste the scaled image onto the new background
-                new_img.paste(scaled_img, (left, top))
-                normalized_images.append(new_img)
-
-            return normalized_images
+            return frames.normalize_frames(images, self.bg_color, size)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to normalize images: {str(e)}")
             return None
@@ -307,17 +539,43 @@ class GifMakerDialog(QDialog):
             "PNG Files (*.png)"
         )
 
-        for file in files:
-            if file not in self.image_list:
+        self.add_frame_paths(sorted(files, key=gif_batch.natural_sort_key))
+
+    def add_folder(self):
+        """Add every image in a folder, in natural order"""
+        folder = QFileDialog.getExistingDirectory(self, "Select Frame Folder")
+        if folder:
+            self.add_frame_paths(gif_batch.collect_frames([folder]))
+
+    def add_frame_paths(self, paths):
+        """Append frames to the list and queue their thumbnails"""
+        self.list_widget.setUpdatesEnabled(False)
+        try:
+            for file in paths:
+                if file in self.thumbnail_items:
+                    continue
                 self.image_list.append(file)
-                self.list_widget.addItem(os.path.basename(file))
+                item = QListWidgetItem(os.path.basename(file))
+                item.setToolTip(file)
+                self.list_widget.addItem(item)
+                self.thumbnail_items[file] = item
+                self.thumbnail_pool.start(
+                    ThumbnailTask(self.thumbnail_cache, file, self.thumbnail_signals))
+        finally:
+            self.list_widget.setUpdatesEnabled(True)
+
+    def set_thumbnail(self, path, thumb_path):
+        """Show a finished thumbnail if its frame is still in the list"""
+        item = self.thumbnail_items.get(path)
+        if item is not None:
+            item.setIcon(QIcon(thumb_path))
 
     def remove_selected(self):
         """Remove selected file from the list"""
         current = self.list_widget.currentRow()
         if current >= 0:
             self.list_widget.takeItem(current)
-            self.image_list.pop(current)
+            self.thumbnail_items.pop(self.image_list.pop(current), None)
 
     def move_up(self):
         """Move selected item up in the list"""
@@ -354,104 +612,183 @@ class GifMakerDialog(QDialog):
             self.delay = delay
 
     def convert_to_gif(self):
-        """Convert selected PNG files to animated GIF"""
+        """Convert the frame list to an animated GIF, WebP or APNG in the background"""
+        if not self.image_list:
+            QMessageBox.warning(self, "Warning", "No images selected.")
+            return
+
+        _, extension, display_name = frames.ANIMATION_FORMATS[self.output_format]
+        output_file, _ = QFileDialog.getSaveFileName(
+            self,
+            f"Save {display_name}",
+            "",
+            f"{display_name} Files (*{extension})"
+        )
+
+        if not output_file:
+            return
+        if not output_file.lower().endswith(extension):
+            output_file += extension
+
+        target_kb = self.target_size_spin.value() if self.output_format == 'gif' else 0
+        self.cancel_event = threading.Event()
+        task = ConversionTask(
+            self.image_list, output_file, self.conversion_signals, self.cancel_event,
+            fmt=self.output_format,
+            delay=self.delay,
+            bg_color=self.bg_color,
+            target_size=target_kb * 1024 or None,
+            **self.output_limits(),
+            **self.encoder_settings()
+        )
+        self.set_converting(True)
+        self.conversion_pool.start(task)
+
+    def set_converting(self, converting):
+        """Swap the action buttons for the progress display and back"""
+        for button in (self.convert_button, self.compare_button, self.preview_button,
+                       self.add_button, self.add_folder_button, self.remove_button):
+            button.setEnabled(not converting)
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.setVisible(converting)
+        self.progress_bar.setVisible(converting)
+        self.progress_label.setVisible(converting)
+        if converting:
+            self.progress_bar.setRange(0, 0)
+            self.progress_label.setText("Starting...")
+
+    def show_conversion_progress(self, stage, done, total):
+        """Show overall progress across the conversion stages"""
+        # Each stage fills an equal share, whatever its own total; the size
+        # optimizer restarts its count for every quantization it tries
+        stage_index = frames.STAGES.index(stage)
+        fraction = min(done / max(total, 1), 1.0)
+        value = round((stage_index + fraction) * PROGRESS_STEPS)
+        self.progress_bar.setRange(0, len(frames.STAGES) * PROGRESS_STEPS)
+        self.progress_bar.setValue(max(value, self.progress_bar.value()))
+        self.progress_label.setText(f"{stage.capitalize()}: frame {min(done + 1, total)} of {total}")
+
+    def cancel_conversion(self):
+        """Stop the running conversion before its next frame"""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_button.setEnabled(False)
+            self.progress_label.setText("Cancelling...")
+
+    def stop_conversion(self):
+        """Cancel any running conversion and wait for it to stop"""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        self.conversion_pool.waitForDone()
+
+    def conversion_finished(self, output_file, details):
+        self.set_converting(False)
+        display_name = frames.ANIMATION_FORMATS[frames.format_from_path(output_file)][2]
+        QMessageBox.information(self, "Success",
+                                f"{display_name} saved as {output_file}\n\n{details}")
+        self.preview_gif(output_file)
+
+    def conversion_failed(self, message):
+        self.set_converting(False)
+        QMessageBox.critical(self, "Error",
+                             f"Failed to create {self.output_format.upper()}: {message}")
+
+    def conversion_cancelled(self):
+        self.set_converting(False)
+
+    def compare_formats(self):
+        """Show output size and encode time of each format for the current frames"""
         if not self.image_list:
             QMessageBox.warning(self, "Warning", "No images selected.")
             return
 
         try:
-            output_file, _ = QFileDialog.getSaveFileName(
-                self,
-                "Save GIF",
-                "",
-                "GIF Files (*.gif)"
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+            try:
+                normalized_images = self.load_normalized_images()
+                if not normalized_images:
+                    return
+                settings = self.encoder_settings()
+                results = frames.compare_formats(
+                    normalized_images, self.delay, 0, settings['quality'],
+                    settings['method'], settings['compress_level'])
+            finally:
+                QApplication.restoreOverrideCursor()
+
+            largest = max(r['bytes'] for r in results) or 1
+            rows = "".join(
+                f"<tr><td>{r['label']}</td>"
+                f"<td align='right'>{r['bytes'] / 1024:.1f} KB</td>"
+                f"<td align='right'>{100 * r['bytes'] / largest:.0f}%</td>"
+                f"<td align='right'>{r['seconds'] * 1000:.0f} ms</td></tr>"
+                for r in results
             )
-
-            if not output_file:
-                return
-
-            # Load and normalize images
-            original_images = []
-            for file in self.image_list:
-                img = Image.open(file)
-                img = img.convert('RGB')
-                original_images.append(img)
-
-            normalized_images = self.normalize_images(original_images)
-            if not normalized_images:
-                return
-
-            # Save as animated GIF
-            normalized_images[0].save(
-                output_file,
-                save_all=True,
-                append_images=normalized_images[1:],
-                duration=self.delay,
-                loop=0,
-                optimize=False
+            QMessageBox.information(
+                self,
+                "Format Comparison",
+                f"<p>{len(normalized_images)} frames, smallest first:</p>"
+                f"<table cellpadding='4'><tr><th>Format</th><th>Size</th>"
+                f"<th>Relative</th><th>Encode</th></tr>{rows}</table>"
             )
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to compare formats: {str(e)}")
 
-            QMessageBox.information(self, "Success", f"GIF saved as {output_file}")
-            self.preview_gif(output_file)
+    def preview_current(self):
+        """Encode the current frames in memory and preview them without saving"""
+        if not self.image_list:
+            QMessageBox.warning(self, "Warning", "No images selected.")
+            return
 
+        try:
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+            try:
+                normalized_images = self.load_normalized_images()
+                if not normalized_images:
+                    return
+                data, details = self.encode_current(normalized_images)
+            finally:
+                QApplication.restoreOverrideCursor()
+
+            title = f"Preview ({self.output_format.upper()}, {len(data) / 1024:.1f} KB)"
+            if details:
+                title = f"Preview ({details})"
+            self.preview_gif(io.BytesIO(data), title)
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to create GIF: {str(e)}")
+            QMessageBox.critical(self, "Error", f"Failed to preview: {str(e)}")
 
-    def preview_gif(self, gif_file):
-        """Show GIF preview in a new dialog"""
+    def preview_gif(self, gif_file, title="GIF Preview"):
+        """Show an animation preview from a file path or in-memory buffer"""
         try:
-            preview_dialog = QDialog(self)
-            preview_dialog.setWindowTitle("GIF Preview")
-            preview_layout = QVBoxLayout(preview_dialog)
+            preview_dialog = AnimationPreviewDialog(gif_file, self.delay, title, self)
+            preview_dialog.exec()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to preview animation: {str(e)}")
 
-            # Create label for the GIF
-            label = QLabel()
-            preview_layout.addWidget(label)
 
-            # Load the GIF frames
-            img = Image.open(gif_file)
-            frames = []
+def main(argv=None):
+    """Run headless when given arguments, otherwise open the GIF Maker window
 
-            try:
-                while True:
-                    # Convert PIL image to QPixmap for display
-                    current_frame = ImageQt.ImageQt(img)
-                    pixmap = QPixmap.fromImage(current_frame)
-                    frames.append(pixmap)
-                    img.seek(len(frames))
-            except EOFError:
-                pass
-
-            if not frames:
-                QMessageBox.critical(self, "Error", "No frames found in GIF")
-                preview_dialog.close()
-                return
-
-            current_frame = 0
-
-            def update_frame():
-                nonlocal current_frame
-                if not preview_dialog.isVisible():
-                    return
-
-                try:
-                    label.setPixmap(frames[current_frame])
-                    current_frame = (current_frame + 1) % len(frames)
-                    preview_dialog.frame_timer = self.startTimer(self.delay)
-                except Exception:
-                    preview_dialog.close()
+    ``--profile`` profiles the next conversion, headless or in the window.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if "--profile" in argv:
+        argv = [arg for arg in argv if arg != "--profile"]
+        capture = profiling.request(profiling.GIF)
+        if argv:
+            with capture.section():
+                status = gif_batch.main(argv)
+            print(capture.report.describe(), file=sys.stderr)
+            return status
 
-            # Handle timer events for frame updates
-            def timerEvent(event):
-                update_frame()
+    if argv:
+        return gif_batch.main(argv)
 
-            preview_dialog.timerEvent = timerEvent
-            preview_dialog.frame_timer = preview_dialog.startTimer(self.delay)
+    app = QApplication(sys.argv[:1])
+    dialog = GifMakerDialog()
+    dialog.show()
+    return app.exec()
 
-            # Start with first frame
-            if frames:
-                label.setPixmap(frames[0])
 
-            preview_dialog.exec()
-        except Exception as e:
-            print(e)
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
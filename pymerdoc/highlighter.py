@@ -0,0 +1,174 @@
+"""Syntax highlighting for the Markdown editor pane.
+
+Each text block (line) records whether it ends inside a code fence, a
+mermaid fence or plain Markdown as its block state. QSyntaxHighlighter
+re-highlights the edited block and carries on to the next one only while
+that state changes, so typing costs the same in a 50k line document as in
+a short one; opening or closing a fence re-highlights just the lines up to
+where the states agree again.
+"""
+import re
+
+from PyQt6.QtGui import QColor, QFont, QSyntaxHighlighter, QTextCharFormat
+
+from pymerdoc import mermaid_parser
+
+# Block states
+TEXT = 0
+CODE = 1
+MERMAID = 2
+
+_FENCE = re.compile(r'^\s{0,3}```\s*(\S*)')
+
+_HEADING = re.compile(r'^#{1,6}\s.*$')
+_QUOTE = re.compile(r'^\s*>.*$')
+_LIST = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s')
+_RULE = re.compile(r'^\s{0,3}(?:(?:-\s*){3,}|(?:\*\s*){3,}|(?:_\s*){3,})$')
+_INLINE_CODE = re.compile(r'`[^`]+`')
+_BOLD = re.compile(r'\*\*[^*]+\*\*|__[^_]+__')
+_ITALIC = re.compile(r'(?<![*\w])\*[^*\s][^*]*\*(?!\*)|(?<![_\w])_[^_\s][^_]*_(?![_\w])')
+_LINK = re.compile(r'!?\[[^\]]*\]\([^)]*\)')
+
+_MERMAID_KEYWORDS = re.compile(r'\b(?:%s)\b' % '|'.join(re.escape(word) for word in (
+    mermaid_parser.FLOWCHART_KEYWORDS + mermaid_parser.SEQUENCE_KEYWORDS +
+    mermaid_parser.CLASS_KEYWORDS + mermaid_parser.STATE_KEYWORDS + mermaid_parser.DIRECTIONS +
+    ('erDiagram', 'gantt', 'pie', 'journey', 'gitGraph', 'mindmap', 'timeline',
+     'subgraph', 'end', 'participant', 'actor', 'as', 'loop', 'alt', 'else', 'opt', 'par',
+     'critical', 'break', 'rect', 'note', 'over', 'left of', 'right of',
+     'activate', 'deactivate', 'autonumber', 'class', 'classDef', 'style', 'linkStyle',
+     'click', 'direction', 'state', 'title', 'section'))))
+_MERMAID_ARROW = re.compile(
+    r'<?\|?(?:[-=]{2,}|-\.+-|\.{2,})(?:\|?>{1,2}|\)|[xo](?!\w))?|-(?:>>?|\)|x(?!\w))')
+_MERMAID_STRING = re.compile(r'"[^"]*"|\|[^|]*\|')
+_MERMAID_COMMENT = re.compile(r'%%.*$')
+
+# Colors per role for light and dark editor backgrounds
+PALETTES = {
+    False: {
+        'heading': '#0550ae', 'quote': '#57606a', 'list': '#953800', 'code': '#0a3069',
+        'link': '#8250df', 'fence': '#6e7781', 'keyword': '#cf222e', 'arrow': '#116329',
+        'string': '#0a3069', 'comment': '#6e7781',
+    },
+    True: {
+        'heading': '#3daee9', 'quote': '#8b949e', 'list': '#ffa657', 'code': '#a5d6ff',
+        'link': '#d2a8ff', 'fence': '#8b949e', 'keyword': '#ff7b72', 'arrow': '#7ee787',
+        'string': '#a5d6ff', 'comment': '#8b949e',
+    },
+}
+
+
+def mermaid_block_at(block):
+    """The ```mermaid block a text block is part of, as (opening block, source)
+
+    Returns None outside mermaid blocks, fences included. Only the lines of
+    that one block are visited, using the states set while highlighting.
+    """
+    def inside(candidate):
+        return candidate.isValid() and candidate.userState() == MERMAID
+
+    # The opening fence and the body are in the mermaid state, the closing fence follows it
+    opening = block if inside(block) else block.previous()
+    if not inside(opening):
+        return None
+    while inside(opening.previous()):
+        opening = opening.previous()
+    lines = []
+    line = opening.next()
+    while inside(line):
+        lines.append(line.text())
+        line = line.next()
+    return opening, "\n".join(lines)
+
+
+def _format(color, bold=False, italic=False):
+    fmt = QTextCharFormat()
+    fmt.setForeground(QColor(color))
+    if bold:
+        fmt.setFontWeight(QFont.Weight.Bold)
+    if italic:
+        fmt.setFontItalic(True)
+    return fmt
+
+
+class MarkdownHighlighter(QSyntaxHighlighter):
+    """Highlights Markdown and the mermaid inside ```mermaid fences"""
+
+    def __init__(self, document, is_dark=False):
+        super().__init__(document)
+        # The first pass over the document is queued by QSyntaxHighlighter itself
+        self._set_colors(is_dark)
+
+    def set_dark(self, is_dark):
+        """Switch colors; the whole document is highlighted again only on change"""
+        if bool(is_dark) != self.is_dark:
+            self._set_colors(is_dark)
+            self.rehighlight()
+
+    def _set_colors(self, is_dark):
+        self.is_dark = bool(is_dark)
+        colors = PALETTES[self.is_dark]
+        self.formats = {
+            'heading': _format(colors['heading'], bold=True),
+            'quote': _format(colors['quote'], italic=True),
+            'list': _format(colors['list'], bold=True),
+            'rule': _format(colors['fence']),
+            'code': _format(colors['code']),
+            'bold': _format(colors['heading'], bold=True),
+            'italic': _format(colors['quote'], italic=True),
+            'link': _format(colors['link']),
+            'fence': _format(colors['fence'], bold=True),
+            'keyword': _format(colors['keyword'], bold=True),
+            'arrow': _format(colors['arrow'], bold=True),
+            'string': _format(colors['string']),
+            'comment': _format(colors['comment'], italic=True),
+        }
+
+    def highlightBlock(self, text):
+        state = self.previousBlockState()
+        fence = _FENCE.match(text)
+        if state in (CODE, MERMAID):
+            if fence and not fence.group(1):
+                self.setFormat(0, len(text), self.formats['fence'])
+                self.setCurrentBlockState(TEXT)
+            elif state == MERMAID:
+                self._highlight_mermaid(text)
+                self.setCurrentBlockState(MERMAID)
+            else:
+                self.setFormat(0, len(text), self.formats['code'])
+                self.setCurrentBlockState(CODE)
+            return
+
+        if fence:
+            self.setFormat(0, len(text), self.formats['fence'])
+            self.setCurrentBlockState(MERMAID if fence.group(1) == 'mermaid' else CODE)
+            return
+        self.setCurrentBlockState(TEXT)
+        self._highlight_markdown(text)
+
+    def _apply(self, pattern, text, role):
+        for match in pattern.finditer(text):
+            self.setFormat(match.start(), match.end() - match.start(), self.formats[role])
+
+    def _highlight_markdown(self, text):
+        if _HEADING.match(text):
+            self.setFormat(0, len(text), self.formats['heading'])
+            return
+        if _RULE.match(text):
+            self.setFormat(0, len(text), self.formats['rule'])
+            return
+        if _QUOTE.match(text):
+            self.setFormat(0, len(text), self.formats['quote'])
+        marker = _LIST.match(text)
+        if marker:
+            self.setFormat(0, marker.end(), self.formats['list'])
+        self._apply(_ITALIC, text, 'italic')
+        self._apply(_BOLD, text, 'bold')
+        self._apply(_LINK, text, 'link')
+        # Last, so nothing inside a code span is styled as markup
+        self._apply(_INLINE_CODE, text, 'code')
+
+    def _highlight_mermaid(self, text):
+        self._apply(_MERMAID_KEYWORDS, text, 'keyword')
+        self._apply(_MERMAID_ARROW, text, 'arrow')
+        self._apply(_MERMAID_STRING, text, 'string')
+        self._apply(_MERMAID_COMMENT, text, 'comment')
@@ -0,0 +1,97 @@
+"""Large-graph rendering mode for Mermaid diagrams.
+
+Mermaid refuses sources over ``maxTextSize`` characters or with more than
+``maxEdges`` edges, and its default dagre layout slows down badly on graphs
+with thousands of nodes. Diagrams whose node count, edge count or size
+passes the thresholds below are rendered with raised limits. Flowcharts
+also switch to the ELK layout; the pinned Mermaid only offers ELK for
+flowcharts, so other diagram types keep their layout and get the raised
+limits alone.
+"""
+from dataclasses import dataclass
+
+from pymerdoc import mermaid_parser
+
+LARGE_NODE_COUNT = 500
+LARGE_EDGE_COUNT = 400
+LARGE_TEXT_SIZE = 40000  # mermaid's default maxTextSize is 50000
+LARGE_GRAPH_TIMEOUT = 180000
+
+LARGE_GRAPH_CONFIG = {
+    'maxTextSize': 10000000,
+    'maxEdges': 100000,
+    'flowchart': {'htmlLabels': False, 'defaultRenderer': 'elk'},
+}
+
+
+@dataclass(frozen=True)
+class GraphSize:
+    """Node and edge counts and source length of a diagram"""
+    nodes: int
+    edges: int
+    text_size: int
+
+    @property
+    def large(self):
+        return (self.nodes >= LARGE_NODE_COUNT or self.edges >= LARGE_EDGE_COUNT
+                or self.text_size >= LARGE_TEXT_SIZE)
+
+    def describe(self):
+        return f"{self.nodes:,} nodes, {self.edges:,} edges"
+
+
+# Statements that declare a node without an edge, per diagram kind
+_DECLARATIONS = {('state', 'state'), ('class', 'class'),
+                 ('sequence', 'participant'), ('sequence', 'actor')}
+
+
+def _count(diagram):
+    nodes = set()
+    edges = 0
+    for statement in diagram.statements:
+        kind = statement[0]
+        if diagram.kind == 'flowchart' and kind == 'chain':
+            groups = statement[1::2]
+            for group in groups:
+                nodes.update(node[1] for node in group)
+            for left, right in zip(groups, groups[1:]):
+                edges += len(left) * len(right)
+        elif kind in ('transition', 'message'):
+            ends = (statement[1], statement[2]) if kind == 'transition' else \
+                (statement[1], statement[4])
+            nodes.update(ends)
+            edges += 1
+        elif kind == 'relation':
+            nodes.update((statement[1], statement[5]))
+            edges += 1
+        elif (diagram.kind, kind) in _DECLARATIONS:
+            nodes.add(statement[1])
+    return len(nodes), edges
+
+
+def graph_size(source, diagram=None):
+    """Measure a diagram; sources that do not parse count only their length"""
+    if diagram is None:
+        try:
+            diagram = mermaid_parser.parse(source)
+        except mermaid_parser.MermaidSyntaxError:
+            return GraphSize(0, 0, len(source))
+    nodes, edges = _count(diagram)
+    return GraphSize(nodes, edges, len(source))
+
+
+def render_config(size):
+    """Mermaid config overrides for a GraphSize, or None for normal graphs"""
+    return dict(LARGE_GRAPH_CONFIG) if size.large else None
+
+
+def format_render_stats(stats):
+    """One-line summary of the timing and memory a render reported"""
+    parts = []
+    if stats.get('renderMs') is not None:
+        parts.append(f"rendered in {stats['renderMs'] / 1000:.1f} s")
+    if stats.get('heapBytes'):
+        parts.append(f"JS heap {stats['heapBytes'] / 1024 ** 2:.0f} MB")
+    if stats.get('svgBytes'):
+        parts.append(f"SVG {stats['svgBytes'] / 1024:.0f} KB")
+    return ", ".join(parts)
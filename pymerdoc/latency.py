@@ -0,0 +1,411 @@
+"""Keystroke-to-paint latency benchmarks for the editor.
+
+`pymerdoc bench` runs the real MarkdownMermaidEditor on the offscreen
+platform with a large synthetic document and replays scripted sessions:
+bursts of typing in prose and in diagram labels (sent as key events), and
+theme switches. For every step it records how long the key events took to
+handle, and the time until the preview page reports the update painted
+through the editor's preview_rendered signal, both from the last keystroke
+(debounce included) and from the start of the preview update.
+
+Results are written as latency distributions in milliseconds; a saved run
+can be passed as the baseline of a later one, which then fails when a
+median or 90th percentile got slower than the tolerance allows:
+
+    pymerdoc bench --mermaid mermaid.min.js --output baseline.json
+    pymerdoc bench --mermaid mermaid.min.js --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from pymerdoc import mermaid_parser
+
+DEFAULT_SECTIONS = 300
+DEFAULT_DIAGRAMS = 40
+DEFAULT_REPEAT = 3
+DEFAULT_TYPING_INTERVAL = 60  # Milliseconds between keystrokes
+DEFAULT_TOLERANCE = 0.15
+RENDER_TIMEOUT = 60.0
+WINDOW_SIZE = (1400, 900)
+PERCENTILES = (50, 90, 99)
+COMPARED = ('p50', 'p90')
+SESSIONS = ('prose', 'diagram', 'theme')
+
+_WORDS = ("pipeline", "runbook", "failover", "cluster", "deploy", "latency", "cache",
+          "replica", "rollback", "ingest", "gateway", "quorum", "shard", "backoff")
+
+
+@dataclass
+class Step:
+    """One measured interaction: typing at a place in the document, or a theme switch
+
+    Text is typed ``back`` characters before the end of block ``line``.
+    """
+    line: int = 0
+    back: int = 0
+    text: str = ""
+    theme: Optional[str] = None
+
+
+@dataclass
+class Session:
+    name: str
+    description: str
+    steps: List[Step] = field(default_factory=list)
+
+
+def _sentence(rng, words=12):
+    text = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _diagram(rng, index, nodes):
+    if index % 2:
+        lines = ["sequenceDiagram"]
+        for n in range(nodes):
+            lines.append(f"    P{n % 4}->>P{(n + 1) % 4}: {rng.choice(_WORDS)} {n}")
+        return lines
+    lines = ["graph TD"]
+    for n in range(1, nodes):
+        lines.append(f"    n{rng.randrange(n)}[Step {rng.randrange(n)}] --> n{n}[Step {n}]")
+    return lines
+
+
+def synthetic_document(sections=DEFAULT_SECTIONS, diagrams=DEFAULT_DIAGRAMS, nodes=12, seed=0):
+    """A large Markdown document of prose, lists, code and mermaid diagrams"""
+    rng = random.Random(seed)
+    every = max(1, sections // diagrams) if diagrams else 0
+    lines = ["# Synthetic runbook", ""]
+    written = 0
+    for section in range(sections):
+        lines += [f"## Section {section + 1}", "",
+                  " ".join(_sentence(rng) for _ in range(4)), "",
+                  f"- **{rng.choice(_WORDS)}**: {_sentence(rng, 6)}",
+                  f"- `{rng.choice(_WORDS)}` {_sentence(rng, 6)}", ""]
+        if section % 7 == 3:
+            lines += ["```bash", f"pymerdoc build {rng.choice(_WORDS)} -o site", "```", ""]
+        if every and section % every == 0 and written < diagrams:
+            lines += ["```mermaid"] + _diagram(rng, written, nodes) + ["```", ""]
+            written += 1
+    return "\n".join(lines)
+
+
+def _spread(candidates, count):
+    """count entries spread evenly over candidates"""
+    if not candidates:
+        return []
+    return [candidates[(i * len(candidates)) // count] for i in range(count)]
+
+
+def build_sessions(content, bursts=8, names=SESSIONS):
+    """Scripted sessions for a document made by synthetic_document"""
+    lines = content.split("\n")
+    in_fence = False
+    paragraphs, labels = [], []
+    for number, line in enumerate(lines):
+        if line.startswith("```"):
+            in_fence = not in_fence
+        elif in_fence:
+            if line.endswith("]"):
+                labels.append(number)
+        elif line and line[0].isalpha():
+            paragraphs.append(number)
+
+    available = {
+        'prose': Session("prose", "words typed at the end of paragraphs",
+                         [Step(line, 0, f" {_WORDS[i % len(_WORDS)]}")
+                          for i, line in enumerate(_spread(paragraphs, bursts))]),
+        'diagram': Session("diagram", "diagram node labels extended by a word",
+                           [Step(line, 1, f" {_WORDS[i % len(_WORDS)]}")
+                            for i, line in enumerate(_spread(labels, bursts))]),
+        'theme': Session("theme", "switching between the dark and light themes",
+                         [Step(theme=("dark", "light")[i % 2]) for i in range(max(2, bursts // 2))]),
+    }
+    return [available[name] for name in names]
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-p * len(sorted_values) // 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples):
+    """Distribution of latency samples in milliseconds"""
+    values = sorted(samples)
+    summary = {'count': len(values),
+               'mean': round(statistics.fmean(values), 3) if values else 0.0,
+               'max': round(values[-1], 3) if values else 0.0}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = round(percentile(values, p), 3)
+    return summary
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Compare two runs; returns (rows, regressions)
+
+    Each row is (session, metric, statistic, baseline ms, current ms, ratio).
+    """
+    rows, regressions = [], []
+    for name, metrics in results['sessions'].items():
+        for metric, summary in metrics.items():
+            before = baseline.get('sessions', {}).get(name, {}).get(metric)
+            if not before:
+                continue
+            for stat in COMPARED:
+                base, now = before.get(stat, 0.0), summary.get(stat, 0.0)
+                ratio = now / base if base else 1.0
+                row = (name, metric, stat, base, now, ratio)
+                rows.append(row)
+                if ratio > 1 + tolerance:
+                    regressions.append(row)
+    return rows, regressions
+
+
+def format_results(results):
+    lines = [f"{'session':<10}{'metric':<11}{'count':>6}{'p50':>10}{'p90':>10}"
+             f"{'p99':>10}{'max':>10}  (ms)"]
+    for name, metrics in results['sessions'].items():
+        for metric, s in metrics.items():
+            lines.append(f"{name:<10}{metric:<11}{s['count']:>6}{s['p50']:>10.1f}"
+                         f"{s['p90']:>10.1f}{s['p99']:>10.1f}{s['max']:>10.1f}")
+    return "\n".join(lines)
+
+
+class BenchmarkError(Exception):
+    """The preview never reported an update painted"""
+
+
+class _Harness:
+    """Drives one offscreen editor window"""
+
+    def __init__(self, editor, typing_interval):
+        from PyQt6.QtCore import QEventLoop, QTimer
+        self.editor = editor
+        self.typing_interval = typing_interval
+        self.painted = None
+        self.update_started = None
+        self._loop = QEventLoop()
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._loop.quit)
+        self._expected = 0
+        editor.preview_rendered.connect(self._on_rendered)
+        # Timed ahead of the editor's own handler
+        editor.preview_timer.timeout.disconnect(editor.update_preview)
+        editor.preview_timer.timeout.connect(self._on_update)
+
+    def _on_update(self):
+        self.update_started = time.perf_counter()
+        self.editor.update_preview()
+
+    def _on_rendered(self, token):
+        if token > self._expected and self.painted is None:
+            self.painted = time.perf_counter()
+            self._loop.quit()
+
+    def arm(self):
+        """Wait for the next update painted after this point"""
+        self._expected = self.editor.preview_token
+        self.painted = None
+        self.update_started = None
+
+    def wait(self):
+        if self.painted is None:
+            self._timer.start(int(RENDER_TIMEOUT * 1000))
+            self._loop.exec()
+            self._timer.stop()
+        if self.painted is None:
+            raise BenchmarkError(f"no painted preview within {RENDER_TIMEOUT:.0f} s")
+        return self.painted
+
+    def open(self, content):
+        self.editor.editor.setPlainText(content)
+        self.editor.preview_timer.stop()
+        self.arm()
+        started = time.perf_counter()
+        self.editor.update_preview()
+        return (self.wait() - started) * 1000
+
+    def run_step(self, step, samples):
+        from PyQt6.QtGui import QTextCursor
+        from PyQt6.QtTest import QTest
+
+        if step.theme:
+            self.arm()
+            started = time.perf_counter()
+            self.editor.theme_manager.apply_theme(step.theme)
+            samples['update'].append((self.wait() - started) * 1000)
+            return
+
+        cursor = QTextCursor(self.editor.editor.document().findBlockByNumber(step.line))
+        cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+        cursor.movePosition(QTextCursor.MoveOperation.Left, n=step.back)
+        self.editor.editor.setTextCursor(cursor)
+        self.arm()
+        for char in step.text:
+            QTest.qWait(self.typing_interval)
+            started = time.perf_counter()
+            QTest.keyClicks(self.editor.editor, char)
+            samples['keystroke'].append((time.perf_counter() - started) * 1000)
+        last_key = time.perf_counter()
+        painted = self.wait()
+        samples['paint'].append((painted - last_key) * 1000)
+        if self.update_started is not None:
+            samples['update'].append((painted - self.update_started) * 1000)
+
+
+def run_benchmark(content, sessions, repeat=DEFAULT_REPEAT, typing_interval=DEFAULT_TYPING_INTERVAL,
+                  preview_delay=None, editor=None):
+    """Replay sessions against an editor and return the results dictionary
+
+    Needs a running QApplication; a window is created unless one is passed.
+    """
+    from PyQt6.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+    from pymerdoc import mermaid_render
+
+    if editor is None:
+        from pymerdoc.main import MarkdownMermaidEditor
+        editor = MarkdownMermaidEditor()
+        editor.resize(*WINDOW_SIZE)
+        editor.show()
+    if preview_delay is not None:
+        editor.preview_delay = preview_delay
+    editor.theme_manager.apply_theme(editor.theme_manager.LIGHT)
+    harness = _Harness(editor, typing_interval)
+
+    opened = [harness.open(content)]
+    samples = {}
+    for session in sessions:
+        session_samples = samples.setdefault(session.name, {'keystroke': [], 'paint': [], 'update': []})
+        for _ in range(repeat):
+            for step in session.steps:
+                harness.run_step(step, session_samples)
+        # The next session starts from the same document
+        opened.append(harness.open(content))
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'qt': QT_VERSION_STR,
+            'pyqt': PYQT_VERSION_STR,
+            'platform': platform.platform(),
+            'mermaid': mermaid_render.MERMAID_URL,
+            'preview_delay_ms': editor.preview_delay,
+            'typing_interval_ms': typing_interval,
+        },
+        'document': {
+            'lines': content.count("\n") + 1,
+            'diagrams': len(mermaid_parser.MARKDOWN_BLOCK.findall(content)),
+        },
+        'open': summarize(opened),
+        'sessions': {name: {metric: summarize(values) for metric, values in metrics.items() if values}
+                     for name, metrics in samples.items()},
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pymerdoc bench",
+        description="Measure keystroke-to-paint latency of the editor on a synthetic document."
+    )
+    parser.add_argument("--mermaid", metavar="FILE",
+                        help="local mermaid.min.js to render with, so no network time is "
+                             "measured (default: $PYMERDOC_MERMAID_URL or the CDN)")
+    parser.add_argument("--sessions", default=",".join(SESSIONS),
+                        help="comma separated sessions to run (default: %(default)s)")
+    parser.add_argument("--sections", type=int, default=DEFAULT_SECTIONS,
+                        help="sections in the synthetic document (default: %(default)s)")
+    parser.add_argument("--diagrams", type=int, default=DEFAULT_DIAGRAMS,
+                        help="mermaid diagrams in the document (default: %(default)s)")
+    parser.add_argument("--document", metavar="FILE",
+                        help="benchmark this Markdown file instead of a synthetic one")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="times each session is replayed (default: %(default)s)")
+    parser.add_argument("--typing-interval", type=int, default=DEFAULT_TYPING_INTERVAL, metavar="MS",
+                        help="pause between keystrokes (default: %(default)s)")
+    parser.add_argument("--preview-delay", type=int, metavar="MS",
+                        help="override the editor's preview debounce")
+    parser.add_argument("-o", "--output", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown of p50/p90 against the baseline (default: %(default)s)")
+    return parser
+
+
+def main(argv=None):
+    """Command line entry point for `pymerdoc bench`"""
+    args = build_parser().parse_args(argv)
+    names = [name.strip() for name in args.sessions.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SESSIONS]
+    if unknown:
+        print(f"pymerdoc-bench: unknown session(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    baseline = None
+    try:
+        if args.document:
+            with open(args.document, encoding='utf-8') as f:
+                content = f.read()
+        else:
+            content = synthetic_document(args.sections, args.diagrams)
+        if args.baseline:
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"pymerdoc-bench: {e}", file=sys.stderr)
+        return 1
+    sessions = build_sessions(content, names=names)
+
+    # Nothing is shown, so run without a display unless one was requested
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtCore import QUrl
+    from PyQt6.QtWidgets import QApplication
+    from pymerdoc import mermaid_render, preview_scheme
+
+    if args.mermaid:
+        mermaid_render.MERMAID_URL = QUrl.fromLocalFile(os.path.abspath(args.mermaid)).toString()
+    elif not os.environ.get("PYMERDOC_MERMAID_URL"):
+        print("pymerdoc-bench: loading mermaid from the CDN; pass --mermaid for stable numbers",
+              file=sys.stderr)
+    preview_scheme.register_scheme()
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    app.setApplicationName("pymerdoc-bench")
+
+    try:
+        results = run_benchmark(content, sessions, args.repeat, args.typing_interval,
+                                args.preview_delay)
+    except BenchmarkError as e:
+        print(f"pymerdoc-bench: {e}", file=sys.stderr)
+        return 1
+
+    print(f"{results['document']['lines']} lines, {results['document']['diagrams']} diagrams; "
+          f"opening took {results['open']['p50']:.0f} ms (median)")
+    print(format_results(results))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+    if baseline is None:
+        return 0
+
+    rows, regressions = compare(results, baseline, args.tolerance)
+    print(f"\nAgainst {args.baseline}:")
+    for name, metric, stat, base, now, ratio in rows:
+        flag = "  SLOWER" if (name, metric, stat, base, now, ratio) in regressions else ""
+        print(f"  {name:<10}{metric:<11}{stat:<5}{base:>10.1f} -> {now:>10.1f} ms ({ratio:.2f}x){flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
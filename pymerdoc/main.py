@@ -1,22 +1,34 @@
 import sys
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
-                             QSplitter, QTextEdit, QMenuBar, QMenu, QMessageBox, QFileDialog)
+                             QSplitter, QTextEdit, QMenuBar, QMenu, QMessageBox, QFileDialog,
+                             QInputDialog, QLabel)
 from PyQt6.QtGui import QAction, QKeySequence, QActionGroup
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtCore import QTimer
-import markdown
-import re
-
+from PyQt6.QtCore import QTimer, QUrl, pyqtSignal
+import argparse
+import json
+import os
+
+from pymerdoc import bundle, large_graph, mermaid_parser, preview_scheme, profiling, webengine
+from pymerdoc.core import document
+from pymerdoc.highlighter import MarkdownHighlighter, mermaid_block_at
 from pymerdoc.mc import MermaidConverterDialog
 from pymerdoc.theme_manager import ThemeManager
 
+FOCUS_DELAY = 30  # Milliseconds after a keystroke before the focused diagram renders
+FOCUS_PREVIEW_DELAY = 5000  # How long the full preview waits while a diagram is in focus
+
 # def create_settings_menu(window):
     # Add Settings menu to menubar
         # Create settings menu
     # create_settings_menu(window)
     # return settings_menu
 
+
 class MarkdownMermaidEditor(QMainWindow):
+    # Emitted with a new token once the preview page has painted an update
+    preview_rendered = pyqtSignal(int)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Documentation Editor")
@@ -53,6 +65,7 @@ class MarkdownMermaidEditor(QMainWindow):
         # Editor
         self.editor = QTextEdit()
         self.editor.setPlaceholderText("Enter your Markdown content here...\nUse ```mermaid blocks for diagrams")
+        self.highlighter = MarkdownHighlighter(self.editor.document())
         editor_layout.addWidget(self.editor)
 
         # Right pane: Preview
@@ -64,15 +77,21 @@ class MarkdownMermaidEditor(QMainWindow):
         self.web_view = QWebEngineView()
         preview_layout.addWidget(self.web_view)
 
-        # Add both panes to splitter
+        # Focus mode pane: just the diagram under the cursor
+        self.focus_view = QWebEngineView()
+        self.focus_view.hide()
+
+        # Add the panes to splitter
         splitter.addWidget(editor_widget)
         splitter.addWidget(preview_widget)
-        splitter.setSizes([400, 800])
+        splitter.addWidget(self.focus_view)
+        splitter.setSizes([400, 800, 400])
 
         # Set up preview timer for debouncing
         self.preview_timer = QTimer()
         self.preview_timer.setSingleShot(True)
         self.preview_timer.timeout.connect(self.update_preview)
+        self.preview_delay = 1000  # Milliseconds without typing before the preview updates
 
         # Connect signals
         self.editor.textChanged.connect(self.start_preview_timer)
@@ -81,6 +100,40 @@ class MarkdownMermaidEditor(QMainWindow):
         self.current_file = None
         # Initialize theme manager
         self.current_preview_theme = "default"  # For mermaid theme tracking
+        self.last_preview_key = None  # Structure of the last rendered preview
+        self.diagram_cache = {}  # Diagram structure key -> rendered SVG
+        self.preview_diagrams = []  # (source, structure key) per diagram in the preview
+        self.preview_generation = 0
+        self.preview_pending = 0  # Diagrams of the current generation still rendering
+        self.preview_prefilled = set()  # Diagram indexes already in a cached page
+        self.preview_errors = {}  # Diagram index -> syntax error shown in its place
+        self.bundle = None  # Open .pmdoc bundle, read lazily
+        self.preview_source = preview_scheme.PreviewSource(f"editor-{id(self)}")
+        if preview_scheme.registered():
+            preview_scheme.preview_handler(self.web_view.page().profile()).add_source(self.preview_source)
+        self.preview_token = 0  # Last token passed to the page's previewRendered()
+        self.web_view.loadFinished.connect(self._render_preview_diagrams)
+        self.web_view.titleChanged.connect(self._on_preview_title)
+
+        # Focus mode renders the diagram being edited on its own, ahead of the preview
+        self.focus_timer = QTimer()
+        self.focus_timer.setSingleShot(True)
+        self.focus_timer.timeout.connect(self.update_focus)
+        self.focus_block = None  # Block number of the focused diagram's opening fence
+        self.focus_key = None  # Structure key of the diagram in the focus pane
+        self.focus_theme = None  # Theme the focus page was loaded with
+        self.focus_shown = ("", "")  # SVG and error in the focus pane
+        self.focus_ready = False
+        self.focus_view.loadFinished.connect(self._focus_loaded)
+        self.editor.cursorPositionChanged.connect(self._focus_cursor_moved)
+
+        # Renderer memory in the status bar; idle hidden pages are discarded over budget
+        monitor = webengine.renderer_monitor()
+        monitor.track(self.web_view.page())
+        monitor.track(self.focus_view.page())
+        self.memory_label = QLabel()
+        self.statusBar().addPermanentWidget(self.memory_label)
+        monitor.measured.connect(self._show_renderer_memory)
 
 
 
@@ -89,31 +142,20 @@ class MarkdownMermaidEditor(QMainWindow):
 
     def start_preview_timer(self):
         """Start timer for delayed preview update"""
-        self.preview_timer.start(1000)  # 1 second delay
+        delay = self.preview_delay
+        if self.focus_action.isChecked() and self._focused_diagram() is not None:
+            # The focus pane follows this diagram; the rest of the preview can wait
+            self.focus_timer.start(FOCUS_DELAY)
+            delay = FOCUS_PREVIEW_DELAY
+        self.preview_timer.start(delay)
 
     def _process_mermaid_blocks(self, content):
         """Convert markdown code blocks to HTML with special handling for mermaid"""
-        # Pattern to match mermaid code blocks
-        pattern = r'```mermaid\n(.*?)\n```'
-
-        def replace_mermaid(match):
-            diagram_content = match.group(1)
-            return f'<div class="mermaid">\n{diagram_content}\n</div>'
-
-        # Replace mermaid blocks before markdown conversion
-        processed_content = re.sub(pattern, replace_mermaid, content, flags=re.DOTALL)
-        return processed_content
+        return document.process_mermaid_blocks(content)
 
     def _convert_markdown_to_html(self, content):
         """Convert markdown to HTML while preserving mermaid diagrams"""
-        # First process mermaid blocks
-        processed_content = self._process_mermaid_blocks(content)
-
-        # Convert to HTML using the markdown library
-        md = markdown.Markdown(extensions=['fenced_code', 'tables', 'codehilite'])
-        html_content = md.convert(processed_content)
-
-        return html_content
+        return document.convert_markdown_to_html(content)
 
     def create_menu_bar(self):
         """Create and initialize all menus"""
@@ -165,6 +207,12 @@ class MarkdownMermaidEditor(QMainWindow):
         tools_menu.addAction(gif_maker_action)
         self.create_mermaid_converter_menu(tools_menu)
 
+        # Render the diagram under the cursor in a side pane while editing it
+        self.focus_action = QAction("Focus Mode", self, checkable=True)
+        self.focus_action.setShortcut(QKeySequence("Ctrl+Shift+F"))
+        self.focus_action.toggled.connect(self.set_focus_mode)
+        tools_menu.addAction(self.focus_action)
+
     def _create_settings_menu(self, menubar):
         """Create Settings menu with theme options"""
         settings_menu = menubar.addMenu("Settings")
@@ -207,9 +255,15 @@ class MarkdownMermaidEditor(QMainWindow):
         about_action.triggered.connect(self.show_about_dialog)
         help_menu.addAction(about_action)
 
+        # Profile slow previews or conversions for bug reports
+        profile_action = QAction("Capture Profile...", self)
+        profile_action.triggered.connect(self.capture_profile)
+        help_menu.addAction(profile_action)
+
     def new_file(self):
         """Create a new file"""
         if self.maybe_save():
+            self._close_bundle()
             self.editor.clear()
             self.current_file = None
             self.setWindowTitle("Documentation Editor - Untitled")
@@ -219,6 +273,8 @@ class MarkdownMermaidEditor(QMainWindow):
         try:
             dialog = MermaidConverterDialog(self)
             dialog.exec()
+            # Closing it should also end its renderer process
+            dialog.deleteLater()
         except Exception as e:
             QMessageBox.warning(self, "Error",
                                 f"Could not open Mermaid Converter: {str(e)}")
@@ -227,18 +283,107 @@ class MarkdownMermaidEditor(QMainWindow):
         if self.maybe_save():
             filename, _ = QFileDialog.getOpenFileName(
                 self, "Open Markdown File", "",
-                "Markdown Files (*.md);;All Files (*)"
+                "Markdown Files (*.md *.pmdoc);;PyMerDoc Bundles (*.pmdoc);;All Files (*)"
             )
             if filename:
                 try:
-                    with open(filename, 'r', encoding='utf-8') as file:
-                        self.editor.setPlainText(file.read())
+                    if bundle.is_bundle(filename):
+                        self._open_bundle(filename)
+                    else:
+                        with open(filename, 'r', encoding='utf-8') as file:
+                            self.editor.setPlainText(file.read())
+                        self._close_bundle()
                     self.current_file = filename
                     self.setWindowTitle(f"Documentation Editor - {filename}")
                 except Exception as e:
                     QMessageBox.warning(self, "Error",
                                         f"Could not open file: {str(e)}")
 
+    def _close_bundle(self):
+        if self.bundle is not None:
+            self.bundle.close()
+            self.bundle = None
+
+    def _open_bundle(self, filename):
+        """Load a bundle and show its cached preview before rendering anything"""
+        opened = bundle.DocumentBundle(filename)
+        self._close_bundle()
+        self.bundle = opened
+        self.current_file = filename
+        self.diagram_cache = {}
+        content = opened.markdown
+        self.editor.setPlainText(content)
+
+        page = opened.cached_page(self.current_preview_theme)
+        if page is None:
+            self.last_preview_key = None
+            self.update_preview()
+            return
+
+        # Show the saved page; only diagrams missing from the bundle are rendered
+        self.preview_timer.stop()
+        self.last_preview_key = mermaid_parser.markdown_structure_key(
+            content, self.current_preview_theme, strict=False)
+        self.preview_generation += 1
+        self.preview_pending = 0
+        self.preview_diagrams = []
+        self.preview_errors = {}
+        for index, source in enumerate(mermaid_parser.MARKDOWN_BLOCK.findall(content)):
+            key, error = self._diagram_key(source)
+            if error:
+                self.preview_errors[index] = error
+            self.preview_diagrams.append((source, key))
+        self.preview_prefilled = {index for index, (_, key) in enumerate(self.preview_diagrams)
+                                  if opened.has_diagram(key)}
+        self._show_page(page)
+
+    def _cached_diagram(self, key):
+        """Rendered SVG for a structure key from memory or the open bundle"""
+        svg = self.diagram_cache.get(key)
+        if svg is None and self.bundle is not None:
+            svg = self.bundle.diagram(key)
+            if svg is not None:
+                self.diagram_cache[key] = svg
+        return svg
+
+    def _save_bundle(self, filename):
+        """Save the document, its images and its current renders as a bundle"""
+        content = self.editor.toPlainText()
+        theme = self.current_preview_theme
+        diagrams = {}
+        for source in mermaid_parser.MARKDOWN_BLOCK.findall(content):
+            key, _ = self._diagram_key(source)
+            svg = self._cached_diagram(key)
+            if svg is not None:
+                diagrams[key] = svg
+
+        # Rendered diagrams go into the page after markdown conversion
+        placeholders = []
+
+        def replace(source):
+            placeholders.append(source)
+            return document.mermaid_div(f"pmdoc-diagram-{len(placeholders) - 1}")
+
+        html_content = document.convert_markdown_to_html(content, replace)
+        for index, source in enumerate(placeholders):
+            svg = diagrams.get(self._diagram_key(source)[0])
+            html_content = html_content.replace(
+                f"pmdoc-diagram-{index}\n", (svg if svg is not None else source) + "\n", 1)
+
+        # Images come from the open bundle, or the folder of the file being converted
+        base_dir = None
+        if self.current_file and not bundle.is_bundle(self.current_file):
+            base_dir = os.path.dirname(os.path.abspath(self.current_file))
+
+        missing = bundle.save_bundle(filename, content, base_dir, diagrams,
+                                     {theme: self._preview_page(html_content)}, self.bundle)
+        self.bundle = None
+        self.bundle = bundle.DocumentBundle(filename)
+        if missing:
+            QMessageBox.warning(self, "Bundle Saved",
+                                "These images were not found and are not in the bundle:\n"
+                                + "\n".join(missing))
+
     def save_file(self):
         """Save the current file"""
         if self.current_file:
@@ -250,7 +395,7 @@ class MarkdownMermaidEditor(QMainWindow):
         """Save the current file with a new name"""
         filename, _ = QFileDialog.getSaveFileName(
             self, "Save Markdown File", "",
-            "Markdown Files (*.md);;All Files (*)"
+            "Markdown Files (*.md);;PyMerDoc Bundles (*.pmdoc);;All Files (*)"
         )
         if filename:
             self._save_file(filename)
@@ -258,8 +403,11 @@ class MarkdownMermaidEditor(QMainWindow):
     def _save_file(self, filename):
         """Save the file to disk"""
         try:
-            with open(filename, 'w', encoding='utf-8') as file:
-                file.write(self.editor.toPlainText())
+            if bundle.is_bundle(filename):
+                self._save_bundle(filename)
+            else:
+                with open(filename, 'w', encoding='utf-8') as file:
+                    file.write(self.editor.toPlainText())
             self.current_file = filename
             self.setWindowTitle(f"Documentation Editor - {filename}")
         except Exception as e:
@@ -288,7 +436,7 @@ class MarkdownMermaidEditor(QMainWindow):
 
     def show_gif_maker(self):
         """Show the GIF maker dialog"""
-        from gm import GifMakerDialog
+        from pymerdoc.gm import GifMakerDialog
         dialog = GifMakerDialog(self)
         dialog.exec()
 
@@ -327,6 +475,39 @@ class MarkdownMermaidEditor(QMainWindow):
         QMessageBox.about(self, "About PyMerDoc", about_text)
 
 
+    def capture_profile(self):
+        """Profile the next preview updates or the next GIF conversion"""
+        choices = [f"Next {profiling.DEFAULT_PREVIEW_COUNT} preview updates",
+                   "Next GIF conversion"]
+        choice, ok = QInputDialog.getItem(self, "Capture Profile",
+                                          "Profile:", choices, 0, False)
+        if not ok:
+            return
+        if choice == choices[0]:
+            profiling.request(profiling.PREVIEW, profiling.DEFAULT_PREVIEW_COUNT)
+            self.statusBar().showMessage("Profiling the next preview updates...")
+            self.last_preview_key = None
+            self.update_preview()
+        else:
+            profiling.request(profiling.GIF)
+            self.statusBar().showMessage("Profiling the next GIF conversion...")
+
+    def _preview_finished(self):
+        """Close the profiled section of a preview update, if one is open"""
+        if self.preview_pending:
+            return  # Still rendering the diagrams of the current generation
+        capture = profiling.active(profiling.PREVIEW)
+        report = capture.end() if capture is not None else None
+        if report is not None:
+            QMessageBox.information(self, "Profile Captured", report.describe())
+        # The page reports back through its title once the update is painted
+        self.preview_token += 1
+        self.web_view.page().runJavaScript(f"previewRendered({self.preview_token})")
+
+    def _on_preview_title(self, title):
+        if title.startswith(document.RENDERED_TITLE):
+            self.preview_rendered.emit(int(title[len(document.RENDERED_TITLE):]))
+
     def closeEvent(self, event):
         """Handle application closing"""
         if self.maybe_save():
@@ -336,75 +517,259 @@ class MarkdownMermaidEditor(QMainWindow):
 
     def update_preview(self):
         """Update the preview with current content"""
+        capture = profiling.active(profiling.PREVIEW)
+        if capture is not None:
+            capture.begin()
+        if self.focus_action.isChecked() and self.focus_theme != self.current_preview_theme:
+            self.update_focus()  # Reload the focus pane in the new theme
         content = self.editor.toPlainText()
 
+        # Skip edits that would render the same preview; a diagram that does
+        # not parse is keyed by its text and shows its error in place
+        preview_key = mermaid_parser.markdown_structure_key(
+            content, self.current_preview_theme, strict=False)
+        if preview_key == self.last_preview_key:
+            self._preview_finished()
+            return
+        self.last_preview_key = preview_key
+
+        # Diagrams are rendered by the shared render service once the page loads
+        self.preview_generation += 1
+        self.preview_pending = 0
+        self.preview_prefilled = set()
+        self.preview_diagrams = []
+        self.preview_errors = {}
+        for index, source in enumerate(mermaid_parser.MARKDOWN_BLOCK.findall(content)):
+            key, error = self._diagram_key(source)
+            if error:
+                self.preview_errors[index] = error
+            self.preview_diagrams.append((source, key))
+        if self.preview_errors:
+            index, error = next(iter(self.preview_errors.items()))
+            self.statusBar().showMessage(f"Diagram {index + 1}: {error}")
+        else:
+            self.statusBar().clearMessage()
+        keys = {key for _, key in self.preview_diagrams}
+        self.diagram_cache = {k: v for k, v in self.diagram_cache.items() if k in keys}
+
         # Convert markdown to HTML
         html_content = self._convert_markdown_to_html(content)
+        self._show_page(self._preview_page(html_content))
+
+    def _diagram_key(self, source):
+        """(key, syntax error message) of a diagram in the preview theme
 
-        # Determine preview theme
-        preview_bg = "#ffffff" if self.current_preview_theme == "light" else "#1e1e1e"
-        preview_color = "#24292e" if self.current_preview_theme == "light" else "#ffffff"
-
-        # Create complete HTML document
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <style>
-                body {{ 
-                    margin: 0; 
-                    padding: 20px;
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-                    line-height: 1.6;
-                    color: {preview_color};
-                    background-color: {preview_bg};
-                }}
-                pre {{ 
-                    background-color: {'#f6f8fa' if self.current_preview_theme == "light" else '#2d2d2d'}; 
-                    padding: 16px;
-                    border-radius: 6px;
-                    overflow: auto;
-                }}
-                code {{ 
-                    font-family: SFMono-Regular, Consolas, 'Liberation Mono', Menlo, monospace;
-                    font-size: 85%;
-                }}
-                .mermaid {{
-                    text-align: center;
-                    margin: 20px 0;
-                    background: {'white' if self.current_preview_theme == "light" else '#1e1e1e'};
-                }}
-                table {{
-                    border-collapse: collapse;
-                    margin: 15px 0;
-                }}
-                th, td {{
-                    border: 1px solid {'#ddd' if self.current_preview_theme == "light" else '#3c3c3c'};
-                    padding: 8px;
-                }}
-                th {{
-                    background-color: {'#f6f8fa' if self.current_preview_theme == "light" else '#2d2d2d'};
-                }}
-            </style>
-            <script src="https://cdnjs.cloudflare.com/ajax/libs/mermaid/10.6.1/mermaid.min.js"></script>
-        </head>
-        <body>
-            {html_content}
-            <script>
-                mermaid.initialize({{
-                    startOnLoad: true,
-                    theme: '{self.current_preview_theme}',
-                    securityLevel: 'loose'
-                }});
-            </script>
-        </body>
-        </html>
+        A diagram the parser rejects is keyed by its text and gets a message.
         """
+        theme = self.current_preview_theme
+        try:
+            return mermaid_parser.structure_key(source, theme), ""
+        except mermaid_parser.MermaidSyntaxError as e:
+            return mermaid_parser.source_key(source, theme), f"Mermaid syntax error at {e}"
+
+    def _show_page(self, html):
+        """Load a preview page, served through the pymerdoc scheme when it is registered"""
+        base_dir = None
+        if self.current_file and not bundle.is_bundle(self.current_file):
+            base_dir = os.path.dirname(os.path.abspath(self.current_file))
+        if preview_scheme.registered():
+            # Images are served at display size; exports read the originals
+            pixels = self.web_view.width() if self.web_view.isVisible() else self.screen().geometry().width()
+            self.preview_source.image_width = preview_scheme.variant_width(
+                pixels * self.web_view.devicePixelRatioF())
+            self.web_view.load(self.preview_source.set_page(html, base_dir, self.bundle))
+        else:
+            # setHtml is limited to 2 MB and cannot read bundle assets
+            self.web_view.setHtml(html, QUrl.fromLocalFile(os.path.join(base_dir, ""))
+                                  if base_dir else QUrl())
+
+    def _preview_page(self, html_content):
+        """Wrap converted markdown in the themed preview page"""
+        return document.preview_page(html_content, self.current_preview_theme)
+
+    def _render_preview_diagrams(self, ok):
+        """Fill the loaded preview with cached or freshly rendered diagrams"""
+        if not ok or not self.preview_diagrams:
+            self._preview_finished()
+            return
+        from pymerdoc.mermaid_render import shared_render_service
+        service = shared_render_service()
+        generation = self.preview_generation
+        errors = self.preview_errors
+        renderable = [(index, source, key) for index, (source, key)
+                      in enumerate(self.preview_diagrams) if index not in errors]
+        cached = {key: self._cached_diagram(key) for _, _, key in renderable}
+        self.preview_pending = sum(1 for _, _, key in renderable if cached[key] is None)
+
+        for index, error in errors.items():
+            self._show_diagram(index, "", error)
+        for index, source, key in renderable:
+            if cached[key] is not None:
+                if index not in self.preview_prefilled:
+                    self._show_diagram(index, cached[key])
+                continue
 
-        self.web_view.setHtml(html)
-def main():
-    app = QApplication(sys.argv)
+            size = large_graph.graph_size(source)
+            if size.large:
+                self.statusBar().showMessage(
+                    f"Rendering large diagram {index + 1} ({size.describe()})...")
+
+            def on_rendered(result, index=index, key=key, size=size):
+                if result.ok:
+                    self.diagram_cache[key] = result.svg
+                if size.large:
+                    self.statusBar().showMessage(
+                        f"Large diagram {index + 1} ({size.describe()}): "
+                        f"{large_graph.format_render_stats(result.stats) or 'failed'}")
+                if generation == self.preview_generation:
+                    self._show_diagram(index, result.svg, result.error)
+                    self.preview_pending -= 1
+                    if not self.preview_pending:
+                        self._preview_finished()
+
+            service.submit(f"editor-{id(self)}-{index}", source, on_rendered,
+                           theme=self.current_preview_theme,
+                           config=large_graph.render_config(size) or {})
+
+        if not self.preview_pending:
+            self._preview_finished()
+
+    def set_focus_mode(self, enabled):
+        """Show or hide the pane with the diagram under the cursor"""
+        self.focus_view.setVisible(enabled)
+        if enabled:
+            self.focus_block = None
+            self.update_focus()
+            return
+        self.focus_timer.stop()
+        if self.preview_timer.isActive():
+            # Catch up on edits the full preview was deferring
+            self.preview_timer.stop()
+            self.update_preview()
+
+    def _focused_diagram(self):
+        """(opening block, source) of the mermaid block under the cursor, or None"""
+        return mermaid_block_at(self.editor.textCursor().block())
+
+    def _focus_cursor_moved(self):
+        if not self.focus_action.isChecked():
+            return
+        focused = self._focused_diagram()
+        if focused is not None and focused[0].blockNumber() != self.focus_block:
+            self.focus_timer.start(0)
+
+    def update_focus(self):
+        """Render the diagram under the cursor into the focus pane"""
+        if not self.focus_action.isChecked():
+            return
+        theme = self.current_preview_theme
+        if theme != self.focus_theme:
+            self.focus_theme = theme
+            self.focus_ready = False
+            self.focus_key = None
+            self.focus_view.setHtml(self._preview_page('<div class="mermaid"></div>'))
+        focused = self._focused_diagram()
+        if focused is None:
+            return  # Keep showing the last diagram
+        opening, source = focused
+        self.focus_block = opening.blockNumber()
+
+        try:
+            key = mermaid_parser.structure_key(source, theme)
+        except mermaid_parser.MermaidSyntaxError as e:
+            self.focus_key = None
+            self._show_focus("", f"Mermaid syntax error at {e}")
+            return
+        if key == self.focus_key:
+            return
+        self.focus_key = key
+        svg = self._cached_diagram(key)
+        if svg is not None:
+            self._show_focus(svg)
+            return
+
+        def on_rendered(result):
+            if result.ok:
+                # Shared with the full preview, which then skips this diagram
+                self.diagram_cache[key] = result.svg
+            if key == self.focus_key:
+                self._show_focus(result.svg, result.error)
+
+        from pymerdoc.mermaid_render import shared_render_service
+        shared_render_service().submit(f"focus-{id(self)}", source, on_rendered,
+                                       theme=theme, priority=True)
+
+    def _show_focus(self, svg, error=""):
+        self.focus_shown = (svg, error)
+        if self.focus_ready:
+            self.focus_view.page().runJavaScript(
+                f"showDiagram(0, {json.dumps(svg)}, {json.dumps(error)})")
+
+    def _focus_loaded(self, ok):
+        self.focus_ready = ok
+        if ok:
+            self._show_focus(*self.focus_shown)
+
+    def _show_renderer_memory(self, total, processes):
+        self.memory_label.setText(webengine.format_memory(total, processes))
+
+    def _show_diagram(self, index, svg, error=""):
+        """Replace the source of the index-th diagram in the preview"""
+        self.web_view.page().runJavaScript(
+            f"showDiagram({index}, {json.dumps(svg)}, {json.dumps(error)})")
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pymerdoc",
+        description="Markdown editor with live Mermaid previews. Run `pymerdoc build "
+                    "--help` for headless builds, `pymerdoc serve --help` for the "
+                    "HTTP render server and `pymerdoc bench --help` for latency benchmarks."
+    )
+    parser.add_argument("--profile", type=int, nargs="?", metavar="N",
+                        const=profiling.DEFAULT_PREVIEW_COUNT,
+                        help="profile the next N preview updates (default: %(const)s) and "
+                             "write a pstats file and text report")
+    parser.add_argument("--profile-dir", metavar="DIR",
+                        help=f"where profiles are written (default: {profiling.default_output_dir()})")
+    parser.add_argument("--process-model", choices=webengine.PROCESS_MODELS,
+                        help="web view renderer processes: one per page (default), at most "
+                             "--renderer-limit (limited) or inside the application (single); "
+                             f"also set by {webengine.MODEL_ENV}")
+    parser.add_argument("--renderer-limit", type=int, default=webengine.DEFAULT_RENDERER_LIMIT,
+                        help="renderer processes with --process-model limited (default: %(default)s)")
+    parser.add_argument("--memory-budget", type=int, metavar="MB",
+                        help="renderer memory above which hidden idle pages are discarded "
+                             f"(default: {webengine.DEFAULT_MEMORY_BUDGET_MB}, "
+                             f"or {webengine.BUDGET_ENV})")
+    return parser
+
+
+def main(argv=None):
+    """Open the editor, or run a subcommand such as `build`"""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "build":
+        from pymerdoc import build
+        return build.main(argv[1:])
+    if argv and argv[0] == "serve":
+        from pymerdoc import server
+        return server.main(argv[1:])
+    if argv and argv[0] == "bench":
+        from pymerdoc import latency
+        return latency.main(argv[1:])
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        # Chromium reads its flags when the QApplication starts
+        webengine.configure(args.process_model, args.renderer_limit, args.memory_budget)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.profile:
+        profiling.request(profiling.PREVIEW, args.profile, args.profile_dir)
+
+    preview_scheme.register_scheme()
+    app = QApplication(sys.argv[:1])
     window = MarkdownMermaidEditor()
     window.show()
     sys.exit(app.exec())
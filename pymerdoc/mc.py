@@ -1,7 +1,14 @@
-from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTextEdit, QPushButton,
-                             QLabel, QFileDialog, QSplitter, QWidget)
+from PyQt6.QtWidgets import (QApplication, QDialog, QVBoxLayout, QHBoxLayout, QTextEdit,
+                             QPushButton, QLabel, QFileDialog, QSplitter, QWidget, QMessageBox,
+                             QInputDialog, QProgressBar, QCheckBox, QSpinBox)
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtCore import QUrl, QTimer, pyqtSlot
+from PyQt6.QtCore import Qt, QUrl, QTimer, pyqtSlot
+import json
+import sys
+
+from pymerdoc import (large_graph, mermaid_animation, mermaid_parser, mermaid_render,
+                      png_export, svg_optimizer, webengine)
+from pymerdoc.theme_manager import ThemeManager
 
 
 class MermaidConverterDialog(QDialog):
@@ -10,9 +17,10 @@ class MermaidConverterDialog(QDialog):
         self.setWindowTitle("Mermaid Diagram Converter")
         self.setMinimumSize(1000, 600)
 
-        # Get theme from parent
+        # Get theme from parent, or from saved settings when run standalone
         self.parent_window = parent
-        self.is_dark_mode = self.parent_window.theme_manager.get_theme() == "dark"
+        self.theme_manager = getattr(parent, 'theme_manager', None) or ThemeManager(None)
+        self.is_dark_mode = self.theme_manager.is_dark()
 
         # Create main layout
         layout = QVBoxLayout(self)
@@ -39,6 +47,14 @@ class MermaidConverterDialog(QDialog):
         self.editor.setPlaceholderText("Enter your Mermaid diagram code here...")
         editor_layout.addWidget(self.editor)
 
+        # Syntax errors found before rendering
+        self.error_label = QLabel()
+        self.error_label.setStyleSheet("color: #e05252;")
+        self.error_label.setWordWrap(True)
+        self.error_label.hide()
+        editor_layout.addWidget(self.error_label)
+        self.last_preview_key = None
+
         # Buttons
         button_layout = QHBoxLayout()
         button_layout.setSpacing(10)
@@ -46,12 +62,33 @@ class MermaidConverterDialog(QDialog):
         self.preview_button = QPushButton("Update Preview")
         self.save_svg_button = QPushButton("Save as SVG")
         self.save_png_button = QPushButton("Save as PNG")
+        self.save_animation_button = QPushButton("Save Animation")
+        self.save_animation_button.setToolTip(
+            "Render each '%% step' section as a frame of an animated GIF/WebP/APNG")
 
-        for button in [self.preview_button, self.save_svg_button, self.save_png_button]:
+        for button in [self.preview_button, self.save_svg_button, self.save_png_button,
+                       self.save_animation_button]:
             button_layout.addWidget(button)
 
         editor_layout.addLayout(button_layout)
 
+        # SVG export options
+        svg_options_layout = QHBoxLayout()
+        self.optimize_svg_check = QCheckBox("Optimize SVG on export")
+        self.optimize_svg_check.setChecked(True)
+        self.optimize_svg_check.setToolTip(
+            "Deduplicate styles and defs, round coordinates, strip unused IDs and whitespace")
+        self.svg_precision_spin = QSpinBox()
+        self.svg_precision_spin.setRange(0, 6)
+        self.svg_precision_spin.setValue(svg_optimizer.DEFAULT_PRECISION)
+        self.svg_precision_spin.setToolTip("Decimals kept in coordinates")
+        self.optimize_svg_check.toggled.connect(self.svg_precision_spin.setEnabled)
+        svg_options_layout.addWidget(self.optimize_svg_check)
+        svg_options_layout.addWidget(QLabel("Decimals:"))
+        svg_options_layout.addWidget(self.svg_precision_spin)
+        svg_options_layout.addStretch()
+        editor_layout.addLayout(svg_options_layout)
+
         # Right pane: Preview
         preview_widget = QWidget()
         preview_layout = QVBoxLayout(preview_widget)
@@ -66,47 +103,64 @@ class MermaidConverterDialog(QDialog):
         # Web view for preview
         self.web_view = QWebEngineView()
         preview_layout.addWidget(self.web_view)
+        webengine.renderer_monitor().track(self.web_view.page())
+
+        # Large-graph renders run for a while; show progress and the cost
+        self.render_progress = QProgressBar()
+        self.render_progress.setRange(0, 0)
+        self.render_progress.setMaximumHeight(6)
+        self.render_progress.setTextVisible(False)
+        self.render_progress.hide()
+        preview_layout.addWidget(self.render_progress)
+        self.render_status = QLabel()
+        self.render_status.hide()
+        preview_layout.addWidget(self.render_status)
+        self.render_size = None
 
         # Add both panes to splitter
         splitter.addWidget(editor_widget)
         splitter.addWidget(preview_widget)
         splitter.setSizes([400, 600])
 
-        # Set up the HTML template with CDN
-        self.html_template = '''
+        # Preview shell, loaded once; rendered SVGs are pushed into it
+        self.preview_template = '''
         <!DOCTYPE html>
         <html>
         <head>
-            <script src="https://cdn.jsdelivr.net/npm/mermaid@10.6.1/dist/mermaid.min.js"></script>
-            <script>
-                mermaid.initialize({{
-                    startOnLoad: true,
-                    theme: '{theme}'
-                }});
-            </script>
+            <meta charset="UTF-8">
             <style>
-                body {{ 
-                    margin: 0; 
+                body {{
+                    margin: 0;
                     padding: 20px;
                     background-color: {bg_color};
                     color: {text_color};
                 }}
-                #diagram {{ width: 100%; }}
+                #diagram {{ width: 100%; text-align: center; }}
+                #diagram svg {{ max-width: 100%; height: auto; }}
+                #error {{ color: #e05252; white-space: pre-wrap; font-family: monospace; }}
             </style>
         </head>
         <body>
-            <div class="mermaid" id="diagram">
-{diagram_code}
-            </div>
+            <div id="diagram"></div>
+            <div id="error"></div>
             <script>
-                function getSVG() {{
-                    const svgElement = document.querySelector("#diagram svg");
-                    return svgElement ? svgElement.outerHTML : '';
+                function showSvg(svg) {{
+                    document.getElementById("diagram").innerHTML = svg;
+                    document.getElementById("error").textContent = "";
+                }}
+                function showError(message) {{
+                    document.getElementById("error").textContent = message;
                 }}
             </script>
         </body>
         </html>
         '''
+        self.render_service = mermaid_render.shared_render_service()
+        self.render_key = f"converter-{id(self)}"
+        self.current_svg = ""
+        self.preview_loaded = False
+        self.pending_script = None
+        self.web_view.loadFinished.connect(self._on_preview_loaded)
 
         # Set up sample diagram
         sample_diagram = """graph TD
@@ -118,9 +172,10 @@ class MermaidConverterDialog(QDialog):
         self.editor.setText(sample_diagram)
 
         # Connect signals
-        self.preview_button.clicked.connect(self.update_preview)
+        self.preview_button.clicked.connect(lambda: self.update_preview(force=True))
         self.save_svg_button.clicked.connect(self.save_svg)
         self.save_png_button.clicked.connect(self.save_png)
+        self.save_animation_button.clicked.connect(self.save_animation)
         self.editor.textChanged.connect(self.start_preview_timer)
 
         # Setup preview timer for debouncing
@@ -131,94 +186,99 @@ class MermaidConverterDialog(QDialog):
         # Apply theme
         self.apply_theme()
 
+        # Load the preview shell with theme-specific colors
+        self.web_view.setHtml(self.preview_template.format(
+            bg_color="#2e2e2e" if self.is_dark_mode else "#ffffff",
+            text_color="#ffffff" if self.is_dark_mode else "#000000"
+        ))
+
         # Initial preview
         self.update_preview()
 
     def apply_theme(self):
         """Apply the current theme to all widgets"""
-        is_dark = self.is_dark_mode
-
-        # Colors for dark/light themes
-        bg_color = "#2e2e2e" if is_dark else "#ffffff"
-        text_color = "#ffffff" if is_dark else "#000000"
-        editor_bg = "#3c3c3c" if is_dark else "#ffffff"
-        border_color = "#555555" if is_dark else "#cccccc"
-        button_bg = "#424242" if is_dark else "#f0f0f0"
-        button_hover = "#4f4f4f" if is_dark else "#e0e0e0"
-        accent_color = "#3daee9"
-
-        # Dialog style
-        self.setStyleSheet(f"""
-            QDialog {{
-                background-color: {bg_color};
-                color: {text_color};
-            }}
-            QLabel {{
-                color: {text_color};
-            }}
-            QTextEdit {{
-                background-color: {editor_bg};
-                color: {text_color};
-                border: 1px solid {border_color};
-                border-radius: 4px;
-                padding: 8px;
-            }}
-        """)
-
-        # Button style
-        button_style = f"""
-            QPushButton {{
-                background-color: {button_bg};
-                color: {text_color};
-                border: 1px solid {border_color};
-                border-radius: 4px;
-                padding: 8px 16px;
-                min-width: 120px;
-            }}
-            QPushButton:hover {{
-                background-color: {button_hover};
-                border: 1px solid {accent_color};
-            }}
-            QPushButton:pressed {{
-                background-color: {"#383838" if is_dark else "#d0d0d0"};
-            }}
-        """
-
-        # Apply button style
-        for button in [self.preview_button, self.save_svg_button, self.save_png_button]:
-            button.setStyleSheet(button_style)
+        # One shared stylesheet on the dialog instead of one per widget
+        self.theme_manager.apply_dialog_theme(self, self.is_dark_mode)
 
     def start_preview_timer(self):
         """Start timer for delayed preview update"""
         self.preview_timer.start(1000)  # 1 second delay
 
-    def update_preview(self):
-        """Update the preview with current diagram code"""
-        diagram_code = self.editor.toPlainText()
-
-        # Set theme-specific colors
-        bg_color = "#2e2e2e" if self.is_dark_mode else "#ffffff"
-        text_color = "#ffffff" if self.is_dark_mode else "#000000"
-        mermaid_theme = "dark" if self.is_dark_mode else "default"
+    def update_preview(self, force=False):
+        """Update the preview with current diagram code
 
-        html_content = self.html_template.format(
-            diagram_code=diagram_code,
-            theme=mermaid_theme,
-            bg_color=bg_color,
-            text_color=text_color
-        )
-        self.web_view.setHtml(html_content)
+        Invalid code is reported without rendering, and unless force is set,
+        code whose structure has not changed since the last render is skipped.
+        """
+        diagram_code = self.editor.toPlainText()
+        mermaid_theme = self.mermaid_theme()
+
+        try:
+            diagram = mermaid_parser.parse(diagram_code)
+        except mermaid_parser.MermaidSyntaxError as e:
+            self.error_label.setText(f"Syntax error at {e}")
+            self.error_label.show()
+            return
+        self.error_label.hide()
+        preview_key = mermaid_parser.diagram_key(diagram, mermaid_theme)
+        if preview_key == self.last_preview_key and not force:
+            return
+        self.last_preview_key = preview_key
+
+        self.render_size = large_graph.graph_size(diagram_code, diagram)
+        if self.render_size.large:
+            self.render_status.setText(
+                f"Large graph mode ({self.render_size.describe()}): rendering...")
+            self.render_status.show()
+            self.render_progress.show()
+        else:
+            self.render_status.hide()
+        self.render_service.submit(self.render_key, diagram_code, self._show_render_result,
+                                   theme=mermaid_theme,
+                                   config=large_graph.render_config(self.render_size) or {})
+
+    def _on_preview_loaded(self, ok):
+        """Flush the latest result once the preview shell has loaded"""
+        self.preview_loaded = ok
+        if ok and self.pending_script:
+            self.web_view.page().runJavaScript(self.pending_script)
+            self.pending_script = None
+
+    def _show_render_result(self, result):
+        """Show a result from the render service in the preview"""
+        self.render_progress.hide()
+        if self.render_size is not None and self.render_size.large:
+            self.render_status.setText(
+                f"Large graph mode ({self.render_size.describe()}): "
+                f"{large_graph.format_render_stats(result.stats) or 'failed'}")
+        if result.ok:
+            self.current_svg = result.svg
+            script = f"showSvg({json.dumps(result.svg)})"
+        else:
+            script = f"showError({json.dumps(result.error)})"
+        if self.preview_loaded:
+            self.web_view.page().runJavaScript(script)
+        else:
+            self.pending_script = script
+
+    def mermaid_theme(self):
+        """Mermaid theme matching the dialog's light/dark mode"""
+        return "dark" if self.is_dark_mode else "default"
 
     @pyqtSlot()
     def save_svg(self):
         """Save the diagram as SVG"""
-        self.web_view.page().runJavaScript(
-            "getSVG()",
-            self._handle_svg_content
-        )
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        result = self.render_service.render_sync(self.editor.toPlainText(),
+                                                 theme=self.mermaid_theme())
+        QApplication.restoreOverrideCursor()
+        if not result.ok:
+            QMessageBox.critical(self, "Error", f"Failed to render diagram: {result.error}")
+            return
+        self._handle_svg_content(result.svg)
 
     def _handle_svg_content(self, svg_content):
-        """Handle the SVG content after JavaScript execution"""
+        """Write rendered SVG to a file, optimizing it first if enabled"""
         if svg_content:
             file_name, _ = QFileDialog.getSaveFileName(
                 self,
@@ -227,16 +287,108 @@ class MermaidConverterDialog(QDialog):
                 "SVG files (*.svg)"
             )
             if file_name:
+                optimization = None
+                if self.optimize_svg_check.isChecked():
+                    optimization = svg_optimizer.optimize_svg(
+                        svg_content, self.svg_precision_spin.value())
+                    svg_content = optimization.svg
                 with open(file_name, 'w', encoding='utf-8') as f:
                     f.write(svg_content)
+                if optimization:
+                    QMessageBox.information(
+                        self, "SVG Saved",
+                        f"Saved {file_name}\nOptimized: {optimization.describe()}")
 
     def save_png(self):
-        """Save the diagram as PNG"""
+        """Save the diagram as PNG, rasterized offscreen at a chosen DPI"""
         file_name, _ = QFileDialog.getSaveFileName(
             self,
             "Save PNG",
             "",
             "PNG files (*.png)"
         )
-        if file_name:
-            self.web_view.grab().save(file_name, 'PNG')
\ No newline at end of file
+        if not file_name:
+            return
+
+        dpi, ok = QInputDialog.getInt(
+            self,
+            "PNG Resolution",
+            "Export resolution (DPI, 96 = 1x):",
+            value=192,
+            min=48,
+            max=1200,
+            step=48
+        )
+        if not ok:
+            return
+
+        background = "#2e2e2e" if self.is_dark_mode else "#ffffff"
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            png_export.export_png(
+                self.get_renderer(),
+                self.editor.toPlainText(),
+                file_name,
+                scale=png_export.scale_for_dpi(dpi),
+                background=background,
+                dpi=dpi
+            )
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, "Error", f"Failed to save PNG: {str(e)}")
+            return
+        QApplication.restoreOverrideCursor()
+
+    def get_renderer(self):
+        """Return a renderer for exports backed by the shared render service"""
+        return self.render_service.for_theme(self.mermaid_theme())
+
+    def save_animation(self):
+        """Render each step of the diagram offscreen and save them as an animation"""
+        steps = mermaid_animation.split_steps(self.editor.toPlainText())
+        if len(steps) < 2:
+            QMessageBox.information(
+                self, "Save Animation",
+                "Add '%% step' comment lines to the diagram to mark where each "
+                "animation frame ends.")
+            return
+
+        file_name, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save Animation",
+            "",
+            "GIF files (*.gif);;Animated WebP files (*.webp);;APNG files (*.png)"
+        )
+        if not file_name:
+            return
+
+        background = "#2e2e2e" if self.is_dark_mode else "#ffffff"
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            count = mermaid_animation.render_animation(
+                steps, file_name, background=background, renderer=self.get_renderer())
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, "Error", f"Failed to save animation: {str(e)}")
+            return
+        QApplication.restoreOverrideCursor()
+        QMessageBox.information(self, "Success", f"Saved {count} frames to {file_name}")
+
+
+def main(argv=None):
+    """Open the converter window, or run a subcommand such as `animate`"""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "animate":
+        return mermaid_animation.main(argv[1:])
+    if argv and argv[0] == "optimize-svg":
+        return svg_optimizer.main(argv[1:])
+
+    app = QApplication(sys.argv)
+    dialog = MermaidConverterDialog()
+    dialog.show()
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Render Mermaid diagrams straight into animations.
+
+Frames come either from a sequence of diagram sources or from a single
+source split at ``%% step`` comment markers, where each step reveals the
+lines up to the next marker. Every step is rendered offscreen and the
+in-memory images go directly to the animation encoder.
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+
+from pymerdoc import gif_batch
+from pymerdoc.core import frames
+
+STEP_MARKER = re.compile(r'^\s*%%\s*step\b.*$', re.IGNORECASE)
+
+
+def split_steps(source):
+    """Split a source at %% step markers into cumulative step sources
+
+    Lines before the first marker (the diagram header, styles) appear in
+    every step. A source without markers yields a single step.
+    """
+    sections = [[]]
+    for line in source.splitlines():
+        if STEP_MARKER.match(line):
+            sections.append([])
+        else:
+            sections[-1].append(line)
+
+    if len(sections) == 1:
+        return [source]
+
+    header, steps = sections[0], sections[1:]
+    sources = []
+    lines = list(header)
+    for section in steps:
+        lines.extend(section)
+        sources.append("\n".join(lines))
+    return sources
+
+
+def expand_sources(patterns):
+    """Expand files and glob patterns into an ordered list of source files"""
+    files = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            files.extend(sorted(glob.glob(pattern), key=gif_batch.natural_sort_key))
+        elif os.path.isfile(pattern):
+            files.append(pattern)
+        else:
+            raise FileNotFoundError(f"No such diagram source: {pattern}")
+    return files
+
+
+def render_frames(renderer, sources, scale=2.0, background="white", timeout=30000):
+    """Render each source to a Pillow image with an existing MermaidRenderer"""
+    images = []
+    for index, source in enumerate(sources, start=1):
+        result = renderer.render_sync(source, scale, background, timeout)
+        if not result.ok:
+            raise RuntimeError(f"Step {index} failed to render: {result.error}")
+        images.append(result.image())
+    return images
+
+
+def render_animation(sources, output, fmt=None, delay=frames.DEFAULT_DELAY, loop=0,
+                     scale=2.0, background="white", theme="default", renderer=None,
+                     **encoder_settings):
+    """Render diagram sources and encode them as an animation file
+
+    Returns the number of frames written. A QApplication must exist.
+    """
+    from pymerdoc.mermaid_render import MermaidRenderer
+
+    if not sources:
+        raise ValueError("No diagram sources to render")
+
+    owns_renderer = renderer is None
+    if owns_renderer:
+        renderer = MermaidRenderer(theme)
+    try:
+        images = render_frames(renderer, sources, scale, background)
+    finally:
+        if owns_renderer:
+            renderer.deleteLater()
+
+    bg_color = gif_batch.parse_color(background)
+    normalized = frames.normalize_frames(images, bg_color)
+    frames.save_animation(normalized, output, fmt or frames.format_from_path(output),
+                          delay, loop, **encoder_settings)
+    return len(normalized)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pymerdoc-mc animate",
+        description="Render Mermaid sources into an animated GIF, WebP or APNG. "
+                    "Several sources become one frame each; a single source is "
+                    "split at '%%%% step' comment lines into progressive frames."
+    )
+    parser.add_argument("sources", nargs="+", help="mermaid files or glob patterns")
+    parser.add_argument("-o", "--output", required=True,
+                        help="output file (.gif, .webp or .png)")
+    parser.add_argument("-f", "--format", choices=sorted(frames.ANIMATION_FORMATS),
+                        help="output format (default: from the output extension)")
+    parser.add_argument("-d", "--delay", type=int, default=frames.DEFAULT_DELAY,
+                        help="delay between frames in ms (default: %(default)s)")
+    parser.add_argument("--loop", type=int, default=0,
+                        help="loop count, 0 loops forever (default: %(default)s)")
+    parser.add_argument("--scale", type=float, default=2.0,
+                        help="render scale factor (default: %(default)s)")
+    parser.add_argument("-b", "--background", default="white",
+                        help="background color (default: %(default)s)")
+    parser.add_argument("--theme", default="default",
+                        help="mermaid theme (default: %(default)s)")
+    return parser
+
+
+def main(argv=None):
+    """Command line entry point for `pymerdoc-mc animate`"""
+    args = build_parser().parse_args(argv)
+
+    try:
+        files = expand_sources(args.sources)
+        texts = []
+        for path in files:
+            with open(path, 'r', encoding='utf-8') as f:
+                texts.append(f.read())
+    except OSError as e:
+        print(f"pymerdoc-mc: {e}", file=sys.stderr)
+        return 2
+    if not texts:
+        print("pymerdoc-mc: no diagram sources matched", file=sys.stderr)
+        return 2
+
+    sources = split_steps(texts[0]) if len(texts) == 1 else texts
+
+    # Nothing is shown, so run without a display unless one was requested
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    from pymerdoc.mermaid_render import MermaidRenderer
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    renderer = MermaidRenderer(args.theme, app)
+
+    try:
+        count = render_animation(sources, args.output, args.format, args.delay, args.loop,
+                                 args.scale, args.background, args.theme, renderer)
+    except (RuntimeError, ValueError, OSError) as e:
+        print(f"pymerdoc-mc: {e}", file=sys.stderr)
+        return 1
+
+    print(f"{args.output} ({count} frames)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,611 @@
+"""Lightweight Python-side Mermaid parser.
+
+Parses flowchart, sequence, class and state diagrams into a normalized
+structure so that broken input can be reported with a line and column
+before a render is attempted, and so that edits which only touch
+whitespace or comments can skip rendering altogether. Other diagram types
+are passed through line by line without validation.
+
+The parser is deliberately permissive: it only rejects input that mermaid
+would certainly fail on (unbalanced brackets and blocks, dangling edges,
+statements it cannot make sense of).
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Tuple
+
+
+class MermaidSyntaxError(ValueError):
+    """A syntax error with a 1-based line and column"""
+
+    def __init__(self, message, line, column=1):
+        super().__init__(f"line {line}, column {column}: {message}")
+        self.message = message
+        self.line = line
+        self.column = column
+
+
+@dataclass(frozen=True)
+class Diagram:
+    """Normalized diagram: kind, header tokens and statement tuples"""
+    kind: str
+    header: Tuple[str, ...]
+    statements: Tuple[tuple, ...]
+
+
+FLOWCHART_KEYWORDS = ('graph', 'flowchart')
+SEQUENCE_KEYWORDS = ('sequenceDiagram',)
+CLASS_KEYWORDS = ('classDiagram', 'classDiagram-v2')
+STATE_KEYWORDS = ('stateDiagram', 'stateDiagram-v2')
+DIRECTIONS = ('TB', 'TD', 'BT', 'RL', 'LR')
+
+
+_TRAILING_COMMENT = re.compile(r'\s+%%(?!\{).*$')
+
+
+def _collapse(text):
+    return ' '.join(text.split())
+
+
+class _Line:
+    __slots__ = ('number', 'column', 'text')
+
+    def __init__(self, number, column, text):
+        self.number = number
+        self.column = column
+        self.text = text
+
+    def error(self, message, offset=0):
+        return MermaidSyntaxError(message, self.number, self.column + offset)
+
+
+def _significant_lines(source):
+    """Yield non-blank, non-comment lines and collect directives/front matter"""
+    lines = []
+    extras = []
+    raw_lines = source.splitlines()
+    index = 0
+
+    # Front matter (config, title) sits between --- lines at the very top
+    while index < len(raw_lines) and not raw_lines[index].strip():
+        index += 1
+    if index < len(raw_lines) and raw_lines[index].strip() == '---':
+        end = index + 1
+        while end < len(raw_lines) and raw_lines[end].strip() != '---':
+            end += 1
+        if end == len(raw_lines):
+            raise MermaidSyntaxError("Front matter is not closed with '---'", index + 1)
+        front = tuple(line.rstrip() for line in raw_lines[index + 1:end] if line.strip())
+        extras.append(('frontmatter',) + front)
+        index = end + 1
+
+    for number in range(index, len(raw_lines)):
+        raw = raw_lines[number]
+        stripped = raw.strip()
+        if not stripped:
+            continue
+        if stripped.startswith('%%{'):
+            extras.append(('directive', _collapse(stripped)))
+            continue
+        if stripped.startswith('%%'):
+            continue
+        stripped = _TRAILING_COMMENT.sub('', stripped)
+        column = len(raw) - len(raw.lstrip()) + 1
+        lines.append(_Line(number + 1, column, stripped))
+    return lines, extras
+
+
+_ACC_LINE = re.compile(r'^(accTitle|accDescr)\s*:\s*(.*)$')
+_ACC_BLOCK = re.compile(r'^accDescr\s*\{(.*)$')
+
+
+def _accessibility(lines):
+    """Split accTitle/accDescr statements, allowed in every diagram type, off the lines
+
+    Returns (statements, remaining lines). ``accDescr { ... }`` may span lines.
+    """
+    statements = []
+    rest = []
+    block = None  # (opening line, collected text) while inside accDescr { ... }
+    for line in lines:
+        if block is None:
+            single = _ACC_LINE.match(line.text)
+            opening = _ACC_BLOCK.match(line.text)
+            if single:
+                statements.append((single.group(1), _collapse(single.group(2))))
+                continue
+            if not opening:
+                rest.append(line)
+                continue
+            block, text = (line, []), opening.group(1)
+        else:
+            text = line.text
+        inside, closed, _ = text.partition('}')
+        block[1].append(inside)
+        if closed:
+            statements.append(('accDescr', _collapse(' '.join(block[1]))))
+            block = None
+    if block is not None:
+        raise block[0].error("'accDescr {' is never closed with '}'")
+    return statements, rest
+
+
+def parse(source):
+    """Parse mermaid source into a Diagram, raising MermaidSyntaxError"""
+    lines, extras = _significant_lines(source)
+    if not lines:
+        raise MermaidSyntaxError("Diagram is empty", 1)
+
+    first = lines[0]
+    # A flowchart header may be followed by statements after ';'
+    header_text, _, rest = first.text.partition(';')
+    header = tuple(header_text.split())
+    keyword = header[0]
+    body = lines[1:]
+    if rest.strip():
+        offset = len(header_text) + 1
+        body.insert(0, _Line(first.number, first.column + offset, rest.strip()))
+    accessibility, body = _accessibility(body)
+    extras += accessibility
+
+    if keyword in FLOWCHART_KEYWORDS:
+        if len(header) > 1 and header[1] not in DIRECTIONS:
+            raise first.error(f"Unknown direction '{header[1]}'", len(keyword) + 1)
+        kind, statements = 'flowchart', _FlowchartParser(body).parse()
+    elif keyword in SEQUENCE_KEYWORDS:
+        kind, statements = 'sequence', _parse_sequence(body)
+    elif keyword in CLASS_KEYWORDS:
+        kind, statements = 'class', _parse_class(body)
+    elif keyword in STATE_KEYWORDS:
+        kind, statements = 'state', _parse_state(body)
+    else:
+        kind, statements = keyword, tuple(('line', _collapse(line.text)) for line in body)
+
+    return Diagram(kind, header, tuple(extras) + tuple(statements))
+
+
+def structure_key(source, *context):
+    """Hash of the normalized structure plus any render context (e.g. theme)
+
+    Two sources with the same key render identically, so a render can be
+    skipped when the key has not changed. Raises MermaidSyntaxError.
+    """
+    return diagram_key(parse(source), *context)
+
+
+def diagram_key(diagram, *context):
+    """structure_key for an already parsed Diagram"""
+    return hashlib.sha1(repr((diagram, context)).encode('utf-8')).hexdigest()
+
+
+def source_key(source, *context):
+    """Key of a diagram by its exact text, for sources the parser rejects"""
+    return hashlib.sha1(repr((source, context)).encode('utf-8')).hexdigest()
+
+
+MARKDOWN_BLOCK = re.compile(r'```mermaid\n(.*?)\n```', re.DOTALL)
+
+
+def markdown_structure_key(content, *context, strict=True):
+    """structure_key for a Markdown document with ```mermaid blocks
+
+    The Markdown text must match exactly, while each diagram only has to
+    match structurally. Errors are reported with document line numbers;
+    unless strict, a diagram that does not parse is keyed by its text.
+    """
+    parts = []
+    position = 0
+    for match in MARKDOWN_BLOCK.finditer(content):
+        parts.append(content[position:match.start(1)])
+        try:
+            parts.append(structure_key(match.group(1)))
+        except MermaidSyntaxError as e:
+            if strict:
+                line = content.count('\n', 0, match.start(1)) + e.line
+                raise MermaidSyntaxError(e.message, line, e.column) from None
+            parts.append(('source', match.group(1)))
+        position = match.end(1)
+    parts.append(content[position:])
+    return hashlib.sha1(repr((parts, context)).encode('utf-8')).hexdigest()
+
+
+# --- Flowchart -------------------------------------------------------------
+
+_NODE_ID = re.compile(r"[\w$!?*+/\\#'`]+(?:[-.](?![-.>=])[\w$!?*+/\\#'`]+)*")
+_SHAPES = [
+    ('(((', (')))',)), ('((', ('))',)), ('([', ('])',)), ('[[', (']]',)),
+    ('[(', (')]',)), ('{{', ('}}',)), ('[/', ('/]', '\\]')), ('[\\', ('\\]', '/]')),
+    ('(', (')',)), ('[', (']',)), ('{', ('}',)), ('>', (']',)),
+]
+_LINK = re.compile(r"""
+    (?P<head>[<xo])?
+    (?:
+        (?P<open>--|==|-\.)(?![-=.>])\s*(?P<text>[^|]+?)\s*(?P<close>-{2,}|={2,}|\.+-)(?P<tail>[>xo])?
+      | (?P<line>-{2,}|={2,}|-\.+-|~~~)(?P<tail2>[>xo])?
+    )
+""", re.VERBOSE)
+_FLOW_KEYWORDS = ('style', 'classDef', 'class', 'click', 'linkStyle', 'direction')
+
+
+class _FlowchartParser:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def parse(self):
+        statements = []
+        subgraphs = []
+        for line in self._split_statements():
+            word = line.text.split(None, 1)[0]
+            if word == 'subgraph':
+                title = _collapse(line.text[len('subgraph'):])
+                subgraphs.append(line)
+                statements.append(('subgraph', title))
+            elif word == 'end':
+                if not subgraphs:
+                    raise line.error("'end' without a matching 'subgraph'")
+                subgraphs.pop()
+                statements.append(('end',))
+            elif word in _FLOW_KEYWORDS:
+                statements.append((word, _collapse(line.text[len(word):])))
+            else:
+                statements.append(self._parse_chain(line))
+        if subgraphs:
+            raise subgraphs[-1].error("'subgraph' is never closed with 'end'")
+        return statements
+
+    def _split_statements(self):
+        """Split lines on ';' outside of quotes and brackets"""
+        for line in self.lines:
+            depth = 0
+            quoted = False
+            start = 0
+            for index, char in enumerate(line.text):
+                if char == '"':
+                    quoted = not quoted
+                elif quoted:
+                    continue
+                elif char in '[({':
+                    depth += 1
+                elif char in '])}':
+                    depth = max(0, depth - 1)
+                elif char == ';' and depth == 0:
+                    part = line.text[start:index]
+                    if part.strip():
+                        yield self._sub_line(line, start, part)
+                    start = index + 1
+            part = line.text[start:]
+            if part.strip():
+                yield self._sub_line(line, start, part)
+
+    @staticmethod
+    def _sub_line(line, start, part):
+        offset = start + len(part) - len(part.lstrip())
+        return _Line(line.number, line.column + offset, part.strip())
+
+    def _parse_chain(self, line):
+        position, group = self._parse_group(line, 0)
+        return ('chain', group) + self._parse_links(line, position)
+
+    def _parse_links(self, line, position):
+        """Parse '(link node-group)*' from position to the end of the line"""
+        text = line.text
+        chain = []
+        while True:
+            position = self._skip_space(text, position)
+            if position >= len(text):
+                break
+            match = _LINK.match(text, position)
+            if not match:
+                raise line.error(f"Unexpected '{text[position:position + 10]}'", position)
+            link_column = position
+            arrow = ((match.group('head') or '')
+                     + (match.group('line') or f"{match.group('open')}{match.group('close')}")
+                     + (match.group('tail') or match.group('tail2') or ''))
+            label = match.group('text')
+            position = self._skip_space(text, match.end())
+            if position < len(text) and text[position] == '|':
+                ends = [index for index in range(position + 1, len(text)) if text[index] == '|']
+                if not ends:
+                    raise line.error("Unclosed '|' in edge label", position)
+                if len(ends) > 1:
+                    # A label may contain '|': it ends at the first '|' the rest parses after
+                    first_error = None
+                    for end in ends:
+                        try:
+                            rest = self._parse_target(line, end + 1, link_column)
+                        except MermaidSyntaxError as e:
+                            first_error = first_error or e
+                            continue
+                        chain.append(('link', arrow, _collapse(text[position + 1:end])))
+                        return tuple(chain) + rest
+                    raise first_error
+                label = text[position + 1:ends[0]]
+                position = ends[0] + 1
+            position = self._skip_space(text, position)
+            if position >= len(text):
+                raise line.error("Edge has no target node", link_column)
+            position, group = self._parse_group(line, position)
+            chain.append(('link', arrow, _collapse(label) if label else ''))
+            chain.append(group)
+        return tuple(chain)
+
+    def _parse_target(self, line, position, link_column):
+        """Parse the node group after a link and the rest of the chain"""
+        position = self._skip_space(line.text, position)
+        if position >= len(line.text):
+            raise line.error("Edge has no target node", link_column)
+        position, group = self._parse_group(line, position)
+        return (group,) + self._parse_links(line, position)
+
+    @staticmethod
+    def _skip_space(text, position):
+        while position < len(text) and text[position].isspace():
+            position += 1
+        return position
+
+    def _parse_group(self, line, position):
+        """Parse 'node (& node)*' starting at position"""
+        nodes = []
+        while True:
+            position, node = self._parse_node(line, self._skip_space(line.text, position))
+            nodes.append(node)
+            after = self._skip_space(line.text, position)
+            if after < len(line.text) and line.text[after] == '&':
+                position = after + 1
+                continue
+            return position, tuple(nodes)
+
+    def _parse_node(self, line, position):
+        text = line.text
+        match = _NODE_ID.match(text, position)
+        if not match:
+            raise line.error(f"Expected a node id, found '{text[position:position + 10]}'",
+                             position)
+        node_id = match.group(0)
+        position = match.end()
+        shape, label = '', ''
+
+        for opener, closers in _SHAPES:
+            if text.startswith(opener, position):
+                start = position
+                position, label = self._read_label(line, position + len(opener),
+                                                   closers, opener, start)
+                shape = opener
+                break
+
+        css_class = ''
+        if text.startswith(':::', position):
+            class_match = re.compile(r'[\w-]+').match(text, position + 3)
+            if not class_match:
+                raise line.error("Expected a class name after ':::'", position)
+            css_class = class_match.group(0)
+            position = class_match.end()
+        return position, ('node', node_id, shape, label, css_class)
+
+    @staticmethod
+    def _read_label(line, position, closers, opener, start):
+        text = line.text
+        quoted = False
+        index = position
+        while index < len(text):
+            char = text[index]
+            if char == '"':
+                quoted = not quoted
+            elif not quoted:
+                for closer in closers:
+                    if text.startswith(closer, index):
+                        return index + len(closer), _collapse(text[position:index])
+            index += 1
+        raise line.error(f"Unclosed '{opener}'", start)
+
+
+# --- Sequence diagrams -----------------------------------------------------
+
+_SEQ_ARROW = r'(?:-->>|->>|-->|->|--x|-x|--\)|-\))'
+_SEQ_MESSAGE = re.compile(
+    r'^(?P<src>[^\s:][^:]*?)\s*(?P<arrow>' + _SEQ_ARROW + r')\s*(?P<act>[+-])?\s*'
+    r'(?P<dst>[^\s:+\-][^:]*?)\s*(?::\s*(?P<text>.*))?$')
+_SEQ_NOTE = re.compile(r'^note\s+(left of|right of|over)\s+([^:]+?)\s*:\s*(.*)$', re.IGNORECASE)
+_SEQ_PARTICIPANT = re.compile(r'^(?:create\s+)?(participant|actor)\s+(.+?)(?:\s+as\s+(.+))?$')
+_SEQ_BLOCKS = ('loop', 'alt', 'opt', 'par', 'critical', 'break', 'rect', 'box')
+_SEQ_BRANCHES = {'else': ('alt',), 'and': ('par',), 'option': ('critical',)}
+_SEQ_SIMPLE = ('autonumber', 'title', 'activate', 'deactivate', 'destroy', 'link', 'links')
+
+
+def _parse_sequence(lines):
+    statements = []
+    blocks = []
+    for line in lines:
+        text = line.text
+        word = re.split(r'[\s:]', text, maxsplit=1)[0]
+        rest = _collapse(text[len(word):])
+
+        if word in _SEQ_BLOCKS:
+            blocks.append((word, line))
+            statements.append(('block', word, rest))
+        elif word in _SEQ_BRANCHES:
+            if not blocks or blocks[-1][0] not in _SEQ_BRANCHES[word]:
+                raise line.error(f"'{word}' outside of a '{_SEQ_BRANCHES[word][0]}' block")
+            statements.append(('branch', word, rest))
+        elif word == 'end':
+            if not blocks:
+                raise line.error("'end' without an open block")
+            blocks.pop()
+            statements.append(('end',))
+        elif word in _SEQ_SIMPLE:
+            statements.append((word, rest))
+        else:
+            participant = _SEQ_PARTICIPANT.match(text)
+            note = _SEQ_NOTE.match(text)
+            message = _SEQ_MESSAGE.match(text)
+            if participant:
+                statements.append((participant.group(1), participant.group(2),
+                                   _collapse(participant.group(3) or '')))
+            elif note:
+                actors = tuple(a.strip() for a in note.group(2).split(','))
+                statements.append(('note', note.group(1).lower(), actors,
+                                   _collapse(note.group(3))))
+            elif message:
+                statements.append(('message', message.group('src'), message.group('arrow'),
+                                   message.group('act') or '', message.group('dst'),
+                                   _collapse(message.group('text') or '')))
+            else:
+                raise line.error("Unrecognized sequence diagram statement")
+    if blocks:
+        word, line = blocks[-1]
+        raise line.error(f"'{word}' block is never closed with 'end'")
+    return statements
+
+
+# --- Class diagrams --------------------------------------------------------
+
+_CLASS_NAME = r'[\w`~.-]+(?:~[^~]+~)?'
+_CLASS_RELATION = re.compile(
+    r'^(?P<a>' + _CLASS_NAME + r')\s*(?:"(?P<ca>[^"]*)"\s*)?'
+    r'(?P<rel>(?:<\||\*|o|<|\(\))?(?:--|\.\.)(?:\|>|\*|o|>|\(\))?)\s*'
+    r'(?:"(?P<cb>[^"]*)"\s*)?(?P<b>' + _CLASS_NAME + r')\s*(?::\s*(?P<label>.*))?$')
+_CLASS_DECL = re.compile(r'^class\s+(?P<name>' + _CLASS_NAME + r')'
+                         r'(?:\s*\[\s*"[^"]*"\s*\])?(?::::[\w-]+)?\s*(?P<brace>\{)?\s*$')
+_CLASS_MEMBER = re.compile(r'^(?P<name>' + _CLASS_NAME + r')\s*:\s*(?P<member>.+)$')
+_CLASS_ANNOTATION = re.compile(r'^<<[^>]+>>\s*' + _CLASS_NAME + r'$')
+_CLASS_SIMPLE = ('direction', 'classDef', 'cssClass', 'style', 'click', 'link', 'callback',
+                 'note')
+
+
+def _parse_class(lines):
+    statements = []
+    open_class = None
+    namespaces = []
+    for line in lines:
+        text = line.text
+        if open_class is not None:
+            if text == '}':
+                open_class = None
+                statements.append(('end',))
+            else:
+                statements.append(('member', open_class, _collapse(text)))
+            continue
+
+        word = re.split(r'[\s:]', text, maxsplit=1)[0]
+        if text == '}':
+            if not namespaces:
+                raise line.error("'}' without an open class or namespace")
+            namespaces.pop()
+            statements.append(('end',))
+        elif word == 'namespace':
+            if not text.endswith('{'):
+                raise line.error("Expected '{' after the namespace name")
+            namespaces.append(line)
+            statements.append(('namespace', _collapse(text[len(word):-1])))
+        elif word == 'class':
+            match = _CLASS_DECL.match(text)
+            if not match:
+                raise line.error("Invalid class declaration")
+            statements.append(('class', match.group('name')))
+            if match.group('brace'):
+                open_class = match.group('name')
+                open_line = line
+        elif word in _CLASS_SIMPLE:
+            statements.append((word, _collapse(text[len(word):])))
+        elif _CLASS_ANNOTATION.match(text):
+            statements.append(('annotation', _collapse(text)))
+        else:
+            relation = _CLASS_RELATION.match(text)
+            member = _CLASS_MEMBER.match(text)
+            if relation:
+                statements.append(('relation', relation.group('a'), relation.group('ca') or '',
+                                   relation.group('rel'), relation.group('cb') or '',
+                                   relation.group('b'), _collapse(relation.group('label') or '')))
+            elif member:
+                statements.append(('member', member.group('name'),
+                                   _collapse(member.group('member'))))
+            else:
+                raise line.error("Unrecognized class diagram statement")
+    if open_class is not None:
+        raise open_line.error(f"class '{open_class}' is never closed with '}}'")
+    if namespaces:
+        raise namespaces[-1].error("namespace is never closed with '}'")
+    return statements
+
+
+# --- State diagrams --------------------------------------------------------
+
+_STATE_ID = r'(?:\[\*\]|[\w.-]+)'
+_STATE_TRANSITION = re.compile(
+    r'^(?P<a>' + _STATE_ID + r')(?::::[\w-]+)?\s*-->\s*(?P<b>' + _STATE_ID + r')?'
+    r'(?::::[\w-]+)?\s*(?::\s*(?P<label>.*))?$')
+_STATE_DECL = re.compile(
+    r'^state\s+(?:"(?P<desc>[^"]*)"\s+as\s+)?(?P<id>[\w.-]+)'
+    r'\s*(?P<kind><<\w+>>)?\s*(?P<brace>\{)?\s*$')
+_STATE_DESCRIPTION = re.compile(r'^(?P<id>[\w.-]+)\s*:\s*(?P<desc>.*)$')
+_STATE_NOTE = re.compile(r'^note\s+(left|right)\s+of\s+([\w.-]+)\s*(?::\s*(.*))?$',
+                         re.IGNORECASE)
+_STATE_SIMPLE = ('direction', 'classDef', 'class', 'style', 'hide', 'scale')
+
+
+def _parse_state(lines):
+    statements = []
+    composites = []
+    note_line = None
+    note_text = []
+    for line in lines:
+        text = line.text
+        if note_line is not None:
+            if text.lower() == 'end note':
+                statements.append(note_line + (_collapse(' '.join(note_text)),))
+                note_line, note_text = None, []
+            else:
+                note_text.append(text)
+            continue
+
+        word = text.split(None, 1)[0]
+        transition = _STATE_TRANSITION.match(text)
+        if text == '}':
+            if not composites:
+                raise line.error("'}' without an open composite state")
+            composites.pop()
+            statements.append(('end',))
+        elif text == '--':
+            if not composites:
+                raise line.error("'--' is only allowed inside a composite state")
+            statements.append(('concurrent',))
+        elif word == 'state':
+            match = _STATE_DECL.match(text)
+            if not match:
+                raise line.error("Invalid state declaration")
+            statements.append(('state', match.group('id'), _collapse(match.group('desc') or ''),
+                               match.group('kind') or ''))
+            if match.group('brace'):
+                composites.append(line)
+        elif word.lower() == 'note':
+            match = _STATE_NOTE.match(text)
+            if not match:
+                raise line.error("Invalid note")
+            note = ('note', match.group(1).lower(), match.group(2))
+            if match.group(3) is None:
+                note_line = note
+                note_start = line
+            else:
+                statements.append(note + (_collapse(match.group(3)),))
+        elif word in _STATE_SIMPLE:
+            statements.append((word, _collapse(text[len(word):])))
+        elif transition:
+            if not transition.group('b'):
+                raise line.error("Transition has no target state", text.index('-->'))
+            statements.append(('transition', transition.group('a'), transition.group('b'),
+                               _collapse(transition.group('label') or '')))
+        else:
+            match = _STATE_DESCRIPTION.match(text)
+            if match:
+                statements.append(('description', match.group('id'),
+                                   _collapse(match.group('desc'))))
+            elif re.fullmatch(r'[\w.-]+(?::::[\w-]+)?', text):
+                statements.append(('state', text, '', ''))
+            else:
+                raise line.error("Unrecognized state diagram statement")
+    if note_line is not None:
+        raise note_start.error("note is never closed with 'end note'")
+    if composites:
+        raise composites[-1].error("composite state is never closed with '}'")
+    return statements
@@ -0,0 +1,530 @@
+"""Offscreen Mermaid rendering.
+
+MermaidRenderer keeps one hidden QWebEnginePage with mermaid loaded and
+renders diagram sources to SVG and, optionally, to PNG bytes rasterized
+in-page on a canvas. Results come back over QWebChannel, so no widget has
+to be shown and nothing is written to disk.
+
+MermaidRenderService puts a request queue in front of one renderer so the
+editor, the converter and exports can share a single warm page.
+MermaidRenderPool spreads requests over several services for servers that
+render concurrently.
+"""
+import base64
+import io
+import itertools
+import json
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+from PyQt6 import sip
+from PyQt6.QtCore import (QCoreApplication, QObject, QEventLoop, QThread, QTimer, QUrl,
+                          Qt, pyqtSignal, pyqtSlot)
+from PyQt6.QtWebChannel import QWebChannel
+from PyQt6.QtWebEngineCore import QWebEnginePage, QWebEngineSettings
+
+from pymerdoc import large_graph, webengine
+from pymerdoc.core import document
+
+# A local copy (file URL) can be used with PYMERDOC_MERMAID_URL, e.g. offline or for benchmarks
+MERMAID_URL = document.mermaid_url()
+DEFAULT_TIMEOUT = 30000
+# SVG text labels keep a diagram drawable on a canvas, so raster requests use
+# them; SVG and preview renders keep mermaid's HTML labels
+RASTER_CONFIG = {'htmlLabels': False, 'flowchart': {'htmlLabels': False}}
+
+RENDER_PAGE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
+    <script src="{mermaid_url}"></script>
+</head>
+<body>
+    <script>
+        const baseConfig = {config};
+        let currentConfig = JSON.stringify(baseConfig);
+        mermaid.initialize(baseConfig);
+
+        function configure(theme, overrides) {{
+            // Re-initializing resets mermaid to its defaults plus this config
+            const config = Object.assign({{}}, baseConfig, overrides || {{}});
+            if (theme) config.theme = theme;
+            const key = JSON.stringify(config);
+            if (key !== currentConfig) {{
+                currentConfig = key;
+                mermaid.initialize(config);
+            }}
+        }}
+
+        function heapSize() {{
+            return (performance.memory && performance.memory.usedJSHeapSize) || 0;
+        }}
+
+        let bridge = null;
+        new QWebChannel(qt.webChannelTransport, function (channel) {{
+            bridge = channel.objects.bridge;
+            bridge.pageReady();
+        }});
+
+        function svgSize(svgElement) {{
+            const viewBox = svgElement.viewBox && svgElement.viewBox.baseVal;
+            if (viewBox && viewBox.width && viewBox.height) {{
+                return [viewBox.width, viewBox.height];
+            }}
+            return [parseFloat(svgElement.getAttribute('width')) || 800,
+                    parseFloat(svgElement.getAttribute('height')) || 600];
+        }}
+
+        async function loadRaster(svg, scale) {{
+            // Size the SVG explicitly so the browser rasterizes the vectors at
+            // the target resolution instead of scaling a bitmap
+            const doc = new DOMParser().parseFromString(svg, 'image/svg+xml');
+            const svgElement = doc.documentElement;
+            const [width, height] = svgSize(svgElement);
+            const pixelWidth = Math.ceil(width * scale);
+            const pixelHeight = Math.ceil(height * scale);
+            svgElement.setAttribute('width', pixelWidth);
+            svgElement.setAttribute('height', pixelHeight);
+            svgElement.style.maxWidth = 'none';
+
+            const data = new XMLSerializer().serializeToString(svgElement);
+            const img = new Image(pixelWidth, pixelHeight);
+            img.src = 'data:image/svg+xml;base64,' + btoa(unescape(encodeURIComponent(data)));
+            await img.decode();
+            return {{img: img, width: pixelWidth, height: pixelHeight}};
+        }}
+
+        function drawRaster(raster, background, x, y, width, height) {{
+            const canvas = document.createElement('canvas');
+            canvas.width = width;
+            canvas.height = height;
+            const ctx = canvas.getContext('2d');
+            if (background) {{
+                ctx.fillStyle = background;
+                ctx.fillRect(0, 0, width, height);
+            }}
+            ctx.drawImage(raster.img, x, y, width, height, 0, 0, width, height);
+            return canvas.toDataURL('image/png').split(',')[1];
+        }}
+
+        async function renderDiagram(requestId, code, scale, background, theme, overrides) {{
+            try {{
+                configure(theme, overrides);
+                const started = performance.now();
+                const result = await mermaid.render('diagram' + requestId, code);
+                const stats = {{
+                    renderMs: performance.now() - started,
+                    heapBytes: heapSize(),
+                    svgBytes: result.svg.length
+                }};
+                let png = '';
+                if (scale > 0) {{
+                    const raster = await loadRaster(result.svg, scale);
+                    png = drawRaster(raster, background, 0, 0, raster.width, raster.height);
+                }}
+                bridge.renderFinished(requestId, result.svg, png, '', JSON.stringify(stats));
+            }} catch (e) {{
+                bridge.renderFinished(requestId, '', '', String((e && e.message) || e), '');
+            }}
+        }}
+
+        // Decoded SVG images kept between tile requests, by request id
+        const rasters = {{}};
+
+        async function prepareRaster(requestId, svg, scale) {{
+            try {{
+                rasters[requestId] = await loadRaster(svg, scale);
+                bridge.renderFinished(requestId, '', '', '', '');
+            }} catch (e) {{
+                bridge.renderFinished(requestId, '', '', String((e && e.message) || e), '');
+            }}
+        }}
+
+        function rasterTile(requestId, rasterId, background, x, y, width, height) {{
+            try {{
+                const png = drawRaster(rasters[rasterId], background, x, y, width, height);
+                bridge.renderFinished(requestId, '', png, '', '');
+            }} catch (e) {{
+                bridge.renderFinished(requestId, '', '', String((e && e.message) || e), '');
+            }}
+        }}
+
+        function releaseRaster(rasterId) {{
+            delete rasters[rasterId];
+        }}
+    </script>
+</body>
+</html>
+'''
+
+
+def raster_config(config=None):
+    """config with RASTER_CONFIG applied, merging nested options like 'flowchart'"""
+    merged = dict(config or {})
+    for name, value in RASTER_CONFIG.items():
+        if isinstance(value, dict):
+            merged[name] = dict(merged.get(name) or {}, **value)
+        else:
+            merged[name] = value
+    return merged
+
+
+class RenderResult:
+    """SVG markup, optional PNG bytes and render stats for one diagram"""
+
+    def __init__(self, svg="", png=b"", error="", stats=None):
+        self.svg = svg
+        self.png = png
+        self.error = error
+        self.stats = stats or {}
+
+    @property
+    def ok(self):
+        return not self.error
+
+    def image(self):
+        """Decode the PNG into an RGB Pillow image"""
+        with Image.open(io.BytesIO(self.png)) as img:
+            return img.convert('RGB')
+
+
+class _RenderBridge(QObject):
+    """Object exposed to the render page over QWebChannel"""
+
+    def __init__(self, renderer):
+        super().__init__(renderer)
+        self.renderer = renderer
+
+    @pyqtSlot()
+    def pageReady(self):
+        self.renderer._on_page_ready()
+
+    @pyqtSlot(int, str, str, str, str)
+    def renderFinished(self, request_id, svg, png, error, stats):
+        png_bytes = base64.b64decode(png) if png else b""
+        self.renderer.rendered.emit(
+            request_id, RenderResult(svg, png_bytes, error, json.loads(stats) if stats else {}))
+
+
+class MermaidRenderer(QObject):
+    """Render Mermaid sources offscreen in a persistent web page"""
+
+    rendered = pyqtSignal(int, object)  # request id, RenderResult
+    ready = pyqtSignal()
+
+    def __init__(self, theme="default", parent=None, mermaid_url=None):
+        super().__init__(parent)
+        self.theme = theme
+        self.is_ready = False
+        self._ids = itertools.count(1)
+        self._queued = []
+
+        self.page = QWebEnginePage(self)
+        self.page.settings().setAttribute(
+            QWebEngineSettings.WebAttribute.LocalContentCanAccessRemoteUrls, True)
+        # Measured with the views, but never discarded since renders would stall
+        webengine.renderer_monitor().track(self.page, discardable=False)
+
+        self.bridge = _RenderBridge(self)
+        self.channel = QWebChannel(self.page)
+        self.channel.registerObject("bridge", self.bridge)
+        self.page.setWebChannel(self.channel)
+
+        config = {
+            'startOnLoad': False,
+            'theme': theme,
+            'securityLevel': 'loose',
+        }
+        html = RENDER_PAGE.format(mermaid_url=mermaid_url or MERMAID_URL, config=json.dumps(config))
+        self.page.setHtml(html, QUrl("qrc:///"))
+
+    def _on_page_ready(self):
+        self.is_ready = True
+        queued, self._queued = self._queued, []
+        for script in queued:
+            self.page.runJavaScript(script)
+        self.ready.emit()
+
+    def _call(self, function, *args):
+        """Run a page function with a new request id and return the id"""
+        request_id = next(self._ids)
+        script = "{}({});".format(
+            function, ", ".join(json.dumps(arg) for arg in (request_id,) + args))
+        if self.is_ready:
+            self.page.runJavaScript(script)
+        else:
+            self._queued.append(script)
+        return request_id
+
+    def render(self, source, scale=0, background="white", theme=None, config=None,
+               raster=False):
+        """Start rendering source and return its request id
+
+        With ``scale`` > 0 the result also carries a PNG rasterized at that
+        scale. ``theme`` and ``config`` (mermaid options) apply to this
+        request only. PNG requests, and SVGs that will be rasterized later
+        (``raster``), get RASTER_CONFIG. The result arrives through the
+        ``rendered`` signal.
+        """
+        if scale > 0 or raster:
+            config = raster_config(config)
+        return self._call("renderDiagram", source, float(scale), background or "",
+                          theme or "", config or {})
+
+    def wait(self, request_id, timeout=30000):
+        """Wait in a local event loop for the result of a request"""
+        results = {}
+        loop = QEventLoop()
+
+        def on_rendered(finished_id, result):
+            if finished_id == request_id:
+                results['result'] = result
+                loop.quit()
+
+        self.rendered.connect(on_rendered)
+        QTimer.singleShot(timeout, loop.quit)
+        try:
+            loop.exec()
+        finally:
+            self.rendered.disconnect(on_rendered)
+
+        return results.get('result') or RenderResult(
+            error=f"Render timed out after {timeout} ms")
+
+    def render_sync(self, source, scale=0, background="white", timeout=30000, raster=False):
+        """Render source and wait for the result"""
+        return self.wait(self.render(source, scale, background, raster=raster), timeout)
+
+    def prepare_raster(self, svg, scale, timeout=30000):
+        """Decode svg at scale in the page for tile requests; returns a raster id"""
+        raster_id = self._call("prepareRaster", svg, float(scale))
+        result = self.wait(raster_id, timeout)
+        if not result.ok:
+            raise RuntimeError(f"Could not rasterize diagram: {result.error}")
+        return raster_id
+
+    def raster_tile(self, raster_id, x, y, width, height, background="white", timeout=30000):
+        """Return PNG bytes for one tile of a prepared raster"""
+        result = self.wait(self._call("rasterTile", raster_id, background or "",
+                                      x, y, width, height), timeout)
+        if not result.ok:
+            raise RuntimeError(f"Could not rasterize tile: {result.error}")
+        return result.png
+
+    def release_raster(self, raster_id):
+        self.page.runJavaScript(f"releaseRaster({int(raster_id)});")
+
+
+class _RenderRequest:
+    """A queued MermaidRenderService request"""
+
+    def __init__(self, key, source, callback, scale, background, theme, config, timeout):
+        self.key = key
+        self.source = source
+        self.callback = callback
+        self.scale = scale
+        self.background = background
+        self.theme = theme
+        self.config = config
+        self.timeout = timeout
+        self.render_id = None
+        self.timer = None
+
+
+class MermaidRenderService(QObject):
+    """Request queue served by one warm MermaidRenderer
+
+    Every request names the diagram it is for with a key, e.g. one key per
+    editor block. A waiting request is replaced when a newer one arrives for
+    the same key, and the result of a running request is dropped when a
+    newer one is already waiting, so a burst of edits renders at most the
+    first and the last version. Requests run one at a time, each with its
+    own timeout. Large graphs get the large-graph config and a longer
+    timeout automatically.
+    """
+
+    finished = pyqtSignal(str, object)  # key, RenderResult
+
+    def __init__(self, parent=None, renderer=None):
+        super().__init__(parent)
+        self.renderer = renderer or MermaidRenderer(parent=self)
+        self.renderer.rendered.connect(self._on_rendered)
+        self._pending = OrderedDict()
+        self._active = None
+        self._sync_ids = itertools.count(1)
+        self.stats = {'submitted': 0, 'rendered': 0, 'coalesced': 0, 'timed_out': 0}
+
+    def submit(self, key, source, callback=None, scale=0, background="white", theme=None,
+               timeout=DEFAULT_TIMEOUT, config=None, priority=False, raster=False):
+        """Queue source for rendering; callback receives the RenderResult
+
+        ``config`` defaults to the large-graph config for large sources.
+        A ``priority`` request goes ahead of the waiting ones, e.g. for the
+        diagram being edited. Superseded requests never call their callback.
+        ``raster`` asks for an SVG that will be drawn on a canvas.
+        """
+        if config is None:
+            config = large_graph.render_config(large_graph.graph_size(source))
+        if config:
+            timeout = max(timeout, large_graph.LARGE_GRAPH_TIMEOUT)
+        if raster or scale > 0:
+            config = raster_config(config)
+        self.stats['submitted'] += 1
+        if self._pending.pop(key, None) is not None:
+            self.stats['coalesced'] += 1
+        self._pending[key] = _RenderRequest(key, source, callback, scale, background,
+                                            theme, config, timeout)
+        if priority:
+            self._pending.move_to_end(key, last=False)
+        self._pump()
+
+    def cancel(self, key):
+        """Drop the waiting request for key, if any"""
+        self._pending.pop(key, None)
+
+    def _pump(self):
+        if self._active is not None or not self._pending:
+            return
+        _, request = self._pending.popitem(last=False)
+        self._active = request
+        request.render_id = self.renderer.render(request.source, request.scale,
+                                                 request.background, request.theme,
+                                                 request.config)
+        request.timer = QTimer(self)
+        request.timer.setSingleShot(True)
+        request.timer.timeout.connect(lambda: self._on_timeout(request))
+        request.timer.start(request.timeout)
+
+    def _on_rendered(self, render_id, result):
+        # Late results of timed out requests and raster calls are not ours
+        request = self._active
+        if request is not None and request.render_id == render_id:
+            self._finish(request, result)
+
+    def _on_timeout(self, request):
+        if request is self._active:
+            self.stats['timed_out'] += 1
+            self._finish(request, RenderResult(
+                error=f"Render timed out after {request.timeout} ms"))
+
+    def _finish(self, request, result):
+        request.timer.stop()
+        request.timer.deleteLater()
+        self._active = None
+        if request.key in self._pending:
+            self.stats['coalesced'] += 1
+        else:
+            self.stats['rendered'] += 1
+            if request.callback:
+                request.callback(result)
+            self.finished.emit(request.key, result)
+        self._pump()
+
+    def render_sync(self, source, scale=0, background="white", timeout=DEFAULT_TIMEOUT,
+                    theme=None, raster=False):
+        """Render source through the queue and wait for the result"""
+        results = {}
+        loop = QEventLoop()
+
+        def on_done(result):
+            results['result'] = result
+            loop.quit()
+
+        self.submit(f"sync-{next(self._sync_ids)}", source, on_done, scale, background,
+                    theme, timeout, raster=raster)
+        if 'result' not in results:
+            loop.exec()
+        return results['result']
+
+    def for_theme(self, theme):
+        """A MermaidRenderer-like view that renders every request with theme"""
+        return ThemedRenderer(self, theme)
+
+
+class ThemedRenderer:
+    """Renderer interface over a MermaidRenderService with a fixed theme
+
+    Raster calls go straight to the service's renderer; they do not touch
+    mermaid and need no queueing.
+    """
+
+    def __init__(self, service, theme):
+        self.service = service
+        self.theme = theme
+
+    def render_sync(self, source, scale=0, background="white", timeout=DEFAULT_TIMEOUT,
+                    raster=False):
+        return self.service.render_sync(source, scale, background, timeout, self.theme, raster)
+
+    def __getattr__(self, name):
+        return getattr(self.service.renderer, name)
+
+
+class MermaidRenderPool(QObject):
+    """Several warm render services, each with its own page
+
+    Requests go to the service with the fewest requests in flight.
+    render_blocking may be called from other threads, e.g. HTTP handlers.
+    """
+
+    _dispatch = pyqtSignal(object)
+
+    def __init__(self, size=2, parent=None, services=None):
+        super().__init__(parent)
+        self.services = services or [MermaidRenderService(self) for _ in range(max(1, size))]
+        self.load = [0] * len(self.services)
+        self._keys = itertools.count(1)
+        self._dispatch.connect(self._run, Qt.ConnectionType.QueuedConnection)
+
+    def warm_up(self, source="graph TD\n    A --> B"):
+        """Render a small diagram on every page so the first real request is fast"""
+        for service in self.services:
+            service.submit(f"warm-up-{next(self._keys)}", source)
+
+    def submit(self, source, callback, scale=0, background="white", theme=None,
+               timeout=DEFAULT_TIMEOUT, config=None):
+        """Queue source on the least busy service; callback gets the RenderResult"""
+        index = min(range(len(self.services)), key=self.load.__getitem__)
+        self.load[index] += 1
+
+        def on_done(result):
+            self.load[index] -= 1
+            callback(result)
+
+        self.services[index].submit(f"pool-{next(self._keys)}", source, on_done, scale,
+                                    background, theme, timeout, config)
+
+    def render_blocking(self, source, scale=0, background="white", theme=None,
+                        timeout=DEFAULT_TIMEOUT):
+        """Render from a thread other than the Qt one and wait for the result"""
+        if QThread.currentThread() is self.thread():
+            raise RuntimeError("render_blocking would block the Qt thread")
+        done = threading.Event()
+        results = {}
+
+        def on_done(result):
+            results['result'] = result
+            done.set()
+
+        self._dispatch.emit((source, on_done, scale, background, theme, timeout))
+        # Large graphs get a longer timeout inside the service
+        if not done.wait(max(timeout, large_graph.LARGE_GRAPH_TIMEOUT) / 1000 + 5):
+            return RenderResult(error="Render did not finish")
+        return results['result']
+
+    def _run(self, job):
+        self.submit(*job)
+
+
+_shared_service = None
+
+
+def shared_render_service():
+    """The application-wide render service, created on first use"""
+    global _shared_service
+    if _shared_service is None or sip.isdeleted(_shared_service):
+        _shared_service = MermaidRenderService(QCoreApplication.instance())
+    return _shared_service
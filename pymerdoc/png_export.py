@@ -0,0 +1,156 @@
+"""High resolution PNG export for Mermaid diagrams.
+
+The diagram's SVG is rasterized offscreen at the requested scale, one tile
+at a time. Tiles are assembled into horizontal bands that are streamed
+straight into the PNG file, so memory use is bounded by a single band no
+matter how large the exported image is.
+"""
+import io
+import math
+import re
+import struct
+import zlib
+
+from PIL import Image
+
+CSS_DPI = 96
+TILE_WIDTH = 4096
+TILE_HEIGHT = 1024
+MAX_PIXELS = 2 ** 31 - 1
+
+_SVG_TAG = re.compile(r'<svg\b[^>]*>', re.IGNORECASE | re.DOTALL)
+_ATTRIBUTE = r'\b{}\s*=\s*["\']([^"\']*)["\']'
+
+
+def svg_size(svg):
+    """Return the (width, height) of an SVG document in CSS pixels
+
+    The viewBox wins over width/height because mermaid emits width="100%".
+    """
+    match = _SVG_TAG.search(svg)
+    if not match:
+        raise ValueError("Not an SVG document")
+    tag = match.group(0)
+
+    view_box = re.search(_ATTRIBUTE.format('viewBox'), tag)
+    if view_box:
+        parts = [float(p) for p in re.split(r'[\s,]+', view_box.group(1).strip())]
+        if len(parts) == 4 and parts[2] > 0 and parts[3] > 0:
+            return parts[2], parts[3]
+
+    sizes = []
+    for name in ('width', 'height'):
+        value = re.search(_ATTRIBUTE.format(name), tag)
+        number = re.match(r'\s*([\d.]+)\s*(px)?\s*$', value.group(1)) if value else None
+        if not number:
+            raise ValueError("SVG has no usable viewBox or width/height")
+        sizes.append(float(number.group(1)))
+    return tuple(sizes)
+
+
+def scale_for_dpi(dpi):
+    """Convert a target DPI to a scale factor over CSS pixels"""
+    return dpi / CSS_DPI
+
+
+class StreamingPngWriter:
+    """Write an RGB PNG row band by row band without holding the whole image"""
+
+    def __init__(self, fp, width, height, dpi=None, compress_level=6):
+        if width * height > MAX_PIXELS:
+            raise ValueError(f"{width}x{height} is too large for a PNG export")
+        self.fp = fp
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = []
+        self._pending_size = 0
+
+        fp.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        if dpi:
+            pixels_per_meter = round(dpi / 0.0254)
+            self._chunk(b'pHYs', struct.pack('>IIB', pixels_per_meter, pixels_per_meter, 1))
+
+    def _chunk(self, kind, data):
+        self.fp.write(struct.pack('>I', len(data)))
+        self.fp.write(kind)
+        self.fp.write(data)
+        self.fp.write(struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    def _flush_idat(self, force=False):
+        if self._pending and (force or self._pending_size >= 1 << 20):
+            self._chunk(b'IDAT', b''.join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def _add_compressed(self, data):
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+            self._flush_idat()
+
+    def write_band(self, band):
+        """Append the rows of an RGB image that is exactly as wide as the PNG"""
+        if band.size[0] != self.width:
+            raise ValueError("Band width does not match the image width")
+        if self.rows_written + band.size[1] > self.height:
+            raise ValueError("Too many rows for the image height")
+
+        data = band.convert('RGB').tobytes()
+        stride = self.width * 3
+        for offset in range(0, len(data), stride):
+            # Filter type 0 (None) for every scanline
+            self._add_compressed(self._compressor.compress(b'\x00' + data[offset:offset + stride]))
+        self.rows_written += band.size[1]
+
+    def close(self):
+        if self.rows_written != self.height:
+            raise ValueError(f"Wrote {self.rows_written} of {self.height} rows")
+        self._add_compressed(self._compressor.flush())
+        self._flush_idat(force=True)
+        self._chunk(b'IEND', b'')
+
+
+def export_png(renderer, source, path, scale=2.0, background="white", dpi=None,
+               tile_size=(TILE_WIDTH, TILE_HEIGHT), progress=None):
+    """Render source with a MermaidRenderer and write it to path as a PNG
+
+    ``progress`` is called with (tiles done, tile count) after every tile.
+    Returns the (width, height) of the written image.
+    """
+    result = renderer.render_sync(source, raster=True)
+    if not result.ok:
+        raise RuntimeError(f"Diagram failed to render: {result.error}")
+
+    css_width, css_height = svg_size(result.svg)
+    width = max(1, math.ceil(css_width * scale))
+    height = max(1, math.ceil(css_height * scale))
+    tile_width, tile_height = tile_size
+    columns = math.ceil(width / tile_width)
+    rows = math.ceil(height / tile_height)
+
+    raster_id = renderer.prepare_raster(result.svg, scale)
+    try:
+        with open(path, 'wb') as f:
+            writer = StreamingPngWriter(f, width, height, dpi or round(CSS_DPI * scale))
+            for row in range(rows):
+                top = row * tile_height
+                band_height = min(tile_height, height - top)
+                band = Image.new('RGB', (width, band_height), background or 'white')
+                for column in range(columns):
+                    left = column * tile_width
+                    tile_w = min(tile_width, width - left)
+                    png = renderer.raster_tile(raster_id, left, top, tile_w, band_height,
+                                               background)
+                    with Image.open(io.BytesIO(png)) as tile:
+                        band.paste(tile.convert('RGB'), (left, 0))
+                    if progress:
+                        progress(row * columns + column + 1, rows * columns)
+                writer.write_band(band)
+            writer.close()
+    finally:
+        renderer.release_raster(raster_id)
+
+    return width, height
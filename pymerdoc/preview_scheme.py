@@ -0,0 +1,248 @@
+"""The ``pymerdoc:`` URL scheme the editor preview is served from.
+
+Loading the preview from ``pymerdoc://preview/<source>/index.html`` instead of
+``QWebEngineView.setHtml`` lifts the 2 MB limit on the page and gives it a
+base URL, so relative image links resolve against the document's folder (or
+the assets of an open bundle). Pages are served from memory, files are
+streamed from disk, and both carry caching headers.
+
+Raster images wider than the preview are replaced by display-sized variants
+from a PreviewImageCache, made on a worker thread; exports never come
+through here and keep the originals.
+
+The scheme has to be registered with register_scheme() before the
+QApplication is created; the handler is installed on first use.
+"""
+import email.utils
+import mimetypes
+import os
+import posixpath
+import weakref
+
+from PyQt6 import sip
+from PyQt6.QtCore import (QBuffer, QByteArray, QFile, QIODevice, QObject, QRunnable,
+                          QThreadPool, QUrl, pyqtSignal)
+from PyQt6.QtWebEngineCore import (QWebEngineProfile, QWebEngineUrlRequestJob,
+                                   QWebEngineUrlScheme, QWebEngineUrlSchemeHandler)
+
+from pymerdoc.thumbnails import PreviewImageCache
+
+SCHEME = b"pymerdoc"
+HOST = "preview"
+PAGE_NAME = "index.html"
+ASSET_MAX_AGE = 300  # Seconds the preview may reuse an image before asking again
+WIDTH_STEP = 256  # Variant widths are rounded up to this so resizes reuse them
+SCALED_TYPES = (b"image/png", b"image/jpeg", b"image/gif", b"image/webp",
+                b"image/bmp", b"image/tiff")
+
+_handlers = {}
+
+
+def register_scheme():
+    """Register the preview scheme; must run before the QApplication exists"""
+    if registered():
+        return
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.Flag.SecureScheme |
+                    QWebEngineUrlScheme.Flag.CorsEnabled)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+def registered():
+    return bool(QWebEngineUrlScheme.schemeByName(SCHEME).name())
+
+
+def resolve_relative(path):
+    """Normalize a requested asset path, or None if it leaves the document folder"""
+    name = posixpath.normpath(path.lstrip('/'))
+    if name in ('.', '..') or name.startswith('../'):
+        return None
+    return name
+
+
+def variant_width(pixels):
+    """Width of the image variants for a preview this many device pixels wide"""
+    return max(WIDTH_STEP, -(-int(pixels) // WIDTH_STEP) * WIDTH_STEP)
+
+
+def asset_headers(mtime):
+    """Caching headers for an asset last modified at mtime"""
+    return {
+        'Cache-Control': f'private, max-age={ASSET_MAX_AGE}',
+        'Last-Modified': email.utils.formatdate(mtime, usegmt=True),
+    }
+
+
+PAGE_HEADERS = {'Cache-Control': 'no-store'}
+
+
+class PreviewSource:
+    """A preview page held in memory and the places its assets come from"""
+
+    def __init__(self, name):
+        self.name = name
+        self.html = b""
+        self.base_dir = None
+        self.bundle = None
+        self.generation = 0
+        self.image_width = None  # Images wider than this are served downscaled
+
+    def set_page(self, html, base_dir=None, bundle=None):
+        """Replace the page; returns the URL to load it from"""
+        self.html = html.encode('utf-8')
+        self.base_dir = base_dir
+        self.bundle = bundle
+        self.generation += 1
+        return self.url()
+
+    def url(self):
+        # The generation makes every new page a new URL while asset URLs stay put
+        return QUrl(f"{SCHEME.decode()}://{HOST}/{self.name}/{PAGE_NAME}?v={self.generation}")
+
+    def bundle_asset(self, name):
+        """Bytes of an asset in the open bundle, or None"""
+        if self.bundle is None:
+            return None
+        try:
+            return self.bundle.read_asset(name)
+        except (KeyError, ValueError):
+            return None
+
+    def asset_path(self, name):
+        """Path of an asset in the document folder, or None"""
+        if not self.base_dir:
+            return None
+        path = os.path.join(self.base_dir, *name.split('/'))
+        return path if os.path.isfile(path) else None
+
+
+class ImageSignals(QObject):
+    ready = pyqtSignal(object, bytes, object, float)  # job, content type, path or bytes, mtime
+
+
+class ImageTask(QRunnable):
+    """Find or make the display-sized variant of one preview image on a worker thread"""
+
+    def __init__(self, cache, job, content_type, width, signals, path=None, member=None):
+        super().__init__()
+        self.cache = cache
+        self.job = job
+        self.content_type = content_type
+        self.width = width
+        self.signals = signals
+        self.path = path
+        self.member = member  # (bundle path, asset name, bytes)
+
+    def run(self):
+        try:
+            if self.member is not None:
+                archive, name, original = self.member
+                variant = self.cache.get_member(archive, name, original, self.width)
+                mtime = os.path.getmtime(archive)
+            else:
+                original = self.path
+                variant = self.cache.get(self.path, self.width)
+                mtime = os.path.getmtime(self.path)
+        except OSError:
+            # Removed while waiting for a worker
+            self.signals.ready.emit(self.job, self.content_type, None, 0.0)
+            return
+        if variant is None:
+            self.signals.ready.emit(self.job, self.content_type, original, mtime)
+        else:
+            self.signals.ready.emit(self.job, b"image/png", variant, mtime)
+
+
+class PreviewSchemeHandler(QWebEngineUrlSchemeHandler):
+    """Answers pymerdoc://preview/ requests from the registered sources"""
+
+    def __init__(self, parent=None, image_cache=None):
+        super().__init__(parent)
+        self.sources = weakref.WeakValueDictionary()
+        self.image_cache = image_cache or PreviewImageCache()
+        self.image_pool = QThreadPool(self)
+        self.image_signals = ImageSignals(self)
+        self.image_signals.ready.connect(self._serve_asset)
+
+    def add_source(self, source):
+        self.sources[source.name] = source
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        parts = url.path(QUrl.ComponentFormattingOption.FullyDecoded).lstrip('/').split('/', 1)
+        source = self.sources.get(parts[0]) if url.host() == HOST else None
+        if source is None or len(parts) < 2:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        if parts[1] == PAGE_NAME:
+            self._reply(job, b"text/html;charset=utf-8", self._buffer(job, source.html),
+                        PAGE_HEADERS)
+            return
+
+        name = resolve_relative(parts[1])
+        if name is None:
+            job.fail(QWebEngineUrlRequestJob.Error.RequestDenied)
+            return
+        content_type = (mimetypes.guess_type(name)[0] or "application/octet-stream").encode()
+        scaled = source.image_width is not None and content_type in SCALED_TYPES
+
+        data = source.bundle_asset(name)
+        if data is not None:
+            if scaled:
+                self.image_pool.start(ImageTask(self.image_cache, job, content_type,
+                                                source.image_width, self.image_signals,
+                                                member=(source.bundle.path, name, data)))
+            else:
+                self._serve_asset(job, content_type, data, os.path.getmtime(source.bundle.path))
+            return
+        path = source.asset_path(name)
+        if path is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+        elif scaled:
+            self.image_pool.start(ImageTask(self.image_cache, job, content_type,
+                                            source.image_width, self.image_signals, path=path))
+        else:
+            self._serve_asset(job, content_type, path, os.path.getmtime(path))
+
+    def _serve_asset(self, job, content_type, content, mtime):
+        """Reply with an asset held in memory or streamed from a file"""
+        if sip.isdeleted(job):
+            return  # The page stopped waiting for it
+        if content is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        if isinstance(content, bytes):
+            device = self._buffer(job, content)
+        else:
+            # Files are streamed by the web engine instead of read here
+            device = QFile(content, job)
+            if not device.open(QIODevice.OpenModeFlag.ReadOnly):
+                job.fail(QWebEngineUrlRequestJob.Error.RequestFailed)
+                return
+        self._reply(job, content_type, device, asset_headers(mtime))
+
+    @staticmethod
+    def _buffer(job, data):
+        # Parented to the job so it lives until the page has read it
+        buffer = QBuffer(job)
+        buffer.setData(QByteArray(data))
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        return buffer
+
+    @staticmethod
+    def _reply(job, content_type, device, headers):
+        job.setAdditionalResponseHeaders(
+            {QByteArray(key.encode()): QByteArray(value.encode()) for key, value in headers.items()})
+        job.reply(content_type, device)
+
+
+def preview_handler(profile=None):
+    """The scheme handler of a profile (default profile if None), installed on first use"""
+    profile = profile or QWebEngineProfile.defaultProfile()
+    handler = _handlers.get(id(profile))
+    if handler is None:
+        handler = PreviewSchemeHandler(profile)
+        profile.installUrlSchemeHandler(SCHEME, handler)
+        _handlers[id(profile)] = handler
+    return handler
@@ -0,0 +1,209 @@
+"""On-demand profiling captures for slow-preview and slow-conversion reports.
+
+A capture wraps the next few units of work of one kind (preview updates,
+GIF conversions) in cProfile and tracemalloc, then writes a pstats file
+and a ranked text report of the top functions and allocation sites that
+can be attached to a bug report. Captures are requested by kind, from the
+``--profile`` option or Help > Capture Profile, and picked up by the code
+doing the work through ``active(kind)``.
+"""
+import cProfile
+import io
+import os
+import platform
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+PREVIEW = "preview"
+GIF = "gif"
+DEFAULT_PREVIEW_COUNT = 5
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+
+_captures = {}
+_lock = threading.Lock()
+
+
+def default_output_dir():
+    return os.path.join(tempfile.gettempdir(), "pymerdoc-profiles")
+
+
+@dataclass
+class ProfileReport:
+    """Files written by a finished capture"""
+    stats_path: str
+    report_path: str
+    sections: int
+    seconds: float
+
+    def describe(self):
+        return (f"Profiled {self.sections} section(s), {self.seconds:.2f} s.\n"
+                f"Report: {self.report_path}\nStats: {self.stats_path}")
+
+
+class ProfileCapture:
+    """Profile the next ``count`` sections of work, then write the reports
+
+    A section is opened with begin() and closed with end(), or wrapped in
+    ``with capture.section():``. Only the thread that opens a section is
+    profiled; memory is traced for the whole process from the first section
+    until the capture finishes.
+    """
+
+    def __init__(self, label, count=1, output_dir=None):
+        self.label = label
+        self.count = max(1, count)
+        self.output_dir = output_dir or default_output_dir()
+        self.sections = 0
+        self.seconds = 0.0
+        self.report = None
+        self._profiler = cProfile.Profile()
+        self._lock = threading.RLock()
+        self._open = False
+        self._started = 0.0
+        self._baseline = None
+        self._owns_tracemalloc = False
+
+    @property
+    def done(self):
+        return self.report is not None
+
+    @property
+    def active(self):
+        return self._open
+
+    def begin(self):
+        """Start profiling a section; ignored when one is already open"""
+        with self._lock:
+            if self.done or self._open:
+                return
+            if self._baseline is None:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self._owns_tracemalloc = True
+                self._baseline = tracemalloc.take_snapshot()
+            self._open = True
+            self._started = time.perf_counter()
+            self._profiler.enable()
+
+    def end(self):
+        """Close the open section; returns the ProfileReport once the last one ends"""
+        with self._lock:
+            if not self._open:
+                return None
+            self._profiler.disable()
+            self._open = False
+            self.seconds += time.perf_counter() - self._started
+            self.sections += 1
+            if self.sections >= self.count:
+                return self.finish()
+        return None
+
+    @contextmanager
+    def section(self):
+        """Profile the body of the with block as one section"""
+        self.begin()
+        try:
+            yield self
+        finally:
+            self.end()
+
+    def finish(self):
+        """Stop tracing and write the pstats file and text report"""
+        with self._lock:
+            if self.done:
+                return self.report
+            if self._open:
+                self._profiler.disable()
+                self._open = False
+                self.seconds += time.perf_counter() - self._started
+            allocations = self._allocation_report()
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir,
+                                f"{self.label}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+            stats_path = base + ".pstats"
+            report_path = base + ".txt"
+            self._profiler.dump_stats(stats_path)
+            with open(report_path, 'w', encoding='utf-8') as f:
+                f.write(self._header())
+                f.write(self._function_report())
+                f.write(allocations)
+            self.report = ProfileReport(stats_path, report_path, self.sections, self.seconds)
+            with _lock:
+                if _captures.get(self.label) is self:
+                    del _captures[self.label]
+            return self.report
+
+    def _header(self):
+        return (f"pymerdoc profile: {self.label}\n"
+                f"Sections: {self.sections}, profiled time: {self.seconds:.3f} s\n"
+                f"Python {sys.version.split()[0]} on {platform.platform()}\n\n")
+
+    def _function_report(self):
+        if not self.sections:
+            return "No sections were profiled.\n\n"
+        stream = io.StringIO()
+        for sort, title in (('cumulative', 'cumulative time'), ('tottime', 'own time')):
+            stream.write(f"=== Top {TOP_FUNCTIONS} functions by {title} ===\n")
+            stats = pstats.Stats(self._profiler, stream=stream)
+            stats.strip_dirs().sort_stats(sort).print_stats(TOP_FUNCTIONS)
+        return stream.getvalue()
+
+    def _allocation_report(self):
+        if self._baseline is None or not tracemalloc.is_tracing():
+            return ""
+        _, peak = tracemalloc.get_traced_memory()
+        ignore = (tracemalloc.Filter(False, tracemalloc.__file__),
+                  tracemalloc.Filter(False, __file__),
+                  tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                  tracemalloc.Filter(False, "<unknown>"))
+        snapshot = tracemalloc.take_snapshot().filter_traces(ignore)
+        differences = snapshot.compare_to(self._baseline.filter_traces(ignore), 'lineno')
+        lines = [f"=== Top {TOP_ALLOCATIONS} allocation sites (memory held at the end "
+                 f"compared to the start; peak traced {peak / 1024 ** 2:.1f} MB) ==="]
+        for statistic in differences[:TOP_ALLOCATIONS]:
+            frame = statistic.traceback[0]
+            lines.append(f"{statistic.size_diff / 1024:+10.1f} KB {statistic.count_diff:+8d} blocks  "
+                         f"{frame.filename}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
+
+
+def request(kind, count=1, output_dir=None):
+    """Profile the next ``count`` sections of ``kind`` and return the capture"""
+    capture = ProfileCapture(kind, count, output_dir)
+    with _lock:
+        previous = _captures.get(kind)
+        _captures[kind] = capture
+    if previous is not None and previous.sections:
+        previous.finish()
+    return capture
+
+
+def active(kind):
+    """The unfinished capture requested for ``kind``, if any"""
+    with _lock:
+        return _captures.get(kind)
+
+
+@contextmanager
+def section(kind):
+    """Profile the with block if a capture of ``kind`` is requested
+
+    Yields the capture (or None); check ``capture.report`` afterwards to
+    see whether this section finished it.
+    """
+    capture = active(kind)
+    if capture is None:
+        yield None
+        return
+    with capture.section():
+        yield capture
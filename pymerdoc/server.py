@@ -0,0 +1,443 @@
+"""Localhost HTTP API for rendering Mermaid and Markdown.
+
+`pymerdoc serve` keeps a pool of warm offscreen mermaid pages and answers:
+
+- ``POST /render/svg``  Mermaid source in the body, SVG back
+- ``POST /render/png``  Mermaid source in the body, PNG back
+- ``POST /render/html`` Markdown in the body, an HTML page with its
+  diagrams rendered inline as SVG
+- ``GET /metrics``      counters and latency histograms (Prometheus text)
+- ``GET /health``       ``ok`` once the server is up
+
+Query parameters ``theme``, ``scale`` (PNG only), ``background`` and
+``optimize`` (SVG only) tune a render. Sources are checked by the Mermaid
+parser first, so syntax errors come back as 400 without a render, and
+results are cached by diagram structure. At most ``max_concurrent``
+renders run at once; others wait up to ``queue_timeout`` seconds and then
+get a 503. Unexpected failures are answered with a 500.
+"""
+import argparse
+import hashlib
+import html
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from pymerdoc import build, mermaid_parser, svg_optimizer
+from pymerdoc.core import document
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_CONCURRENT = 8
+DEFAULT_QUEUE_TIMEOUT = 10.0
+DEFAULT_CACHE_MB = 64
+DEFAULT_PNG_SCALE = 2.0
+MAX_BODY_SIZE = 10 * 1024 * 1024
+MAX_PNG_SCALE = 8.0
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPES = {
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+    'html': 'text/html; charset=utf-8',
+}
+
+
+class RequestError(Exception):
+    """A request the server answers with an HTTP error status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed buckets"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[index] += 1
+
+
+class Metrics:
+    """Thread-safe request counters and per-endpoint latency histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (endpoint, status) -> count
+        self.latency = {}  # endpoint -> LatencyHistogram
+        self.counters = {'cache_hits': 0, 'cache_misses': 0, 'renders': 0, 'rejected': 0}
+        self.in_flight = 0
+        self.started = time.time()
+
+    def observe(self, endpoint, status, seconds):
+        with self._lock:
+            self.requests[endpoint, status] = self.requests.get((endpoint, status), 0) + 1
+            self.latency.setdefault(endpoint, LatencyHistogram()).observe(seconds)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def adjust_in_flight(self, amount):
+        with self._lock:
+            self.in_flight += amount
+
+    def render_prometheus(self, cache):
+        """Metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = ['# TYPE pymerdoc_requests_total counter']
+            for (endpoint, status), count in sorted(self.requests.items()):
+                lines.append(f'pymerdoc_requests_total{{endpoint="{endpoint}",'
+                             f'status="{status}"}} {count}')
+            lines.append('# TYPE pymerdoc_request_seconds histogram')
+            for endpoint, histogram in sorted(self.latency.items()):
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'pymerdoc_request_seconds_bucket{{endpoint="{endpoint}",'
+                                 f'le="{bound}"}} {count}')
+                lines.append(f'pymerdoc_request_seconds_bucket{{endpoint="{endpoint}",'
+                             f'le="+Inf"}} {histogram.count}')
+                lines.append(f'pymerdoc_request_seconds_sum{{endpoint="{endpoint}"}} '
+                             f'{histogram.total:.6f}')
+                lines.append(f'pymerdoc_request_seconds_count{{endpoint="{endpoint}"}} '
+                             f'{histogram.count}')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'# TYPE pymerdoc_{name}_total counter')
+                lines.append(f'pymerdoc_{name}_total {value}')
+            lines.append('# TYPE pymerdoc_renders_in_flight gauge')
+            lines.append(f'pymerdoc_renders_in_flight {self.in_flight}')
+        lines.append('# TYPE pymerdoc_cache_bytes gauge')
+        lines.append(f'pymerdoc_cache_bytes {cache.size}')
+        lines.append('# TYPE pymerdoc_cache_entries gauge')
+        lines.append(f'pymerdoc_cache_entries {len(cache)}')
+        lines.append(f'pymerdoc_uptime_seconds {time.time() - self.started:.0f}')
+        return '\n'.join(lines) + '\n'
+
+
+class RenderCache:
+    """Least recently used render results, bounded by total size in bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+def cache_key(source, *options):
+    """Key of a render: the diagram's structure plus the render options"""
+    try:
+        return mermaid_parser.structure_key(source, document.MERMAID_VERSION, *options)
+    except mermaid_parser.MermaidSyntaxError:
+        return hashlib.sha1(repr((source, document.MERMAID_VERSION) + options).encode()).hexdigest()
+
+
+class RenderServer:
+    """HTTP front end for a render pool
+
+    ``pool`` is anything with ``render_blocking(source, scale, background,
+    theme)`` returning a result with ``ok``, ``svg``, ``png`` and ``error``,
+    normally a MermaidRenderPool. Handlers run on their own threads; the
+    diagrams of a Markdown document are rendered by ``workers`` threads,
+    usually one per render page of the pool.
+    """
+
+    def __init__(self, pool, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                 max_concurrent=DEFAULT_MAX_CONCURRENT, queue_timeout=DEFAULT_QUEUE_TIMEOUT,
+                 cache_bytes=DEFAULT_CACHE_MB * 1024 * 1024, theme="default",
+                 workers=DEFAULT_POOL_SIZE):
+        self.pool = pool
+        self.theme = theme
+        self.queue_timeout = queue_timeout
+        self.cache = RenderCache(cache_bytes)
+        self.metrics = Metrics()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._executor = ThreadPoolExecutor(max(1, workers), thread_name_prefix="pymerdoc-render")
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve on a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True,
+                                        name="pymerdoc-serve")
+        self._thread.start()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown()
+
+    # --- rendering --------------------------------------------------------
+
+    def render_diagram(self, source, fmt, theme=None, scale=DEFAULT_PNG_SCALE,
+                       background="white", optimize=False):
+        """Return SVG text or PNG bytes for a diagram, from the cache when possible"""
+        theme = theme or self.theme
+        try:
+            mermaid_parser.parse(source)
+        except mermaid_parser.MermaidSyntaxError as e:
+            raise RequestError(400, f"Syntax error at {e}")
+
+        scale = scale if fmt == 'png' else 0
+        key = cache_key(source, fmt, theme, scale, background, optimize)
+        data = self.cache.get(key)
+        if data is not None:
+            self.metrics.increment('cache_hits')
+            return data
+        self.metrics.increment('cache_misses')
+
+        result = self._render(source, scale, background, theme)
+        if fmt == 'png':
+            data = result.png
+        else:
+            data = result.svg
+            if optimize:
+                data = svg_optimizer.optimize_svg(data).svg
+        self.cache.put(key, data)
+        return data
+
+    def _render(self, source, scale, background, theme):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.metrics.increment('rejected')
+            raise RequestError(503, "Server busy, try again later")
+        self.metrics.adjust_in_flight(1)
+        try:
+            result = self.pool.render_blocking(source, scale, background, theme)
+        finally:
+            self.metrics.adjust_in_flight(-1)
+            self._slots.release()
+        self.metrics.increment('renders')
+        if not result.ok:
+            raise RequestError(422, result.error)
+        return result
+
+    def render_markdown(self, content, theme=None, title="Document"):
+        """Return an HTML page with the document's diagrams rendered inline"""
+        diagrams = set(mermaid_parser.MARKDOWN_BLOCK.findall(content))
+        # Render the document's diagrams in parallel across the pool
+        rendered = {}
+        for future in [self._executor.submit(self._render_into, rendered, source, theme)
+                       for source in diagrams]:
+            future.result()
+
+        # Every inlined SVG gets its own ID prefix; mermaid numbers the
+        # diagrams of each render page from 1 and its CSS is scoped by ID
+        numbers = itertools.count(1)
+
+        def replace(source):
+            svg, error = rendered[source]
+            if error:
+                return f'<pre class="diagram-error">{html.escape(error)}\n\n{html.escape(source)}</pre>'
+            svg = svg_optimizer.prefix_ids(svg, f"d{next(numbers)}-")
+            return f'<div class="diagram">{svg}</div>'
+
+        body = document.convert_markdown_to_html(content, replace)
+        return build.PAGE_TEMPLATE.format(title=html.escape(title), scripts='', body=body)
+
+    def _render_into(self, rendered, source, theme):
+        try:
+            rendered[source] = (self.render_diagram(source, 'svg', theme), '')
+        except RequestError as e:
+            rendered[source] = ('', str(e))
+        except Exception as e:
+            raise RequestError(500, f"Rendering failed: {e}") from e
+
+
+def _make_handler(server):
+    class Handler(_Handler):
+        render_server = server
+    return Handler
+
+
+class _Handler(BaseHTTPRequestHandler):
+    render_server = None
+    server_version = "pymerdoc"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Requests are counted in /metrics instead
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            self._respond(url.path, 200, b'ok\n', 'text/plain')
+        elif url.path == '/metrics':
+            text = self.render_server.metrics.render_prometheus(self.render_server.cache)
+            self._respond(url.path, 200, text.encode(), 'text/plain; version=0.0.4')
+        else:
+            self._error(url.path, 404, "Not found")
+
+    def do_POST(self):
+        started = time.perf_counter()
+        url = urlparse(self.path)
+        fmt = url.path.rsplit('/', 1)[-1]
+        if not url.path.startswith('/render/') or fmt not in CONTENT_TYPES:
+            self._error(url.path, 404, "Not found", started)
+            return
+        try:
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            source = self._read_body()
+            theme = query.get('theme')
+            if fmt == 'html':
+                data = self.render_server.render_markdown(source, theme, query.get('title', 'Document'))
+            else:
+                data = self.render_server.render_diagram(
+                    source, fmt, theme, self._scale(query), query.get('background', 'white'),
+                    query.get('optimize', '0').lower() in ('1', 'true', 'yes'))
+        except RequestError as e:
+            self._error(url.path, e.status, str(e), started)
+            return
+        except Exception as e:
+            self._error(url.path, 500, f"Internal error: {e}", started)
+            return
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._respond(url.path, 200, data, CONTENT_TYPES[fmt], started)
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            raise RequestError(400, "Invalid Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise RequestError(413, "Request body too large")
+        try:
+            return self.rfile.read(length).decode('utf-8')
+        except UnicodeDecodeError:
+            raise RequestError(400, "Request body must be UTF-8")
+
+    @staticmethod
+    def _scale(query):
+        try:
+            scale = float(query.get('scale', DEFAULT_PNG_SCALE))
+        except ValueError:
+            raise RequestError(400, "scale must be a number")
+        if not 0 < scale <= MAX_PNG_SCALE:
+            raise RequestError(400, f"scale must be between 0 and {MAX_PNG_SCALE:g}")
+        return scale
+
+    def _error(self, endpoint, status, message, started=None):
+        self._respond(endpoint, status, f"{message}\n".encode('utf-8'),
+                      'text/plain; charset=utf-8', started)
+
+    def _respond(self, endpoint, status, data, content_type, started=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        if started is not None:
+            # Unknown paths share one label so they cannot grow the metrics
+            label = endpoint if status != 404 else 'other'
+            self.render_server.metrics.observe(label, status, time.perf_counter() - started)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pymerdoc serve",
+        description="Serve Mermaid and Markdown rendering over HTTP on localhost."
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help="address to listen on (default: %(default)s)")
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT,
+                        help="port to listen on (default: %(default)s)")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE,
+                        help="warm render pages (default: %(default)s)")
+    parser.add_argument("--max-concurrent", type=int, default=DEFAULT_MAX_CONCURRENT,
+                        help="renders in flight before requests wait (default: %(default)s)")
+    parser.add_argument("--queue-timeout", type=float, default=DEFAULT_QUEUE_TIMEOUT,
+                        help="seconds a request waits for a render slot before a 503 "
+                             "(default: %(default)s)")
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_MB,
+                        help="render cache size in MB (default: %(default)s)")
+    parser.add_argument("--theme", default="default",
+                        help="default mermaid theme (default: %(default)s)")
+    return parser
+
+
+def main(argv=None):
+    """Command line entry point for `pymerdoc serve`"""
+    args = build_parser().parse_args(argv)
+
+    # Nothing is shown, so run without a display unless one was requested
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import signal
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtWidgets import QApplication
+    from pymerdoc.mermaid_render import MermaidRenderPool
+
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    pool = MermaidRenderPool(args.pool_size, app)
+    pool.warm_up()
+    try:
+        server = RenderServer(pool, args.host, args.port, args.max_concurrent,
+                              args.queue_timeout, int(args.cache_mb * 1024 * 1024), args.theme,
+                              args.pool_size)
+    except OSError as e:
+        print(f"pymerdoc: {e}", file=sys.stderr)
+        return 1
+    server.start()
+    print(f"Serving on {server.address} with {args.pool_size} render page(s)")
+
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
+    # Let the Python interpreter run now and then so Ctrl+C is noticed
+    timer = QTimer()
+    timer.timeout.connect(lambda: None)
+    timer.start(250)
+    try:
+        app.exec()
+    finally:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
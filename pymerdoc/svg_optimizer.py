@@ -0,0 +1,374 @@
+"""Shrink SVGs exported from Mermaid.
+
+Mermaid output carries duplicate style rules and marker definitions,
+coordinates with many decimals, IDs nothing refers to and indentation
+whitespace. optimize_svg streams over the markup token by token (no DOM
+is built), so it stays fast on multi-megabyte diagrams:
+
+- identical <style> blocks and CSS rules are kept once
+- identical defs (markers, gradients, filters...) are kept once and
+  references to the dropped copies are pointed at the kept one
+- numbers in geometry attributes are rounded to ``precision`` decimals
+- IDs that are never referenced are removed (the root <svg> keeps its ID,
+  mermaid's CSS is scoped to it)
+- whitespace between tags and inside tags and CSS is collapsed, except
+  inside text elements where it is significant
+
+prefix_ids renames every ID in an SVG, so several SVGs can be inlined
+into one HTML page without their IDs and ID-scoped CSS clashing.
+"""
+import argparse
+import re
+import sys
+from dataclasses import dataclass
+
+DEFAULT_PRECISION = 2
+
+_TOKEN = re.compile(
+    r'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<[?!][^>]*>'
+    r'|<(?:[^>"\']|"[^"]*"|\'[^\']*\')*>|[^<]+',
+    re.DOTALL
+)
+_TAG_NAME = re.compile(r'<\s*/?\s*([\w:.-]+)')
+_ATTRIBUTE = re.compile(r'([\w:.-]+)(\s*=\s*)("[^"]*"|\'[^\']*\')')
+_TAG_PART = re.compile(r'"[^"]*"|\'[^\']*\'|\s+|[^"\'\s]+')
+_NUMBER = re.compile(r'-?(?:\d+\.\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_URL_REFERENCE = re.compile(r'url\(\s*[\'"]?#([^\'")\s]+)')
+_CSS_ID = re.compile(r'#([A-Za-z_][\w-]*)')
+
+NUMERIC_ATTRIBUTES = {
+    'd', 'points', 'transform', 'viewBox', 'x', 'y', 'x1', 'y1', 'x2', 'y2',
+    'cx', 'cy', 'r', 'rx', 'ry', 'width', 'height', 'dx', 'dy', 'refX', 'refY',
+    'markerWidth', 'markerHeight', 'stroke-width', 'font-size', 'offset',
+}
+DEDUPLICATED_DEFS = {
+    'marker', 'linearGradient', 'radialGradient', 'filter', 'pattern', 'clipPath',
+    'mask', 'symbol',
+}
+# Whitespace inside these elements is rendered
+TEXT_ELEMENTS = {'text', 'tspan', 'textPath', 'foreignObject', 'title', 'desc'}
+REFERENCE_ATTRIBUTES = {'href', 'xlink:href', 'aria-labelledby', 'aria-describedby'}
+
+
+@dataclass
+class SvgOptimization:
+    """An optimized SVG and its size before and after, in UTF-8 bytes"""
+    svg: str
+    original_size: int
+    optimized_size: int
+
+    @property
+    def saved(self):
+        return self.original_size - self.optimized_size
+
+    def describe(self):
+        percent = 100 * self.saved / self.original_size if self.original_size else 0
+        return (f"{self.original_size / 1024:.1f} KB -> {self.optimized_size / 1024:.1f} KB "
+                f"({percent:.0f}% smaller)")
+
+
+def format_number(text, precision):
+    """Round a decimal number string, dropping trailing zeros"""
+    value = round(float(text), precision)
+    formatted = f"{value:.{precision}f}".rstrip('0').rstrip('.') if precision else f"{value:.0f}"
+    return '0' if formatted in ('-0', '') else formatted
+
+
+def _tag_name(token):
+    match = _TAG_NAME.match(token)
+    return match.group(1) if match else ''
+
+
+def _is_end_tag(token):
+    return token.startswith('</')
+
+
+def _is_self_closing(token):
+    return token.endswith('/>')
+
+
+def minify_css(css):
+    """Collapse whitespace in CSS and drop repeated top-level rules"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}').strip()
+
+    rules = []
+    seen = set()
+    depth = 0
+    start = 0
+    for index, char in enumerate(css):
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rule = css[start:index + 1]
+                if rule not in seen:
+                    seen.add(rule)
+                    rules.append(rule)
+                start = index + 1
+    if depth != 0:
+        # Unbalanced braces: keep the CSS as it is rather than guess
+        return css
+    rules.append(css[start:])
+    return ''.join(rules)
+
+
+class _Optimizer:
+    def __init__(self, svg, precision, strip_ids):
+        self.tokens = _TOKEN.findall(svg)
+        self.precision = precision
+        self.strip_ids = strip_ids
+        self.renamed = {}
+
+    # --- pass 1: find duplicate defs and referenced ids --------------------
+
+    def _def_extent(self, start):
+        """Index after the element starting at tokens[start]"""
+        name = _tag_name(self.tokens[start])
+        if _is_self_closing(self.tokens[start]):
+            return start + 1
+        depth = 0
+        for index in range(start, len(self.tokens)):
+            token = self.tokens[index]
+            if token.startswith('<') and _tag_name(token) == name:
+                if _is_end_tag(token):
+                    depth -= 1
+                    if depth == 0:
+                        return index + 1
+                elif not _is_self_closing(token):
+                    depth += 1
+        return len(self.tokens)
+
+    def find_duplicate_defs(self):
+        """Map ids of duplicate definitions to the id of their first copy
+
+        Returns the set of token indexes to drop.
+        """
+        drop = set()
+        seen = {}
+        index = 0
+        while index < len(self.tokens):
+            token = self.tokens[index]
+            id_match = re.search(r'\sid\s*=\s*("([^"]*)"|\'([^\']*)\')', token)
+            if (token.startswith('<') and not _is_end_tag(token) and id_match
+                    and _tag_name(token) in DEDUPLICATED_DEFS):
+                end = self._def_extent(index)
+                element_id = id_match.group(2) if id_match.group(2) is not None \
+                    else id_match.group(3)
+                body = (token.replace(id_match.group(0), ''),) + tuple(self.tokens[index + 1:end])
+                if body in seen:
+                    self.renamed[element_id] = seen[body]
+                    drop.update(range(index, end))
+                else:
+                    seen[body] = element_id
+                index = end
+            else:
+                index += 1
+        return drop
+
+    def referenced_ids(self, drop):
+        referenced = set()
+        in_style = False
+        for index, token in enumerate(self.tokens):
+            if index in drop:
+                continue
+            referenced.update(_URL_REFERENCE.findall(token))
+            if token.startswith('<') and not token.startswith('<!--'):
+                name = _tag_name(token)
+                in_style = name == 'style' and not _is_end_tag(token) \
+                    and not _is_self_closing(token)
+                for attribute, _, value in _ATTRIBUTE.findall(token):
+                    if attribute in REFERENCE_ATTRIBUTES:
+                        referenced.update(v.lstrip('#') for v in value[1:-1].split())
+            elif in_style:
+                referenced.update(_CSS_ID.findall(re.sub(r'\{[^{}]*\}', '{}', token)))
+        return {self.renamed.get(i, i) for i in referenced}
+
+    # --- pass 2: write the optimized tokens ---------------------------------
+
+    def _rename(self, text):
+        if not self.renamed:
+            return text
+        return _URL_REFERENCE.sub(
+            lambda m: m.group(0)[:-len(m.group(1))] + self.renamed.get(m.group(1), m.group(1)),
+            text)
+
+    def _rewrite_attribute(self, match, is_root, referenced):
+        name, value = match.group(1), match.group(3)
+        quote, inner = value[0], value[1:-1]
+        if name == 'id' and self.strip_ids and not is_root and inner not in referenced:
+            return ''
+        if name in ('href', 'xlink:href') and inner.startswith('#'):
+            inner = '#' + self.renamed.get(inner[1:], inner[1:])
+        elif name in NUMERIC_ATTRIBUTES and self.precision is not None:
+            inner = _NUMBER.sub(lambda m: format_number(m.group(0), self.precision), inner)
+        return f'{name}={quote}{self._rename(inner)}{quote}'
+
+    def _rewrite_tag(self, token, is_root, referenced, minify):
+        token = _ATTRIBUTE.sub(lambda m: self._rewrite_attribute(m, is_root, referenced), token)
+        if not minify:
+            return token
+        # Collapse whitespace between attributes, leaving quoted values alone
+        token = ''.join(' ' if part.isspace() else part for part in _TAG_PART.findall(token))
+        return re.sub(r'\s+(/?>)$', r'\1', token)
+
+    def _style_text(self, start):
+        """The CSS between the <style> tag at start and its end tag"""
+        try:
+            end = self.tokens.index('</style>', start)
+        except ValueError:
+            end = start + 1
+        return ''.join(self.tokens[start + 1:end])
+
+    def run(self, dedupe, minify):
+        drop = self.find_duplicate_defs() if dedupe else set()
+        referenced = self.referenced_ids(drop)
+        output = []
+        styles = set()
+        text_depth = 0  # open elements since entering a text element
+        root_seen = False
+        skip_style = False
+        in_style = False
+
+        for index, token in enumerate(self.tokens):
+            if index in drop or token.startswith('<!--'):
+                continue
+            if token.startswith(('<?', '<!')):
+                output.append(token)
+            elif token.startswith('<'):
+                name = _tag_name(token)
+                if skip_style:
+                    skip_style = not (name == 'style' and _is_end_tag(token))
+                    continue
+                if _is_end_tag(token):
+                    in_style = False
+                    text_depth = max(0, text_depth - 1)
+                    output.append(token)
+                    continue
+
+                if name == 'style' and not _is_self_closing(token):
+                    css = self._style_text(index)
+                    if dedupe and css in styles:
+                        skip_style = True
+                        continue
+                    styles.add(css)
+                    in_style = True
+                if (text_depth or name in TEXT_ELEMENTS) and not _is_self_closing(token):
+                    text_depth += 1
+                is_root = name == 'svg' and not root_seen
+                root_seen = root_seen or name == 'svg'
+                output.append(self._rewrite_tag(token, is_root, referenced, minify))
+            elif skip_style:
+                continue
+            elif in_style:
+                css = self._rename(token)
+                output.append(minify_css(css) if minify else css)
+            elif text_depth or not minify:
+                output.append(token)
+            elif token.strip():
+                output.append(token.strip())
+        return ''.join(output)
+
+
+def optimize_svg(svg, precision=DEFAULT_PRECISION, dedupe=True, strip_ids=True, minify=True):
+    """Optimize SVG markup and return an SvgOptimization
+
+    ``precision`` is the number of decimals kept in geometry attributes,
+    or None to leave numbers alone.
+    """
+    optimized = _Optimizer(svg, precision, strip_ids).run(dedupe, minify)
+    return SvgOptimization(optimized, len(svg.encode('utf-8')), len(optimized.encode('utf-8')))
+
+
+def prefix_ids(svg, prefix):
+    """Prefix the IDs in SVG markup and every reference to them
+
+    References are ``href``/``xlink:href`` and ARIA attributes, ``url(#id)``
+    in attributes and ``#id`` selectors in <style> blocks.
+    """
+    tokens = _TOKEN.findall(svg)
+    ids = set()
+    for token in tokens:
+        if token.startswith('<') and not token.startswith(('<!', '<?')):
+            ids.update(value[1:-1] for name, _, value in _ATTRIBUTE.findall(token) if name == 'id')
+    if not ids:
+        return svg
+
+    def rename(match):
+        element_id = match.group(1)
+        if element_id not in ids:
+            return match.group(0)
+        return match.group(0)[:-len(element_id)] + prefix + element_id
+
+    def rename_reference(reference):
+        element_id = reference.lstrip('#')
+        if element_id not in ids:
+            return reference
+        return reference[:-len(element_id)] + prefix + element_id
+
+    def rewrite_attribute(match):
+        name, equals, value = match.groups()
+        quote, inner = value[0], value[1:-1]
+        if name == 'id':
+            inner = prefix + inner
+        elif name in REFERENCE_ATTRIBUTES:
+            inner = ' '.join(rename_reference(reference) for reference in inner.split())
+        else:
+            inner = _URL_REFERENCE.sub(rename, inner)
+        return f'{name}{equals}{quote}{inner}{quote}'
+
+    output = []
+    in_style = False
+    for token in tokens:
+        if token.startswith('<') and not token.startswith(('<!', '<?')):
+            in_style = (_tag_name(token) == 'style' and not _is_end_tag(token)
+                        and not _is_self_closing(token))
+            output.append(_ATTRIBUTE.sub(rewrite_attribute, token))
+        elif in_style:
+            output.append(_CSS_ID.sub(rename, token))
+        else:
+            output.append(token)
+    return ''.join(output)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pymerdoc-mc optimize-svg",
+        description="Shrink SVG files exported from Mermaid in place or into a new file."
+    )
+    parser.add_argument("files", nargs="+", help="SVG files to optimize")
+    parser.add_argument("-o", "--output",
+                        help="output file (only with a single input; default: in place)")
+    parser.add_argument("-p", "--precision", type=int, default=DEFAULT_PRECISION,
+                        help="decimals kept in coordinates (default: %(default)s)")
+    parser.add_argument("--keep-ids", action="store_true", help="keep unreferenced IDs")
+    return parser
+
+
+def main(argv=None):
+    """Command line entry point for `pymerdoc-mc optimize-svg`"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.output and len(args.files) > 1:
+        parser.error("--output needs a single input file")
+
+    for path in args.files:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = optimize_svg(f.read(), args.precision, strip_ids=not args.keep_ids)
+            output = args.output or path
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(result.svg)
+        except OSError as e:
+            print(f"pymerdoc-mc: {e}", file=sys.stderr)
+            return 1
+        print(f"{output}: {result.describe()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,182 @@
+from functools import lru_cache
+
 from PyQt6.QtCore import QSettings
 from PyQt6.QtWidgets import QMenu
-from PyQt6.QtGui import QAction, QActionGroup
+from PyQt6.QtGui import QAction, QActionGroup, QColor, QPalette
+
+# Base colors go through QPalette; the stylesheets below only cover what the
+# palette cannot express, so applying a theme does not restyle every widget
+PALETTE_COLORS = {
+    "dark": {
+        QPalette.ColorRole.Window: "#1e1e1e",
+        QPalette.ColorRole.WindowText: "#ffffff",
+        QPalette.ColorRole.Base: "#252526",
+        QPalette.ColorRole.AlternateBase: "#2d2d2d",
+        QPalette.ColorRole.Text: "#ffffff",
+        QPalette.ColorRole.Button: "#2d2d2d",
+        QPalette.ColorRole.ButtonText: "#ffffff",
+        QPalette.ColorRole.Highlight: "#3c3c3c",
+        QPalette.ColorRole.HighlightedText: "#ffffff",
+        QPalette.ColorRole.ToolTipBase: "#252526",
+        QPalette.ColorRole.ToolTipText: "#ffffff",
+        QPalette.ColorRole.PlaceholderText: "#9d9d9d",
+    },
+    "light": {
+        QPalette.ColorRole.Window: "#ffffff",
+        QPalette.ColorRole.WindowText: "#000000",
+        QPalette.ColorRole.Base: "#ffffff",
+        QPalette.ColorRole.AlternateBase: "#f6f8fa",
+        QPalette.ColorRole.Text: "#000000",
+        QPalette.ColorRole.Button: "#f0f0f0",
+        QPalette.ColorRole.ButtonText: "#000000",
+        QPalette.ColorRole.Highlight: "#e0e0e0",
+        QPalette.ColorRole.HighlightedText: "#000000",
+        QPalette.ColorRole.ToolTipBase: "#ffffff",
+        QPalette.ColorRole.ToolTipText: "#000000",
+        QPalette.ColorRole.PlaceholderText: "#808080",
+    },
+}
+
+MAIN_WINDOW_STYLESHEETS = {
+    "dark": """
+        QTextEdit { border: 1px solid #3c3c3c; }
+        QMenuBar { background-color: #1e1e1e; color: #ffffff; }
+        QMenuBar::item:selected { background-color: #3c3c3c; }
+        QMenu { background-color: #1e1e1e; color: #ffffff; border: 1px solid #3c3c3c; }
+        QMenu::item:selected { background-color: #3c3c3c; }
+    """,
+    "light": """
+        QTextEdit { border: 1px solid #d0d0d0; }
+        QMenuBar { background-color: #f0f0f0; color: #000000; }
+        QMenuBar::item:selected { background-color: #e0e0e0; }
+        QMenu { background-color: #ffffff; color: #000000; border: 1px solid #d0d0d0; }
+        QMenu::item:selected { background-color: #e0e0e0; }
+    """,
+}
+
+_palettes = {}
+
+
+def theme_palette(theme):
+    """Shared QPalette for a theme; the default palette for the system theme"""
+    if theme not in _palettes:
+        palette = QPalette()
+        for role, color in PALETTE_COLORS.get(theme, {}).items():
+            palette.setColor(role, QColor(color))
+        _palettes[theme] = palette
+    return _palettes[theme]
+
+
+@lru_cache(maxsize=None)
+def dialog_stylesheet(is_dark):
+    """Stylesheet shared by the tool dialogs, built once per mode"""
+    bg_color = "#2e2e2e" if is_dark else "#ffffff"
+    text_color = "#ffffff" if is_dark else "#000000"
+    field_bg = "#3c3c3c" if is_dark else "#ffffff"
+    border_color = "#555555" if is_dark else "#cccccc"
+    button_bg = "#424242" if is_dark else "#f0f0f0"
+    button_hover = "#4f4f4f" if is_dark else "#e0e0e0"
+    button_pressed = "#383838" if is_dark else "#d0d0d0"
+    item_hover = "#4a4a4a" if is_dark else "#f0f0f0"
+    accent_color = "#3daee9"
+
+    return f"""
+        QDialog {{
+            background-color: {bg_color};
+            color: {text_color};
+        }}
+        QLabel {{
+            color: {text_color};
+        }}
+        QTextEdit {{
+            background-color: {field_bg};
+            color: {text_color};
+            border: 1px solid {border_color};
+            border-radius: 4px;
+            padding: 8px;
+        }}
+        QListWidget {{
+            background-color: {field_bg};
+            border: 1px solid {border_color};
+            border-radius: 4px;
+            color: {text_color};
+        }}
+        QListWidget::item {{
+            padding: 5px;
+            border-radius: 2px;
+        }}
+        QListWidget::item:selected {{
+            background-color: {accent_color};
+            color: white;
+        }}
+        QListWidget::item:hover {{
+            background-color: {item_hover};
+        }}
+        QPushButton {{
+            background-color: {button_bg};
+            color: {text_color};
+            border: 1px solid {border_color};
+            border-radius: 4px;
+            padding: 8px 16px;
+            min-width: 120px;
+        }}
+        QPushButton:hover {{
+            background-color: {button_hover};
+            border: 1px solid {accent_color};
+        }}
+        QPushButton:pressed {{
+            background-color: {button_pressed};
+        }}
+        QPushButton#primaryButton {{
+            background-color: {accent_color};
+            color: white;
+            border: none;
+            font-weight: bold;
+        }}
+        QPushButton#primaryButton:hover {{
+            background-color: #3498db;
+        }}
+        QPushButton#primaryButton:pressed {{
+            background-color: #2980b9;
+        }}
+        ColorButton {{
+            min-width: 0px;
+            padding: 0px;
+        }}
+    """
+
 
 class ThemeManager:
     LIGHT = "light"
     DARK = "dark"
     SYSTEM = "system"
 
+    # Settings snapshot shared by every instance, so QSettings is read once
+    _snapshot = {}
+
     def __init__(self, main_window):
         self.main_window = main_window
-        self.settings = QSettings("YourCompany", "DocumentationEditor")
+        self._settings = None
+
+    @property
+    def settings(self):
+        if self._settings is None:
+            self._settings = QSettings("YourCompany", "DocumentationEditor")
+        return self._settings
 
     def get_theme(self):
-        return self.settings.value("theme", self.SYSTEM)
+        if "theme" not in ThemeManager._snapshot:
+            ThemeManager._snapshot["theme"] = self.settings.value("theme", self.SYSTEM)
+        return ThemeManager._snapshot["theme"]
 
     def set_theme(self, theme):
+        ThemeManager._snapshot["theme"] = theme
         self.settings.setValue("theme", theme)
         self.apply_theme(theme)
 
+    def is_dark(self):
+        return self.get_theme() == self.DARK
+
     def apply_theme(self, theme):
         if theme == self.DARK:
             self._apply_dark_theme()
@@ -27,74 +186,37 @@ class ThemeManager:
             self._apply_system_theme()
 
     def _apply_dark_theme(self):
-        # Dark theme styles
-        style = """
-            QMainWindow, QWidget {
-                background-color: #1e1e1e;
-                color: #ffffff;
-            }
-            QTextEdit {
-                background-color: #252526;
-                color: #ffffff;
-                border: 1px solid #3c3c3c;
-            }
-            QMenuBar {
-                background-color: #1e1e1e;
-                color: #ffffff;
-            }
-            QMenuBar::item:selected {
-                background-color: #3c3c3c;
-            }
-            QMenu {
-                background-color: #1e1e1e;
-                color: #ffffff;
-                border: 1px solid #3c3c3c;
-            }
-            QMenu::item:selected {
-                background-color: #3c3c3c;
-            }
-        """
-        self.main_window.setStyleSheet(style)
+        self._apply_styles(self.DARK)
         self._update_preview_theme("dark")
 
     def _apply_light_theme(self):
-        # Light theme styles
-        style = """
-            QMainWindow, QWidget {
-                background-color: #ffffff;
-                color: #000000;
-            }
-            QTextEdit {
-                background-color: #ffffff;
-                color: #000000;
-                border: 1px solid #d0d0d0;
-            }
-            QMenuBar {
-                background-color: #f0f0f0;
-                color: #000000;
-            }
-            QMenuBar::item:selected {
-                background-color: #e0e0e0;
-            }
-            QMenu {
-                background-color: #ffffff;
-                color: #000000;
-                border: 1px solid #d0d0d0;
-            }
-            QMenu::item:selected {
-                background-color: #e0e0e0;
-            }
-        """
-        self.main_window.setStyleSheet(style)
+        self._apply_styles(self.LIGHT)
         self._update_preview_theme("light")
 
     def _apply_system_theme(self):
-        self.main_window.setStyleSheet("")  # Reset to system theme
+        self._apply_styles(self.SYSTEM)  # Reset to system theme
         self._update_preview_theme("default")
 
+    def _apply_styles(self, theme):
+        """Set the theme's palette and precompiled stylesheet on the main window"""
+        self.main_window.setPalette(theme_palette(theme))
+        stylesheet = MAIN_WINDOW_STYLESHEETS.get(theme, "")
+        # Setting an identical stylesheet still repolishes every child
+        if self.main_window.styleSheet() != stylesheet:
+            self.main_window.setStyleSheet(stylesheet)
+
+    def apply_dialog_theme(self, dialog, is_dark=None):
+        """Style a tool dialog with the shared palette and stylesheet"""
+        if is_dark is None:
+            is_dark = self.is_dark()
+        dialog.setPalette(theme_palette(self.DARK if is_dark else self.LIGHT))
+        dialog.setStyleSheet(dialog_stylesheet(is_dark))
+
     def _update_preview_theme(self, theme):
-        # Update the preview's mermaid theme
+        # Update the preview's mermaid theme and the editor's highlighting colors
         self.main_window.current_preview_theme = theme
+        highlighter = getattr(self.main_window, "highlighter", None)
+        if highlighter is not None:
+            base = self.main_window.palette().color(QPalette.ColorRole.Base)
+            highlighter.set_dark(base.lightness() < 128)
         self.main_window.update_preview()
-
-
@@ -0,0 +1,125 @@
+"""Fast image downscaling with an on-disk cache.
+
+Thumbnails are keyed by the source path, its modification time and file
+size, and the requested size, so edited frames get fresh thumbnails while
+unchanged ones are read straight from the cache. This module does not
+import Qt; callers decide which thread to run it on.
+"""
+import hashlib
+import io
+import os
+import threading
+
+from PIL import Image
+
+DEFAULT_THUMBNAIL_SIZE = (96, 96)
+MAX_VARIANT_HEIGHT = 1 << 16  # Preview variants are limited by width only
+
+
+def default_cache_dir(name="thumbnails"):
+    """Return the per-user cache directory for pymerdoc image caches"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pymerdoc", name)
+
+
+def fast_downscale(img, size):
+    """Shrink an opened image to fit within size as cheaply as possible
+
+    ``draft`` lets the JPEG decoder scale while decoding; for other formats
+    ``reduce`` does a fast integer box downscale before the final resize.
+    Palette and other modes ``reduce`` cannot handle are converted first.
+    """
+    scale = min(size[0] / img.size[0], size[1] / img.size[1])
+    if scale >= 1:
+        return img
+    # The fitted size, so a box much taller or wider than the image still reduces
+    target = (max(1, round(img.size[0] * scale)), max(1, round(img.size[1] * scale)))
+    img.draft('RGB', target)
+    factor = min(img.size[0] // target[0], img.size[1] // target[1])
+    if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        transparent = 'transparency' in img.info or img.mode in ('PA', 'RGBa', 'La')
+        img = img.convert('RGBA' if transparent else 'RGB')
+    if factor >= 2:
+        img = img.reduce(factor)
+    if img.size != target:
+        img = img.resize(target, Image.Resampling.BILINEAR)
+    return img
+
+
+def _save_png(img, cache_path):
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA')
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Write to a temp file first so readers never see a partial image
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    img.save(tmp_path, 'PNG')
+    os.replace(tmp_path, cache_path)
+
+
+class ThumbnailCache:
+    """Create and cache downscaled copies of image files on disk"""
+
+    def __init__(self, cache_dir=None, size=DEFAULT_THUMBNAIL_SIZE):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.size = tuple(size)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def cache_path(self, path):
+        """Cache file for path, keyed by path, mtime, file size and thumbnail size"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = f"{path}|{stat.st_mtime_ns}|{stat.st_size}|{self.size[0]}x{self.size[1]}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".png")
+
+    def get(self, path):
+        """Return the path of a cached thumbnail for path, creating it if needed"""
+        thumb_path = self.cache_path(path)
+        if os.path.exists(thumb_path):
+            return thumb_path
+
+        with Image.open(path) as img:
+            _save_png(fast_downscale(img, self.size), thumb_path)
+        return thumb_path
+
+
+class PreviewImageCache:
+    """Display-width variants of document images for the live preview
+
+    Variants are cached on disk keyed by the source, its modification time
+    and the width. Images already narrow enough, animations and files
+    Pillow cannot read get no variant; callers serve the original.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or default_cache_dir("preview")
+
+    def _variant_path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".png")
+
+    def _variant(self, cache_path, open_image, width):
+        if os.path.exists(cache_path):
+            return cache_path
+        try:
+            with open_image() as img:
+                if img.size[0] <= width or getattr(img, 'is_animated', False):
+                    return None
+                _save_png(fast_downscale(img, (width, MAX_VARIANT_HEIGHT)), cache_path)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+        return cache_path
+
+    def get(self, path, width):
+        """Path of a variant of the image file at most width wide, or None"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = f"{path}|{stat.st_mtime_ns}|{stat.st_size}|{width}"
+        return self._variant(self._variant_path(key), lambda: Image.open(path), width)
+
+    def get_member(self, archive_path, name, data, width):
+        """Variant of an image stored in an archive such as a bundle, or None"""
+        archive_path = os.path.abspath(archive_path)
+        stat = os.stat(archive_path)
+        key = f"{archive_path}|{name}|{stat.st_mtime_ns}|{stat.st_size}|{width}"
+        return self._variant(self._variant_path(key), lambda: Image.open(io.BytesIO(data)), width)
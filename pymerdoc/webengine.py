@@ -0,0 +1,176 @@
+"""Chromium process model and renderer memory budget for the web views.
+
+Each QWebEngineView and offscreen render page may get its own Chromium
+renderer process. The process model chosen here is passed to Chromium as
+command line flags, which only take effect if configure() runs before the
+QApplication is created. The RendererMonitor measures the renderer
+processes of the tracked pages and, while they use more than the memory
+budget, discards pages that have been hidden for a while; Qt reloads a
+discarded page when it is shown again.
+"""
+import os
+import sys
+import time
+
+from PyQt6 import sip
+from PyQt6.QtCore import QCoreApplication, QObject, QTimer, pyqtSignal
+from PyQt6.QtWebEngineCore import QWebEnginePage
+
+FLAGS_ENV = "QTWEBENGINE_CHROMIUM_FLAGS"
+MODEL_ENV = "PYMERDOC_PROCESS_MODEL"
+BUDGET_ENV = "PYMERDOC_MEMORY_BUDGET_MB"
+
+PROCESS_MODELS = ('default', 'limited', 'single')
+DEFAULT_RENDERER_LIMIT = 2
+DEFAULT_MEMORY_BUDGET_MB = 1024
+CHECK_INTERVAL = 5000  # Milliseconds between memory checks
+IDLE_SECONDS = 60  # How long a page must be hidden before it may be discarded
+
+memory_budget_mb = DEFAULT_MEMORY_BUDGET_MB  # Set by configure()
+_monitor = None
+
+
+def chromium_flags(model='default', renderer_limit=DEFAULT_RENDERER_LIMIT):
+    """Chromium flags for a process model
+
+    ``default`` lets Chromium start a renderer per page, ``limited`` caps the
+    number of renderer processes at renderer_limit and ``single`` runs the
+    renderer inside the application process (smallest, least isolated).
+    """
+    if model not in PROCESS_MODELS:
+        raise ValueError(f"Unknown process model '{model}', expected one of "
+                         f"{', '.join(PROCESS_MODELS)}")
+    if model == 'limited':
+        if renderer_limit < 1:
+            raise ValueError("The renderer limit must be at least 1")
+        return [f"--renderer-process-limit={renderer_limit}"]
+    if model == 'single':
+        return ["--single-process"]
+    return []
+
+
+def configure(model=None, renderer_limit=DEFAULT_RENDERER_LIMIT, budget_mb=None):
+    """Apply a process model and memory budget; must run before the QApplication exists
+
+    Unset arguments come from PYMERDOC_PROCESS_MODEL and
+    PYMERDOC_MEMORY_BUDGET_MB. Flags already in QTWEBENGINE_CHROMIUM_FLAGS
+    are kept. Returns the flags that were added.
+    """
+    global memory_budget_mb
+    model = model or os.environ.get(MODEL_ENV) or 'default'
+    flags = chromium_flags(model, renderer_limit)
+    existing = os.environ.get(FLAGS_ENV, "").split()
+    added = [flag for flag in flags if flag not in existing]
+    if added:
+        os.environ[FLAGS_ENV] = " ".join(existing + added)
+    if budget_mb is None:
+        budget_mb = int(os.environ.get(BUDGET_ENV) or DEFAULT_MEMORY_BUDGET_MB)
+    memory_budget_mb = budget_mb
+    return added
+
+
+def process_memory(pid):
+    """Resident memory of a process in bytes, or None where it cannot be read
+
+    Uses psutil when it is installed and /proc otherwise (Linux only).
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        with open(f"/proc/{pid}/status", encoding='ascii') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def format_memory(total, processes):
+    """Status text for measure() results"""
+    plural = "es" if processes != 1 else ""
+    if total is None:
+        return f"Renderers: {processes} process{plural}"
+    return f"Renderers: {total / (1024 * 1024):.0f} MB in {processes} process{plural}"
+
+
+class RendererMonitor(QObject):
+    """Measures the renderer processes of tracked pages and keeps them in budget"""
+
+    measured = pyqtSignal(object, int)  # bytes used by the renderers or None, processes
+
+    def __init__(self, budget_mb=None, parent=None, interval=CHECK_INTERVAL,
+                 idle_seconds=IDLE_SECONDS):
+        super().__init__(parent)
+        self.budget_mb = memory_budget_mb if budget_mb is None else budget_mb
+        self.idle_seconds = idle_seconds
+        self.pages = {}  # id -> (page, may be discarded)
+        self.hidden_since = {}  # id -> when the page was first seen hidden
+        self.discarded = 0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check)
+        self.timer.start(interval)
+
+    def track(self, page, discardable=True):
+        """Include a page in the measurements; offscreen render pages pass discardable=False"""
+        self.pages[id(page)] = (page, discardable)
+
+    def _live_pages(self):
+        """(key, page, discardable) of the tracked pages Qt has not deleted yet"""
+        for key, (page, discardable) in list(self.pages.items()):
+            if sip.isdeleted(page):
+                del self.pages[key]
+                self.hidden_since.pop(key, None)
+            else:
+                yield key, page, discardable
+
+    def measure(self):
+        """(bytes, processes) of the tracked pages' renderers; bytes is None if unknown"""
+        pids = {page.renderProcessPid() for _, page, _ in self._live_pages()}
+        pids.discard(0)
+        sizes = [process_memory(pid) for pid in pids]
+        if not pids or None in sizes:
+            return None, len(pids)
+        return sum(sizes), len(pids)
+
+    def check(self):
+        """Measure, then discard idle hidden pages while over budget"""
+        total, processes = self.measure()
+        self.measured.emit(total, processes)
+
+        now = time.monotonic()
+        idle = []
+        for key, page, discardable in self._live_pages():
+            state = page.lifecycleState()
+            if page.isVisible():
+                self.hidden_since.pop(key, None)
+                if state != QWebEnginePage.LifecycleState.Active:
+                    page.setLifecycleState(QWebEnginePage.LifecycleState.Active)
+            elif discardable:
+                since = self.hidden_since.setdefault(key, now)
+                if (now - since >= self.idle_seconds and
+                        state != QWebEnginePage.LifecycleState.Discarded):
+                    idle.append(page)
+
+        if total is None or total <= self.budget_mb * 1024 * 1024:
+            return
+        for page in idle:
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Discarded)
+            self.discarded += 1
+
+
+def renderer_monitor():
+    """The application-wide RendererMonitor, created on first use"""
+    global _monitor
+    if _monitor is None or sip.isdeleted(_monitor):
+        _monitor = RendererMonitor(parent=QCoreApplication.instance())
+    return _monitor
@@ -34,6 +34,10 @@ setup(
     ],
     python_requires=">=3.8",
     install_requires=requirements,
+    extras_require={
+        # YAML job files for pymerdoc-gm --job-file
+        'yaml': ['PyYAML>=6.0'],
+    },
     entry_points={
         'console_scripts': [
             'pymerdoc=pymerdoc.main:main',
@@ -0,0 +1,197 @@
+# tests/test_build.py
+import json
+import os
+import time
+
+from pymerdoc.build import MANIFEST_NAME, DocBuilder, main
+
+DIAGRAM = "```mermaid\ngraph TD\n    A-->B\n```\n"
+
+
+class FakeRenderer:
+    """Stands in for MermaidRenderer, counting renders; the first ``failures`` renders fail"""
+
+    class Result:
+        def __init__(self, source, failed=False):
+            self.ok = "broken" not in source and not failed
+            self.svg = f"<svg><!-- {len(source)} --></svg>"
+            self.error = "" if self.ok else "Parse error"
+
+    def __init__(self, failures=0):
+        self.sources = []
+        self.failures = failures
+
+    def render_sync(self, source):
+        self.sources.append(source)
+        failed = self.failures > 0
+        self.failures -= failed
+        return self.Result(source, failed)
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    # Make sure a rewrite within the same clock tick still changes the mtime
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_incremental_build(tmp_path):
+    """Test that only changed documents and new diagrams are rebuilt"""
+    src, out = tmp_path / "docs", tmp_path / "site"
+    write(str(src / "index.md"), "# Index\n\n" + DIAGRAM)
+    write(str(src / "guide" / "setup.md"), "# Setup\n\n" + DIAGRAM.replace("A-->B", "A --> B"))
+    renderer = FakeRenderer()
+
+    report = DocBuilder(str(src), str(out), renderer=renderer).build()
+    assert report.built == ["guide/setup.md", "index.md"]
+    # Both documents share one structurally identical diagram
+    assert report.diagrams_rendered == 1
+    page = (out / "guide" / "setup.html").read_text(encoding="utf-8")
+    assert 'src="../_diagrams/' in page
+
+    # A fresh builder picks up the manifest and has nothing to do
+    builder = DocBuilder(str(src), str(out), renderer=renderer)
+    assert not builder.build().changed
+
+    write(str(src / "index.md"), "# Index, edited\n\n" + DIAGRAM)
+    report = builder.build()
+    assert report.built == ["index.md"]
+    assert report.diagrams_rendered == 0
+    assert len(renderer.sources) == 1
+
+    os.remove(src / "guide" / "setup.md")
+    report = builder.build()
+    assert report.removed == ["guide/setup.md"]
+    assert not (out / "guide" / "setup.html").exists()
+
+
+def test_theme_change_rebuilds_everything(tmp_path):
+    """Test that the manifest is discarded when the theme changes"""
+    src, out = tmp_path / "docs", tmp_path / "site"
+    write(str(src / "index.md"), DIAGRAM)
+    DocBuilder(str(src), str(out), renderer=FakeRenderer()).build()
+
+    report = DocBuilder(str(src), str(out), theme="dark", renderer=FakeRenderer()).build()
+    assert report.built == ["index.md"]
+    with open(out / MANIFEST_NAME, encoding="utf-8") as f:
+        assert json.load(f)["theme"] == "dark"
+
+
+def test_mermaid_url_change_rebuilds_everything(tmp_path, monkeypatch):
+    """Test that rendering with another mermaid (PYMERDOC_MERMAID_URL) discards the manifest"""
+    src, out = tmp_path / "docs", tmp_path / "site"
+    write(str(src / "index.md"), DIAGRAM)
+    monkeypatch.delenv("PYMERDOC_MERMAID_URL", raising=False)
+    DocBuilder(str(src), str(out), renderer=FakeRenderer()).build()
+
+    monkeypatch.setenv("PYMERDOC_MERMAID_URL", "file:///opt/mermaid/11.0.0/mermaid.min.js")
+    renderer = FakeRenderer()
+    report = DocBuilder(str(src), str(out), renderer=renderer).build()
+    assert report.built == ["index.md"] and len(renderer.sources) == 1
+    with open(out / MANIFEST_NAME, encoding="utf-8") as f:
+        assert json.load(f)["mermaid"] == "file:///opt/mermaid/11.0.0/mermaid.min.js"
+
+
+def test_render_errors_are_reported(tmp_path):
+    """Test that a diagram that fails to render is reported and shown as source"""
+    src, out = tmp_path / "docs", tmp_path / "site"
+    write(str(src / "index.md"), DIAGRAM.replace("A-->B", "A-->B %% broken"))
+    report = DocBuilder(str(src), str(out), renderer=FakeRenderer()).build()
+    assert len(report.errors) == 1
+    assert "diagram-error" in (out / "index.html").read_text(encoding="utf-8")
+
+
+def test_failed_render_is_retried(tmp_path):
+    """Test that a document whose diagram failed to render is rebuilt by the next build"""
+    src, out = tmp_path / "docs", tmp_path / "site"
+    write(str(src / "index.md"), DIAGRAM)
+    renderer = FakeRenderer(failures=1)
+    report = DocBuilder(str(src), str(out), renderer=renderer).build()
+    assert len(report.errors) == 1
+
+    report = DocBuilder(str(src), str(out), renderer=renderer).build()
+    assert report.built == ["index.md"] and not report.errors
+    assert report.diagrams_rendered == 1
+    assert '<pre class="diagram-error">' not in (out / "index.html").read_text(encoding="utf-8")
+    assert not DocBuilder(str(src), str(out), renderer=renderer).build().changed
+
+
+def test_undecodable_document_is_reported(tmp_path):
+    """Test that a file that is not UTF-8 is reported without stopping the build"""
+    src, out = tmp_path / "docs", tmp_path / "site"
+    write(str(src / "index.md"), DIAGRAM)
+    (src / "latin1.md").write_bytes("# Caf\xe9\n".encode("latin-1"))
+    report = DocBuilder(str(src), str(out), renderer=FakeRenderer()).build()
+    assert report.built == ["index.md"]
+    assert len(report.errors) == 1 and "latin1.md" in report.errors[0]
+    assert not (out / "latin1.html").exists()
+
+
+def test_undecodable_document_is_not_reread(tmp_path):
+    """Test that a file turning non-UTF-8 loses its page and is only read again once it changes"""
+    src, out = tmp_path / "docs", tmp_path / "site"
+    write(str(src / "cafe.md"), "# Cafe\n")
+    DocBuilder(str(src), str(out), renderer=FakeRenderer()).build()
+    assert (out / "cafe.html").exists()
+
+    (src / "cafe.md").write_bytes("# Caf\xe9\n".encode("latin-1"))
+    report = DocBuilder(str(src), str(out), renderer=FakeRenderer()).build()
+    assert report.failed == ["cafe.md"]
+    assert not (out / "cafe.html").exists()
+
+    report = DocBuilder(str(src), str(out), renderer=FakeRenderer()).build()
+    assert not report.changed
+    assert len(report.errors) == 1 and "cafe.md" in report.errors[0]
+
+    write(str(src / "cafe.md"), "# Caf\xe9\n")
+    report = DocBuilder(str(src), str(out), renderer=FakeRenderer()).build()
+    assert report.built == ["cafe.md"] and not report.errors
+
+
+def test_local_images_are_copied(tmp_path):
+    """Test that linked local images are copied, refreshed when they change and removed when unused"""
+    src, out = tmp_path / "docs", tmp_path / "site"
+    write(str(src / "guide" / "img" / "x.png"), "png")
+    write(str(src / "guide" / "setup.md"),
+          "![x](img/x.png) ![gone](img/missing.png) ![web](https://example.com/y.png)\n")
+    builder = DocBuilder(str(src), str(out), renderer=FakeRenderer())
+    report = builder.build()
+    assert report.assets_copied == 1
+    assert (out / "guide" / "img" / "x.png").read_text() == "png"
+    assert "guide/img/x.png" in json.loads((out / MANIFEST_NAME).read_text())['assets']
+
+    assert not builder.build().changed
+    write(str(src / "guide" / "img" / "x.png"), "png, edited")
+    assert builder.build().assets_copied == 1
+    assert (out / "guide" / "img" / "x.png").read_text() == "png, edited"
+
+    write(str(src / "guide" / "setup.md"), "# No images\n")
+    builder.build()
+    assert not (out / "guide" / "img" / "x.png").exists()
+
+
+def test_one_edit_in_large_tree_is_fast(tmp_path):
+    """Test that a one-line edit in a 1,000 file tree rebuilds well under a second"""
+    src, out = tmp_path / "docs", tmp_path / "site"
+    for i in range(1000):
+        write(str(src / f"section{i % 10}" / f"page{i}.md"), f"# Page {i}\n\nText {i}\n")
+    builder = DocBuilder(str(src), str(out))
+    builder.build()
+
+    write(str(src / "section3" / "page503.md"), "# Page 503\n\nEdited\n")
+    started = time.perf_counter()
+    report = builder.build()
+    assert report.built == ["section3/page503.md"]
+    assert time.perf_counter() - started < 1.0
+
+
+def test_cli_client_side(tmp_path, capsys):
+    """Test the command line build without offscreen rendering"""
+    src, out = tmp_path / "docs", tmp_path / "site"
+    write(str(src / "index.md"), DIAGRAM)
+    assert main([str(src), "-o", str(out), "--client-side"]) == 0
+    page = (out / "index.html").read_text(encoding="utf-8")
+    assert '<div class="mermaid">' in page and "mermaid.initialize" in page
+    assert "Built 1 document(s)" in capsys.readouterr().out
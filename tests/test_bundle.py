@@ -0,0 +1,83 @@
+import json
+import zipfile
+
+from pymerdoc import bundle
+from pymerdoc.core import document
+
+MARKDOWN = """# Bundle
+
+![diagram](images/flow.png "Flow")
+<img src="logo.png" width="20">
+![remote](https://example.com/a.png) ![outside](../secret.png)
+
+```mermaid
+graph TD
+    A --> B
+```
+"""
+
+
+def write_assets(tmp_path):
+    (tmp_path / "images").mkdir()
+    (tmp_path / "images" / "flow.png").write_bytes(b"flow")
+    (tmp_path / "logo.png").write_bytes(b"logo")
+
+
+def test_asset_references_skip_urls_and_parent_paths():
+    assert bundle.asset_references(MARKDOWN) == ["images/flow.png", "logo.png"]
+
+
+def test_save_and_open_lazily(tmp_path):
+    write_assets(tmp_path)
+    path = str(tmp_path / "doc.pmdoc")
+    missing = bundle.save_bundle(path, MARKDOWN, str(tmp_path),
+                                 diagrams={"k1": "<svg>1</svg>"}, pages={"dark": "<html>page</html>"})
+    assert missing == []
+
+    with zipfile.ZipFile(path) as z:
+        assert z.getinfo("assets/logo.png").compress_type == zipfile.ZIP_STORED
+
+    opened = bundle.DocumentBundle(path)
+    assert opened._markdown is None
+    assert opened.markdown == MARKDOWN
+    assert sorted(opened.asset_names()) == ["images/flow.png", "logo.png"]
+    assert opened.read_asset("images/flow.png") == b"flow"
+    assert opened.cached_page("dark") == "<html>page</html>"
+    assert opened.cached_page("light") is None
+    assert opened.diagram("k1") == "<svg>1</svg>"
+    assert opened.diagram("missing") is None
+    opened.close()
+
+
+def test_mermaid_upgrade_keeps_page_but_drops_diagrams(tmp_path, monkeypatch):
+    path = str(tmp_path / "doc.pmdoc")
+    bundle.save_bundle(path, "text", diagrams={"k1": "<svg/>"}, pages={"light": "<html/>"})
+    monkeypatch.setattr(document, "MERMAID_VERSION", "99.0.0")
+
+    opened = bundle.DocumentBundle(path)
+    assert not opened.current
+    assert opened.diagram("k1") is None
+    assert opened.cached_page("light") == "<html/>"
+    opened.close()
+
+
+def test_resave_copies_assets_from_previous_bundle(tmp_path):
+    write_assets(tmp_path)
+    path = str(tmp_path / "doc.pmdoc")
+    bundle.save_bundle(path, MARKDOWN, str(tmp_path))
+
+    previous = bundle.DocumentBundle(path)
+    missing = bundle.save_bundle(path, MARKDOWN + "\nMore\n", previous=previous)
+    assert missing == []
+
+    reopened = bundle.DocumentBundle(path)
+    assert reopened.read_asset("logo.png") == b"logo"
+    assert reopened.manifest["hash"] == bundle.document_hash(MARKDOWN + "\nMore\n")
+    reopened.close()
+
+
+def test_missing_assets_are_reported(tmp_path):
+    path = str(tmp_path / "doc.pmdoc")
+    assert bundle.save_bundle(path, MARKDOWN, str(tmp_path)) == ["images/flow.png", "logo.png"]
+    with zipfile.ZipFile(path) as z:
+        assert json.loads(z.read("manifest.json"))["assets"] == []
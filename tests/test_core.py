@@ -0,0 +1,26 @@
+# tests/test_core.py
+import subprocess
+import sys
+
+from pymerdoc import core
+from pymerdoc.core import document
+
+
+def test_core_does_not_import_qt():
+    """Test that the core and its frame processing load without Qt"""
+    code = ("import sys, pymerdoc.core, pymerdoc.core.frames; "
+            "print(sorted(m for m in sys.modules if m.startswith(('PyQt', 'markdown'))))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_preview_page():
+    """Test that converted markdown is wrapped in the themed preview page"""
+    html = core.convert_markdown_to_html("# Title\n\n```mermaid\ngraph TD\n  A-->B\n```\n")
+    assert '<div class="mermaid">' in html
+
+    page = core.preview_page(html, "dark")
+    assert html in page and "#1e1e1e" in page
+    assert "function showDiagram" in page and document.RENDERED_TITLE in page
+    assert "#1e1e1e" not in core.preview_page(html, "light").split("<body>")[0]
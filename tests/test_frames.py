@@ -0,0 +1,128 @@
+# tests/test_frames.py
+import io
+import threading
+
+import pytest
+from PIL import Image
+
+from pymerdoc.core import frames
+
+
+def make_frames(directory, names, size=(20, 10)):
+    paths = []
+    for index, name in enumerate(names):
+        path = directory / name
+        Image.new('RGB', size, (index * 60 % 256, 0, 0)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def test_normalize_frames_uses_canvas_size():
+    """Test that frames are fitted onto the requested canvas"""
+    images = [Image.new('RGB', (20, 10)), Image.new('RGB', (10, 10))]
+    normalized = frames.normalize_frames(images, (0, 0, 0), size=(40, 40))
+    assert all(img.size == (40, 40) for img in normalized)
+
+
+def test_limit_size():
+    """Test that size limits keep the aspect ratio and never enlarge"""
+    assert frames.limit_size((3840, 2160), (1920, None)) == (1920, 1080)
+    assert frames.limit_size((3840, 2160), (None, 540)) == (960, 540)
+    assert frames.limit_size((1000, 500), scale=0.5) == (500, 250)
+    assert frames.limit_size((800, 600), (1920, 1080)) == (800, 600)
+    with pytest.raises(ValueError):
+        frames.limit_size((800, 600), scale=2)
+
+
+def test_large_frames_shrink_while_decoding(tmp_path):
+    """Test that one oversized frame no longer sets the output size"""
+    paths = make_frames(tmp_path, ["a.png", "b.png"], size=(320, 180))
+    big = tmp_path / "big.jpg"
+    Image.new('RGB', (1280, 720), (0, 90, 0)).save(big)
+    paths.append(str(big))
+
+    canvas = frames.output_canvas(paths, max_size=(320, None))
+    assert canvas == (320, 180)
+    decoded = frames.load_frame(str(big), canvas)
+    assert 320 <= decoded.size[0] < 1280 and decoded.mode == 'RGB'
+
+    # Frames already at the canvas size are used as they are
+    frame = frames.load_frame(paths[0], canvas)
+    assert frames.normalize_frame(frame, canvas) is frame
+
+    data, _, _ = frames.convert_frames(paths, 'gif', max_size=(320, None))
+    with Image.open(io.BytesIO(data)) as gif:
+        assert gif.size == (320, 180) and gif.n_frames == 3
+    data, _, _ = frames.convert_frames(paths, 'gif', scale=0.5)
+    with Image.open(io.BytesIO(data)) as gif:
+        assert gif.size == (640, 360)
+
+
+@pytest.mark.parametrize("fmt, pil_format", [("webp", "WEBP"), ("apng", "PNG")])
+def test_save_animation_formats(tmp_path, fmt, pil_format):
+    """Test animated WebP and APNG output"""
+    images = [Image.new('RGB', (16, 16), (i * 80, 0, 0)) for i in range(3)]
+    output = tmp_path / f"anim{frames.ANIMATION_FORMATS[fmt][1]}"
+    frames.save_animation(images, str(output), fmt, delay=100)
+
+    with Image.open(output) as anim:
+        assert anim.format == pil_format
+        assert anim.n_frames == 3
+
+
+def test_format_from_output_extension():
+    """Test that the output extension selects the format"""
+    assert frames.format_from_path("a.webp") == "webp"
+    assert frames.format_from_path("a.png") == "apng"
+    assert frames.format_from_path("a.gif") == "gif"
+
+
+def test_compare_formats():
+    """Test that every format is measured and sorted by size"""
+    images = [Image.new('RGB', (32, 32), (i * 40, 0, 0)) for i in range(4)]
+    results = frames.compare_formats(images, delay=100)
+
+    assert {r['label'] for r in results} == \
+        {"GIF", "WebP (lossy)", "WebP (lossless)", "APNG"}
+    sizes = [r['bytes'] for r in results]
+    assert sizes == sorted(sizes) and all(sizes)
+    assert "WebP (lossy)" in frames.format_comparison(results)
+
+
+def test_encode_frames():
+    """Test in-memory encoding with and without a GIF size budget"""
+    images = [Image.new('RGB', (64, 64), (i * 40, 0, 0)) for i in range(3)]
+    data, details = frames.encode_frames(images, 'webp', delay=100)
+    with Image.open(io.BytesIO(data)) as anim:
+        assert anim.format == "WEBP" and anim.n_frames == 3
+    assert details == ""
+
+    data, details = frames.encode_frames(images, 'gif', target_size=64 * 1024)
+    assert data.startswith(b'GIF') and "fits" in details
+    with pytest.raises(ValueError):
+        frames.encode_frames(images, 'apng', target_size=1024)
+
+
+def test_convert_frames_progress_and_cancel(tmp_path):
+    """Test per-frame progress, stage timings and cancelling between frames"""
+    paths = make_frames(tmp_path, [f"c{i}.png" for i in range(4)])
+    calls = []
+    data, details, timings = frames.convert_frames(
+        paths, 'gif', progress=lambda *args: calls.append(args))
+    assert data.startswith(b'GIF') and details == ""
+    assert [stage for stage, _, _ in calls if stage not in frames.STAGES] == []
+    assert ('encode', 4, 4) == calls[-1]
+    assert timings.total >= timings.encode >= 0
+    assert "quantize" in timings.describe()
+
+    cancel = threading.Event()
+
+    def progress(stage, done, total):
+        if stage == 'normalize' and done == 1:
+            cancel.set()
+        calls.append(stage)
+
+    calls = []
+    with pytest.raises(frames.ConversionCancelled):
+        frames.convert_frames(paths, 'webp', progress=progress, cancel_event=cancel)
+    assert calls[-1] == 'normalize'
@@ -0,0 +1,133 @@
+# tests/test_gif_batch.py
+import json
+import sys
+
+import pytest
+from PIL import Image
+
+from pymerdoc import gif_batch
+
+
+def make_frames(directory, names, size=(20, 10)):
+    paths = []
+    for index, name in enumerate(names):
+        path = directory / name
+        Image.new('RGB', size, (index * 60 % 256, 0, 0)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def test_natural_sort_key():
+    """Test that numbered frames sort numerically"""
+    names = ["frame10.png", "frame2.png", "Frame1.png"]
+    assert sorted(names, key=gif_batch.natural_sort_key) == \
+        ["Frame1.png", "frame2.png", "frame10.png"]
+
+
+def test_collect_frames_from_directory(tmp_path):
+    """Test that directories are expanded and naturally ordered"""
+    make_frames(tmp_path, ["f10.png", "f2.png", "f1.png"])
+    (tmp_path / "notes.txt").write_text("skip me")
+
+    frames = gif_batch.collect_frames([str(tmp_path)])
+    assert [p.rsplit("/", 1)[-1] for p in frames] == ["f1.png", "f2.png", "f10.png"]
+
+
+def test_collect_frames_missing_source(tmp_path):
+    """Test that a missing source is reported"""
+    with pytest.raises(FileNotFoundError):
+        gif_batch.collect_frames([str(tmp_path / "missing.png")])
+
+
+def test_parse_size_and_color():
+    """Test size and color parsing"""
+    assert gif_batch.parse_size("640x480") == (640, 480)
+    assert gif_batch.parse_size(None) is None
+    assert gif_batch.parse_color("#000000") == (0, 0, 0)
+    assert gif_batch.parse_color("white") == (255, 255, 255)
+    with pytest.raises(ValueError):
+        gif_batch.parse_size("big")
+
+
+def test_parse_output_limits():
+    """Test maximum size and scale parsing"""
+    assert gif_batch.parse_max_size("1280x720") == (1280, 720)
+    assert gif_batch.parse_max_size("1280x") == (1280, None)
+    assert gif_batch.parse_max_size("x720") == (None, 720)
+    assert gif_batch.parse_max_size(None) is None
+    assert gif_batch.parse_scale("50%") == 0.5
+    assert gif_batch.parse_scale(0.25) == 0.25
+    for parse, value in ((gif_batch.parse_max_size, "x"), (gif_batch.parse_scale, "150%")):
+        with pytest.raises(ValueError):
+            parse(value)
+
+
+def test_cli_max_size(tmp_path):
+    """Test that --max-size caps the output at the given width"""
+    frames = make_frames(tmp_path, ["m1.png", "m2.png"], size=(400, 200))
+    output = tmp_path / "capped.gif"
+    assert gif_batch.main([*frames, "-o", str(output), "--max-size", "100x"]) == 0
+    with Image.open(output) as gif:
+        assert gif.size == (100, 50)
+
+
+def test_build_gif(tmp_path):
+    """Test building a GIF with delay and loop settings"""
+    frames = make_frames(tmp_path, ["a1.png", "a2.png", "a3.png"])
+    output = tmp_path / "out" / "anim.gif"
+    job = gif_batch.GifJob(output=str(output), frames=frames, delay=200, loop=2)
+
+    path, count, _ = gif_batch.build_gif(job)
+    assert count == 3
+    with Image.open(path) as gif:
+        assert gif.n_frames == 3
+        assert gif.info["duration"] == 200
+        assert gif.info["loop"] == 2
+
+
+def test_job_file_runs_concurrently(tmp_path):
+    """Test that a JSON job file with defaults builds every job"""
+    make_frames(tmp_path, ["x1.png", "x2.png"])
+    job_file = tmp_path / "jobs.json"
+    job_file.write_text(json.dumps({
+        "defaults": {"delay": 300, "size": "30x30"},
+        "jobs": [
+            {"output": "one.gif", "frames": ["x*.png"]},
+            {"output": "two.gif", "frames": ["."], "background": "black"},
+        ],
+    }))
+
+    assert gif_batch.main(["--job-file", str(job_file), "-j", "2"]) == 0
+    for name in ("one.gif", "two.gif"):
+        with Image.open(tmp_path / name) as gif:
+            assert gif.size == (30, 30)
+            assert gif.n_frames == 2
+
+
+def test_yaml_job_file_names_the_extra(tmp_path, monkeypatch):
+    """Test that a YAML job file without PyYAML points at the yaml extra"""
+    job_file = tmp_path / "jobs.yaml"
+    job_file.write_text("jobs: []\n")
+    monkeypatch.setitem(sys.modules, "yaml", None)
+    with pytest.raises(RuntimeError, match=r"pymerdoc\[yaml\]"):
+        gif_batch.load_job_file(str(job_file))
+
+
+def test_job_output_format():
+    """Test that an explicit format overrides the output extension"""
+    assert gif_batch.GifJob(output="a.webp").output_format == "webp"
+    job = gif_batch.GifJob(output="a.gif", format="webp")
+    assert job.output_format == "webp"
+
+
+def test_build_gif_with_target_size(tmp_path):
+    """Test that a target size runs the optimizer and reports its choice"""
+    frames = make_frames(tmp_path, ["t1.png", "t2.png", "t3.png"], size=(200, 200))
+    output = tmp_path / "small.gif"
+    job = gif_batch.GifJob(output=str(output), frames=frames,
+                           target_size=gif_batch.parse_target_size("1MB"))
+
+    _, count, details = gif_batch.build_gif(job)
+    assert count == 3
+    assert "fits" in details and "colors" in details
+    assert output.stat().st_size <= 1024 * 1024
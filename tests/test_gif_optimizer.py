@@ -0,0 +1,58 @@
+# tests/test_gif_optimizer.py
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+from pymerdoc.gif_optimizer import GifSettings, GifSizeOptimizer, parse_byte_size
+
+
+def make_frames(count=6, size=(160, 120)):
+    frames = []
+    for index in range(count):
+        img = Image.linear_gradient('L').resize(size).convert('RGB')
+        draw = ImageDraw.Draw(img)
+        draw.rectangle([index * 10, 20, index * 10 + 40, 60], fill=(255, index * 40, 0))
+        frames.append(img)
+    return frames
+
+
+def test_parse_byte_size():
+    """Test human readable byte budgets"""
+    assert parse_byte_size("2MB") == 2 * 1024 * 1024
+    assert parse_byte_size("500k") == 500 * 1024
+    assert parse_byte_size(2048) == 2048
+    with pytest.raises(ValueError):
+        parse_byte_size("lots")
+
+
+def test_generous_budget_keeps_full_quality():
+    """Test that a budget the original fits in changes nothing"""
+    result = GifSizeOptimizer(make_frames(), delay=100).optimize(10 * 1024 * 1024)
+    assert result.fits
+    assert result.settings == GifSettings()
+    assert result.quantizations <= 2
+
+
+def test_tight_budget_is_met():
+    """Test that a tight budget is met by degrading settings"""
+    optimizer = GifSizeOptimizer(make_frames(), delay=100)
+    full_size = optimizer.encoded_size(GifSettings())
+    budget = full_size // 4
+
+    result = optimizer.optimize(budget)
+    assert result.fits
+    assert result.size <= budget
+    assert result.settings.quality < 1.0
+    with Image.open(io.BytesIO(result.data)) as gif:
+        assert gif.format == 'GIF'
+        assert gif.info["duration"] == 100 * result.settings.frame_step
+
+
+def test_impossible_budget_returns_smallest():
+    """Test that an unreachable budget reports the smallest attempt"""
+    optimizer = GifSizeOptimizer(make_frames(), delay=100)
+    result = optimizer.optimize(10)
+    assert not result.fits
+    assert result.settings.colors == 32
+    assert result.size == min(optimizer._sizes.values())
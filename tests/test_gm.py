@@ -0,0 +1,130 @@
+# tests/test_gm.py
+import io
+import threading
+
+from PIL import Image
+
+from pymerdoc.core import frames
+from pymerdoc.gm import AnimationPreviewDialog, GifMakerDialog, LazyFrameDecoder
+
+
+def encode_frames(count, fmt='gif'):
+    images = [Image.new('RGB', (24, 24), (i * 20 % 256, 0, 0)) for i in range(count)]
+    buffer = io.BytesIO()
+    frames.save_animation(images, buffer, fmt, delay=50)
+    buffer.seek(0)
+    return buffer
+
+
+def test_dialog_without_parent(qtbot):
+    """Test that the GIF maker opens standalone"""
+    dialog = GifMakerDialog()
+    qtbot.addWidget(dialog)
+    assert dialog.output_format == 'gif'
+
+
+def test_conversion_progress_never_goes_back(qtbot):
+    """Test that every stage fills an equal share of the bar, whatever its own total"""
+    dialog = GifMakerDialog()
+    qtbot.addWidget(dialog)
+    dialog.set_converting(True)
+    values = []
+    updates = [('decode', 0, 10), ('decode', 10, 10), ('normalize', 5, 10),
+               # The size optimizer counts every quantization it tries from zero
+               ('quantize', 200, 400), ('quantize', 0, 100), ('quantize', 100, 100),
+               ('encode', 10, 10)]
+    for stage, done, total in updates:
+        dialog.show_conversion_progress(stage, done, total)
+        values.append(dialog.progress_bar.value())
+    assert values == sorted(values)
+    share = dialog.progress_bar.maximum() // len(frames.STAGES)
+    assert values[1] == share and values[2] == share * 3 // 2 and values[3] == share * 5 // 2
+    assert values[-1] == dialog.progress_bar.maximum()
+
+
+def test_lazy_decoder_bounds_cache(qtbot):
+    """Test that frames decode on demand and the pixmap cache stays bounded"""
+    decoder = LazyFrameDecoder(encode_frames(12), cache_size=3)
+    assert decoder.frame_count == 12
+
+    for index in range(12):
+        pixmap, delay = decoder.frame(index)
+        assert not pixmap.isNull()
+        assert delay == 50
+    assert list(decoder._cache) == [9, 10, 11]
+    decoder.close()
+
+
+def test_preview_from_memory(qtbot):
+    """Test previewing an in-memory WebP encode and advancing frames"""
+    dialog = AnimationPreviewDialog(encode_frames(3, 'webp'))
+    qtbot.addWidget(dialog)
+    dialog.show()
+
+    qtbot.waitUntil(lambda: dialog.current_frame == 2, timeout=2000)
+    dialog.toggle_playback()
+    assert not dialog.frame_timer.isActive()
+
+
+def test_thumbnails_fill_in(qtbot, tmp_path, monkeypatch):
+    """Test that frames are listed immediately and get thumbnails later"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    paths = []
+    for index in range(5):
+        path = tmp_path / f"frame{index}.png"
+        Image.new('RGB', (200, 150), (index * 50, 0, 0)).save(path)
+        paths.append(str(path))
+
+    dialog = GifMakerDialog()
+    qtbot.addWidget(dialog)
+    dialog.add_frame_paths(paths)
+    assert dialog.list_widget.count() == 5
+
+    items = [dialog.list_widget.item(i) for i in range(5)]
+    qtbot.waitUntil(lambda: all(not item.icon().isNull() for item in items), timeout=5000)
+
+
+def test_conversion_runs_in_background(qtbot, tmp_path, monkeypatch):
+    """Test converting off the GUI thread with progress, and cancelling"""
+    from PyQt6.QtWidgets import QFileDialog, QMessageBox
+
+    paths = []
+    for index in range(6):
+        path = tmp_path / f"frame{index}.png"
+        Image.new('RGB', (40, 30), (index * 40, 0, 0)).save(path)
+        paths.append(str(path))
+    output = tmp_path / "out.gif"
+    monkeypatch.setattr(QFileDialog, 'getSaveFileName', lambda *args: (str(output), ''))
+    messages = []
+    monkeypatch.setattr(QMessageBox, 'information', lambda *args: messages.append(args[2]))
+
+    dialog = GifMakerDialog()
+    qtbot.addWidget(dialog)
+    monkeypatch.setattr(dialog, 'preview_gif', lambda path: None)
+    dialog.add_frame_paths(paths)
+
+    with qtbot.waitSignal(dialog.conversion_signals.finished, timeout=10000):
+        dialog.convert_to_gif()
+        assert not dialog.convert_button.isEnabled()
+    assert output.read_bytes().startswith(b'GIF')
+    assert "decode" in messages[0] and "encode" in messages[0]
+    assert dialog.convert_button.isEnabled() and dialog.cancel_button.isHidden()
+
+    # Cancel while the first frame is decoding
+    output.unlink()
+    decoding = threading.Event()
+    release = threading.Event()
+    load_frame = frames.load_frame
+
+    def slow_load_frame(path, fit=None):
+        decoding.set()
+        release.wait(5)
+        return load_frame(path, fit)
+
+    monkeypatch.setattr(frames, 'load_frame', slow_load_frame)
+    with qtbot.waitSignal(dialog.conversion_signals.cancelled, timeout=10000):
+        dialog.convert_to_gif()
+        assert decoding.wait(5)
+        dialog.cancel_conversion()
+        release.set()
+    assert not output.exists() and len(messages) == 1
@@ -0,0 +1,124 @@
+# tests/test_highlighter.py
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtWidgets import QTextEdit
+
+from pymerdoc import highlighter
+from pymerdoc.highlighter import MarkdownHighlighter
+
+DOCUMENT = """# Title
+Some *text* with `code`.
+
+```mermaid
+graph TD
+    A --> B
+```
+
+```python
+x = "# not a heading"
+```
+"""
+
+
+class CountingHighlighter(MarkdownHighlighter):
+    def __init__(self, document):
+        self.calls = 0
+        super().__init__(document)
+
+    def highlightBlock(self, text):
+        self.calls += 1
+        super().highlightBlock(text)
+
+
+def make_editor(qtbot, text):
+    """An editor widget, so the document is laid out like the editor pane's"""
+    editor = QTextEdit()
+    qtbot.addWidget(editor)
+    editor.setPlainText(text)
+    return editor
+
+
+def block_states(document):
+    block = document.firstBlock()
+    states = []
+    while block.isValid():
+        states.append(block.userState())
+        block = block.next()
+    return states
+
+
+def formatted(document, line, text):
+    """Foreground color applied to text on the given line, or None"""
+    block = document.findBlockByNumber(line)
+    start = block.text().index(text)
+    for fmt_range in block.layout().formats():
+        if fmt_range.start <= start < fmt_range.start + fmt_range.length:
+            return fmt_range.format.foreground().color().name()
+    return None
+
+
+def test_fences_set_block_states(qapp, qtbot):
+    """Test that code fences set block states and each region gets its colors"""
+    editor = make_editor(qtbot, DOCUMENT)
+    document = editor.document()
+    MarkdownHighlighter(document)
+    qapp.processEvents()
+    T, C, M = highlighter.TEXT, highlighter.CODE, highlighter.MERMAID
+    assert block_states(document) == [T, T, T, M, M, M, T, T, C, C, T, T]
+
+    colors = highlighter.PALETTES[False]
+    assert formatted(document, 0, "Title") == colors['heading']
+    assert formatted(document, 4, "graph") == colors['keyword']
+    assert formatted(document, 5, "-->") == colors['arrow']
+    assert formatted(document, 9, "# not") == colors['code']
+
+
+def test_edits_only_rehighlight_affected_blocks(qapp, qtbot):
+    """Test that an edit re-highlights only the blocks whose state it changes"""
+    paragraphs = ["Paragraph with **bold** text."] * 25000
+    lines = paragraphs + ["```mermaid"] + ["    A --> B"] * 10 + ["```"] + paragraphs
+    editor = make_editor(qtbot, "\n".join(lines))
+    document = editor.document()
+    counter = CountingHighlighter(document)
+    qapp.processEvents()
+
+    # Typing inside a paragraph or a diagram touches just that line
+    for line in (100, 25005, 40000):
+        counter.calls = 0
+        cursor = QTextCursor(document.findBlockByNumber(line))
+        cursor.insertText("x")
+        assert counter.calls == 1
+
+    # Turning the diagram into a code block re-highlights the fence and stops after it
+    counter.calls = 0
+    cursor = QTextCursor(document.findBlockByNumber(25000))
+    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
+    cursor.insertText("```text")
+    assert counter.calls == 12
+    assert document.findBlockByNumber(25005).userState() == highlighter.CODE
+    assert document.findBlockByNumber(25012).userState() == highlighter.TEXT
+
+
+def test_theme_switch_recolors(qapp, qtbot):
+    """Test that switching to the dark theme recolors the document"""
+    editor = make_editor(qtbot, DOCUMENT)
+    document = editor.document()
+    syntax = MarkdownHighlighter(document)
+    qapp.processEvents()
+    syntax.set_dark(True)
+    assert formatted(document, 0, "Title") == highlighter.PALETTES[True]['heading']
+
+
+def test_mermaid_block_at(qapp, qtbot):
+    """Test that the mermaid block under a line is found from its fences and body"""
+    editor = make_editor(qtbot, DOCUMENT)
+    document = editor.document()
+    MarkdownHighlighter(document)
+    qapp.processEvents()
+
+    # Both fences and the body belong to the block
+    for line in (3, 5, 6):
+        opening, source = highlighter.mermaid_block_at(document.findBlockByNumber(line))
+        assert opening.blockNumber() == 3
+        assert source == "graph TD\n    A --> B"
+    for line in (1, 7, 9):
+        assert highlighter.mermaid_block_at(document.findBlockByNumber(line)) is None
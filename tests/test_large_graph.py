@@ -0,0 +1,47 @@
+# tests/test_large_graph.py
+from pymerdoc import large_graph
+
+
+def flowchart(edges):
+    return "graph LR\n" + "\n".join(f"    n{i} --> n{i + 1} & x{i}" for i in range(edges))
+
+
+def test_graph_size_counts_nodes_and_edges():
+    """Test that node and edge counts come from the parsed diagram"""
+    size = large_graph.graph_size(flowchart(3))
+    assert (size.nodes, size.edges) == (7, 6)
+
+    size = large_graph.graph_size("stateDiagram-v2\n    [*] --> A\n    A --> B\n    state C")
+    assert (size.nodes, size.edges) == (4, 2)
+
+    size = large_graph.graph_size("sequenceDiagram\n    participant X\n    A->>B: hi")
+    assert (size.nodes, size.edges) == (3, 1)
+
+
+def test_large_graph_mode_is_automatic():
+    """Test that only big diagrams get the large-graph config"""
+    assert large_graph.render_config(large_graph.graph_size(flowchart(10))) is None
+
+    size = large_graph.graph_size(flowchart(300))
+    assert size.large
+    config = large_graph.render_config(size)
+    assert config['maxEdges'] > size.edges
+    assert config['flowchart']['defaultRenderer'] == 'elk'
+    # Mermaid 10.6.1 has no ELK layout for state and class diagrams
+    assert set(config) == {'maxTextSize', 'maxEdges', 'flowchart'}
+
+
+def test_unparsable_sources_use_their_length():
+    """Test that a huge source counts as large even when it does not parse"""
+    source = "graph LR\n    A[" + "x" * large_graph.LARGE_TEXT_SIZE
+    size = large_graph.graph_size(source)
+    assert (size.nodes, size.edges) == (0, 0)
+    assert size.large
+
+
+def test_format_render_stats():
+    """Test the render time and memory summary"""
+    text = large_graph.format_render_stats(
+        {'renderMs': 2500, 'heapBytes': 200 * 1024 ** 2, 'svgBytes': 4096})
+    assert text == "rendered in 2.5 s, JS heap 200 MB, SVG 4 KB"
+    assert large_graph.format_render_stats({}) == ""
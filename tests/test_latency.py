@@ -0,0 +1,41 @@
+# tests/test_latency.py
+from pymerdoc import latency, mermaid_parser
+
+
+def test_synthetic_document_is_valid():
+    """Test that every generated diagram parses and the requested count is written"""
+    content = latency.synthetic_document(sections=60, diagrams=10)
+    assert len(mermaid_parser.MARKDOWN_BLOCK.findall(content)) == 10
+    mermaid_parser.markdown_structure_key(content)
+    assert latency.synthetic_document(sections=60, diagrams=10) == content
+
+
+def test_sessions_type_where_they_should():
+    """Test that scripted typing lands in prose and inside diagram labels"""
+    content = latency.synthetic_document(sections=60, diagrams=10)
+    lines = content.split("\n")
+    prose, diagram, theme = latency.build_sessions(content, bursts=4)
+
+    assert len(prose.steps) == 4 and all(lines[s.line][0].isalpha() for s in prose.steps)
+    before_key = mermaid_parser.markdown_structure_key(content)
+    for step in diagram.steps:
+        line = lines[step.line]
+        assert line.endswith("]")
+        lines[step.line] = line[:len(line) - step.back] + step.text + line[len(line) - step.back:]
+    edited = "\n".join(lines)
+    assert mermaid_parser.markdown_structure_key(edited) != before_key
+    assert [s.theme for s in theme.steps] == ["dark", "light"]
+
+
+def test_summaries_and_baseline_comparison():
+    """Test percentiles and that only slower p50/p90 values count as regressions"""
+    summary = latency.summarize([float(v) for v in range(1, 101)])
+    assert (summary['p50'], summary['p90'], summary['p99'], summary['max']) == (50, 90, 99, 100)
+    assert latency.summarize([])['count'] == 0
+
+    baseline = {'sessions': {'prose': {'paint': {'p50': 100.0, 'p90': 200.0}}}}
+    results = {'sessions': {'prose': {'paint': {'p50': 105.0, 'p90': 260.0},
+                                      'keystroke': {'p50': 1.0, 'p90': 2.0}}}}
+    rows, regressions = latency.compare(results, baseline, tolerance=0.1)
+    assert len(rows) == 2
+    assert [(r[0], r[1], r[2]) for r in regressions] == [('prose', 'paint', 'p90')]
@@ -76,4 +76,53 @@ def test_markdown_styles(editor, qtbot):
 
     html = editor.web_view.page().toHtml()
     qtbot.waitUntil(lambda: "<strong>Bold</strong>" in html, timeout=2000)
-    qtbot.waitUntil(lambda: "<em>Italic</em>" in html, timeout=2000)
\ No newline at end of file
+    qtbot.waitUntil(lambda: "<em>Italic</em>" in html, timeout=2000)
+
+def test_focus_mode_follows_cursor(editor, qtbot):
+    """Test that focus mode picks the diagram under the cursor and defers the preview"""
+    test_content = "# Title\n\n```mermaid\ngraph TD\n    A-->B\n```\n\nText"
+    editor.editor.setPlainText(test_content)
+    editor.focus_action.setChecked(True)
+    assert editor.focus_view.isVisible()
+
+    cursor = editor.editor.textCursor()
+    cursor.setPosition(test_content.index("A-->B"))
+    editor.editor.setTextCursor(cursor)
+    assert editor._focused_diagram()[1] == "graph TD\n    A-->B"
+
+    editor.editor.insertPlainText("C-->")
+    assert editor.focus_timer.isActive()
+    assert editor.preview_timer.interval() > editor.preview_delay
+
+    editor.focus_action.setChecked(False)
+    assert not editor.focus_view.isVisible()
+
+
+def test_broken_diagram_keeps_preview_updating(editor, qtbot):
+    """Test that a diagram with a syntax error only replaces itself with the error"""
+    test_content = ("# Title\n\n```mermaid\ngraph TD\n    A[Start --> B\n```\n\n"
+                    "```mermaid\ngraph TD\n    C-->D\n```")
+    editor.editor.setPlainText(test_content)
+    editor.update_preview()
+    assert editor.last_preview_key is not None
+    assert list(editor.preview_errors) == [0] and len(editor.preview_diagrams) == 2
+    assert "Diagram 1" in editor.statusBar().currentMessage()
+
+    editor.editor.setPlainText(test_content.replace("Title", "Edited"))
+    editor.update_preview()
+    html = editor.web_view.page().toHtml()
+    qtbot.waitUntil(lambda: "Edited" in html, timeout=2000)
+
+
+def test_bundle_with_broken_diagram(editor, qapp, tmp_path):
+    """Test that a .pmdoc with a diagram that does not parse saves and opens"""
+    content = "# Title\n\n```mermaid\ngraph TD\n    A[Start --> B\n```\n"
+    editor.editor.setPlainText(content)
+    path = str(tmp_path / "doc.pmdoc")
+    editor._save_file(path)
+    assert editor.bundle is not None
+
+    reopened = MarkdownMermaidEditor()
+    reopened._open_bundle(path)
+    assert reopened.editor.toPlainText() == content
+    assert list(reopened.preview_errors) == [0]
@@ -0,0 +1,41 @@
+# tests/test_mermaid_animation.py
+import pytest
+
+from pymerdoc.mermaid_animation import expand_sources, split_steps
+
+
+def test_split_steps_reveals_progressively():
+    """Test that each step adds the lines up to the next marker"""
+    source = """graph TD
+    classDef hot fill:#f96
+%% step
+    A[Start] --> B[Build]
+%% step: deploy
+    B --> C[Deploy]
+%% step
+    C --> D[Done]"""
+    steps = split_steps(source)
+
+    assert len(steps) == 3
+    assert all(step.startswith("graph TD\n    classDef hot") for step in steps)
+    assert "B --> C" not in steps[0]
+    assert "B --> C" in steps[1] and "C --> D" not in steps[1]
+    assert steps[2].endswith("C --> D[Done]")
+    assert "%%" not in steps[2]
+
+
+def test_split_steps_without_markers():
+    """Test that a plain diagram is a single frame"""
+    source = "graph LR\n    A --> B"
+    assert split_steps(source) == [source]
+
+
+def test_expand_sources_natural_order(tmp_path):
+    """Test that globbed diagram files are ordered naturally"""
+    for name in ("s10.mmd", "s2.mmd", "s1.mmd"):
+        (tmp_path / name).write_text("graph TD\n    A --> B")
+    files = expand_sources([str(tmp_path / "*.mmd")])
+    assert [f.rsplit("/", 1)[-1] for f in files] == ["s1.mmd", "s2.mmd", "s10.mmd"]
+
+    with pytest.raises(FileNotFoundError):
+        expand_sources([str(tmp_path / "missing.mmd")])
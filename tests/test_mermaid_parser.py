@@ -0,0 +1,170 @@
+# tests/test_mermaid_parser.py
+import pytest
+
+from pymerdoc.mermaid_parser import (MermaidSyntaxError, markdown_structure_key, parse,
+                                     structure_key)
+
+FLOWCHART = """graph TD
+    A[Start] --> B{Is it?}
+    B -- Yes --> C[OK]
+    B -->|No| D((End)) & E[(Store)]
+    A -.-> B ==> C
+    node-1:::hot --- id2>flag]
+    subgraph one [Title]
+        a1-->a2
+    end
+    style A fill:#f9f
+"""
+
+SEQUENCE = """sequenceDiagram
+    participant Alice
+    actor Bob as B
+    Alice->>Bob: Hello Bob
+    loop Every minute
+        Bob-->>+Alice: Fine
+    end
+    alt ok
+        Alice-xBob: bye
+    else failed
+        Alice-)Bob: retry
+    end
+    Note over Alice,Bob: done
+"""
+
+CLASS = """classDiagram
+    Animal <|-- Duck
+    Animal "1" *-- "many" Leg : has
+    Animal : +int age
+    class Duck{
+        +String beakColor
+        +swim()
+    }
+    <<interface>> Animal
+"""
+
+STATE = """stateDiagram-v2
+    [*] --> Still
+    Still --> Moving : push
+    state "Long name" as Long
+    state Busy {
+        [*] --> Working
+        --
+        Waiting --> [*]
+    }
+    note left of Moving
+        moving on
+    end note
+    Crash
+"""
+
+
+@pytest.mark.parametrize("source, kind", [
+    (FLOWCHART, "flowchart"),
+    ("graph LR; A-->B; B-->C", "flowchart"),
+    (SEQUENCE, "sequence"),
+    (CLASS, "class"),
+    (STATE, "state"),
+    ('pie title Pets\n    "Dogs" : 386', "pie"),
+])
+def test_valid_diagrams_parse(source, kind):
+    """Test that common valid diagrams parse to the expected kind"""
+    assert parse(source).kind == kind
+
+
+@pytest.mark.parametrize("source, line, column", [
+    ("graph TD\n    A[Start --> B", 2, 6),
+    ("graph TD\n    A -->", 2, 7),
+    ("graph TD\n    subgraph one\n    A-->B", 2, 5),
+    ("graph XY\n    A-->B", 1, 7),
+    ("sequenceDiagram\n    loop x\n    A->>B: hi", 2, 5),
+    ("sequenceDiagram\n    A->>B: hi\n    what is this", 3, 5),
+    ("classDiagram\n    class A {\n    +x", 2, 5),
+    ("stateDiagram-v2\n    [*] -->", 2, 9),
+    ("", 1, 1),
+])
+def test_errors_have_positions(source, line, column):
+    """Test that invalid input is rejected with a line and column"""
+    with pytest.raises(MermaidSyntaxError) as info:
+        parse(source)
+    assert (info.value.line, info.value.column) == (line, column)
+
+
+def test_structure_key_ignores_formatting():
+    """Test that whitespace and comments do not change the structure key"""
+    original = "graph TD\n    A[Start] --> B\n"
+    reformatted = "%% a comment\ngraph  TD\n\n  A[ Start ]-->B   %% trailing\n"
+    assert structure_key(original) == structure_key(reformatted)
+    assert structure_key(original) != structure_key("graph TD\n    A[Stop] --> B\n")
+    assert structure_key(original, "dark") != structure_key(original, "default")
+
+
+def test_markdown_structure_key():
+    """Test that Markdown keys compare diagrams structurally and report document lines"""
+    doc = "# Title\n\n```mermaid\ngraph TD\n    A-->B\n```\n"
+    assert markdown_structure_key(doc) == markdown_structure_key(
+        doc.replace("A-->B", "A --> B"))
+    assert markdown_structure_key(doc) != markdown_structure_key(doc.replace("Title", "T"))
+
+    with pytest.raises(MermaidSyntaxError) as info:
+        markdown_structure_key(doc.replace("A-->B", "A-->"))
+    assert info.value.line == 5
+
+
+@pytest.mark.parametrize("link, arrow", [
+    ("A -- two words --- B", "-----"),
+    ("A-- two words ---B", "-----"),
+    ("A == two words === B", "====="),
+    ("A== two words ===B", "====="),
+    ("A -. two words .- B", "-..-"),
+    ("A-. two words .-B", "-..-"),
+])
+def test_open_links_with_text(link, arrow):
+    """Test that links with text and no arrowhead join two nodes with a label"""
+    statement = parse(f"graph TD\n    {link}").statements[0]
+    assert statement == ('chain', (('node', 'A', '', '', ''),), ('link', arrow, 'two words'),
+                         (('node', 'B', '', '', ''),))
+
+
+@pytest.mark.parametrize("source", [
+    "graph TD\n    accTitle: Big Title\n    A --> B",
+    "graph TD\n    accDescr: One line\n    A --> B",
+    "graph TD\n    accDescr {\n        Spans\n        lines\n    }\n    A --> B",
+    "graph TD\n    accDescr { inline }\n    A --> B",
+    "sequenceDiagram\n    accDescr {\n        Hello\n    }\n    A->>B: hi",
+    "classDiagram\n    accTitle: Classes\n    A <|-- B",
+])
+def test_accessibility_statements(source):
+    """Test that accTitle and accDescr, including the block form, are accepted"""
+    statements = parse(source).statements
+    assert statements[0][0] in ('accTitle', 'accDescr')
+
+
+def test_unclosed_accessibility_block():
+    """Test that an accDescr block without '}' is reported at its opening line"""
+    with pytest.raises(MermaidSyntaxError) as info:
+        parse("graph TD\n    accDescr {\n    A --> B")
+    assert info.value.line == 2
+
+
+def test_edge_labels_with_pipes():
+    """Test that an edge label may contain '|' and labelled chains still split"""
+    assert parse("graph TD\n    A -->|a|b| B").statements[0][2] == ('link', '-->', 'a|b')
+    chain = parse("graph TD\n    A -->|x| B -->|y| C").statements[0]
+    assert chain[2] == ('link', '-->', 'x') and chain[4] == ('link', '-->', 'y')
+    with pytest.raises(MermaidSyntaxError):
+        parse("graph TD\n    A -->|a|b| |")
+
+
+def test_class_lollipop_relations():
+    """Test the lollipop interface relations on either side"""
+    statements = parse("classDiagram\n    bar ()-- foo\n    foo --() bar").statements
+    assert [statement[3] for statement in statements] == ['()--', '--()']
+
+
+def test_markdown_structure_key_not_strict():
+    """Test that without strict a broken diagram is keyed by its text"""
+    doc = "# Title\n\n```mermaid\ngraph TD\n    A-->\n```\n"
+    key = markdown_structure_key(doc, strict=False)
+    assert key == markdown_structure_key(doc, strict=False)
+    assert key != markdown_structure_key(doc.replace("A-->", "B-->"), strict=False)
+    assert key != markdown_structure_key(doc.replace("Title", "T"), strict=False)
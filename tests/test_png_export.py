@@ -0,0 +1,90 @@
+# tests/test_png_export.py
+import io
+import math
+
+import pytest
+from PIL import Image
+
+from pymerdoc.png_export import StreamingPngWriter, export_png, svg_size
+
+SVG = '<svg xmlns="http://www.w3.org/2000/svg" width="100%" viewBox="0 0 150.5 40">' \
+      '<rect width="10" height="10"/></svg>'
+
+
+class TileRenderer:
+    """Stands in for MermaidRenderer, drawing a gradient so tiles are checkable"""
+
+    class Result:
+        ok = True
+        error = ""
+        svg = SVG
+
+    def __init__(self):
+        self.tiles = []
+        self.released = []
+
+    def render_sync(self, source, raster=False):
+        self.raster = raster
+        return self.Result()
+
+    def prepare_raster(self, svg, scale):
+        size = (math.ceil(150.5 * scale), math.ceil(40 * scale))
+        self.full = Image.linear_gradient('L').resize(size).convert('RGB')
+        return 7
+
+    def raster_tile(self, raster_id, x, y, width, height, background):
+        self.tiles.append((x, y, width, height))
+        buffer = io.BytesIO()
+        self.full.crop((x, y, x + width, y + height)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def release_raster(self, raster_id):
+        self.released.append(raster_id)
+
+
+def test_svg_size_prefers_viewbox():
+    """Test that mermaid's width="100%" falls back to the viewBox"""
+    assert svg_size(SVG) == (150.5, 40)
+    assert svg_size('<svg width="30px" height="20">') == (30, 20)
+    with pytest.raises(ValueError):
+        svg_size('<svg width="100%">')
+
+
+def test_streaming_writer_round_trip(tmp_path):
+    """Test that bands written separately form one valid PNG"""
+    image = Image.linear_gradient('L').resize((70, 33)).convert('RGB')
+    path = tmp_path / "out.png"
+    with open(path, 'wb') as f:
+        writer = StreamingPngWriter(f, 70, 33, dpi=192)
+        writer.write_band(image.crop((0, 0, 70, 20)))
+        writer.write_band(image.crop((0, 20, 70, 33)))
+        writer.close()
+
+    with Image.open(path) as png:
+        assert png.size == (70, 33)
+        assert round(png.info['dpi'][0]) == 192
+        assert png.convert('RGB').tobytes() == image.tobytes()
+
+
+def test_streaming_writer_checks_rows(tmp_path):
+    """Test that a short image is rejected"""
+    with open(tmp_path / "short.png", 'wb') as f:
+        writer = StreamingPngWriter(f, 10, 10)
+        writer.write_band(Image.new('RGB', (10, 5)))
+        with pytest.raises(ValueError):
+            writer.close()
+
+
+def test_export_png_tiles(tmp_path):
+    """Test that a large export is assembled from tiles at the given scale"""
+    renderer = TileRenderer()
+    path = tmp_path / "diagram.png"
+
+    size = export_png(renderer, "graph TD\n A-->B", str(path), scale=2.0,
+                      tile_size=(128, 32))
+    assert size == (301, 80) and renderer.raster
+    assert len(renderer.tiles) == 3 * 3
+    assert renderer.released == [7]
+    with Image.open(path) as png:
+        assert png.size == (301, 80)
+        assert png.convert('RGB').tobytes() == renderer.full.tobytes()
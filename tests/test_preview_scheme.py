@@ -0,0 +1,116 @@
+# tests/test_preview_scheme.py
+import io
+
+import pytest
+from PyQt6.QtCore import QObject, QUrl
+
+preview_scheme = pytest.importorskip("pymerdoc.preview_scheme", exc_type=ImportError)
+from PIL import Image  # noqa: E402
+
+from pymerdoc import bundle  # noqa: E402
+from pymerdoc.thumbnails import PreviewImageCache  # noqa: E402
+
+
+class FakeJob(QObject):
+    """Records how the handler answered a request"""
+
+    def __init__(self, url):
+        super().__init__()
+        self.url = QUrl(url)
+        self.error = None
+        self.content_type = None
+        self.body = None
+        self.headers = {}
+
+    def requestUrl(self):
+        return self.url
+
+    def fail(self, error):
+        self.error = error
+
+    def setAdditionalResponseHeaders(self, headers):
+        self.headers = {bytes(k).decode(): bytes(v).decode() for k, v in headers.items()}
+
+    def reply(self, content_type, device):
+        self.content_type = bytes(content_type)
+        self.body = bytes(device.readAll())
+
+
+def request(handler, url):
+    job = FakeJob(url)
+    handler.requestStarted(job)
+    return job
+
+
+@pytest.fixture
+def handler(qapp, tmp_path):
+    return preview_scheme.PreviewSchemeHandler(
+        image_cache=PreviewImageCache(str(tmp_path / "variants")))
+
+
+def test_variant_width_rounds_up():
+    assert preview_scheme.variant_width(10) == preview_scheme.WIDTH_STEP
+    assert preview_scheme.variant_width(700.5) == 768
+
+
+def test_resolve_relative_stays_in_document_folder():
+    assert preview_scheme.resolve_relative("/images/./a.png") == "images/a.png"
+    assert preview_scheme.resolve_relative("/images/../../a.png") is None
+    assert preview_scheme.resolve_relative("/..") is None
+
+
+def test_page_is_served_from_memory(handler):
+    source = preview_scheme.PreviewSource("editor-1")
+    handler.add_source(source)
+    big = "<p>" + "x" * (3 * 1024 * 1024) + "</p>"
+    url = source.set_page(big)
+    assert url.query() == "v=1" and source.set_page(big).query() == "v=2"
+
+    job = request(handler, url.toString())
+    assert job.error is None
+    assert job.body == big.encode()
+    assert job.content_type.startswith(b"text/html")
+    assert job.headers["Cache-Control"] == "no-store"
+
+
+def test_assets_resolve_against_folder_then_bundle(handler, tmp_path):
+    (tmp_path / "img").mkdir()
+    (tmp_path / "img" / "a b.png").write_bytes(b"folder")
+    source = preview_scheme.PreviewSource("editor-2")
+    handler.add_source(source)
+    source.set_page("<img src='img/a%20b.png'>", base_dir=str(tmp_path))
+
+    job = request(handler, "pymerdoc://preview/editor-2/img/a%20b.png")
+    assert job.body == b"folder"
+    assert job.content_type == b"image/png"
+    assert "max-age" in job.headers["Cache-Control"] and "Last-Modified" in job.headers
+
+    assert request(handler, "pymerdoc://preview/editor-2/img/missing.png").error is not None
+    assert request(handler, "pymerdoc://preview/editor-2/%2E%2E/secret.png").error is not None
+    assert request(handler, "pymerdoc://preview/unknown/index.html").error is not None
+
+    path = str(tmp_path / "doc.pmdoc")
+    (tmp_path / "logo.svg").write_bytes(b"<svg/>")
+    bundle.save_bundle(path, "![logo](logo.svg)", str(tmp_path))
+    (tmp_path / "logo.svg").unlink()
+    opened = bundle.DocumentBundle(path)
+    source.set_page("<p/>", bundle=opened)
+    job = request(handler, "pymerdoc://preview/editor-2/logo.svg")
+    assert job.body == b"<svg/>" and job.content_type == b"image/svg+xml"
+    opened.close()
+
+
+def test_wide_images_are_served_downscaled(handler, tmp_path, qtbot):
+    Image.new('RGB', (1600, 800), 'red').save(tmp_path / "shot.png")
+    source = preview_scheme.PreviewSource("editor-3")
+    handler.add_source(source)
+    source.set_page("<img src='shot.png'>", base_dir=str(tmp_path))
+
+    assert len(request(handler, "pymerdoc://preview/editor-3/shot.png").body) > 0
+    source.image_width = 512
+    job = request(handler, "pymerdoc://preview/editor-3/shot.png")
+    qtbot.waitUntil(lambda: job.body is not None)
+    with Image.open(io.BytesIO(job.body)) as img:
+        assert img.size == (512, 256)
+    with Image.open(tmp_path / "shot.png") as original:
+        assert original.size == (1600, 800)
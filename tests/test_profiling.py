@@ -0,0 +1,51 @@
+# tests/test_profiling.py
+from pymerdoc import profiling
+
+
+def busy_work():
+    return sorted(str(i) * 3 for i in range(20000))
+
+
+def test_capture_writes_reports(tmp_path):
+    """Test that a capture profiles N sections then writes stats and a report"""
+    capture = profiling.request('test', count=2, output_dir=str(tmp_path))
+    assert profiling.active('test') is capture
+
+    with profiling.section('test') as current:
+        kept = busy_work()
+    assert current is capture and not capture.done
+    with profiling.section('test'):
+        busy_work()
+
+    report = capture.report
+    assert report.sections == 2
+    assert profiling.active('test') is None
+    with open(report.report_path, encoding='utf-8') as f:
+        text = f.read()
+    assert 'busy_work' in text
+    assert 'allocation sites' in text and 'test_profiling.py' in text
+    assert open(report.stats_path, 'rb').read()
+    assert kept
+
+
+def test_section_without_request():
+    """Test that unrequested kinds run unprofiled"""
+    with profiling.section('nothing') as capture:
+        busy_work()
+    assert capture is None
+
+
+def test_gm_profile_headless(tmp_path, monkeypatch, capsys):
+    """Test `pymerdoc-gm --profile` around a headless conversion"""
+    from PIL import Image
+    from pymerdoc import gm
+
+    for i in range(3):
+        Image.new('RGB', (16, 16), (i * 50, 0, 0)).save(tmp_path / f"frame{i}.png")
+    monkeypatch.setattr(profiling, 'default_output_dir', lambda: str(tmp_path / "profiles"))
+
+    output = tmp_path / "out.gif"
+    assert gm.main([str(tmp_path), '-o', str(output), '--profile']) == 0
+    assert output.exists()
+    assert len(list((tmp_path / "profiles").glob("gif-*.txt"))) == 1
+    assert "Profiled 1 section" in capsys.readouterr().err
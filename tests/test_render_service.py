@@ -0,0 +1,112 @@
+# tests/test_render_service.py
+import itertools
+
+import pytest
+from PyQt6.QtCore import QObject, pyqtSignal
+
+mermaid_render = pytest.importorskip("pymerdoc.mermaid_render", exc_type=ImportError)
+
+
+class FakeRenderer(QObject):
+    """Stands in for MermaidRenderer, finishing requests only when told to"""
+
+    rendered = pyqtSignal(int, object)
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self._ids = itertools.count(1)
+
+    def render(self, source, scale=0, background="white", theme=None, config=None):
+        request_id = next(self._ids)
+        self.calls.append((request_id, source, theme, config))
+        return request_id
+
+    def finish(self, request_id, svg):
+        self.rendered.emit(request_id, mermaid_render.RenderResult(svg=svg))
+
+
+@pytest.fixture
+def service(qtbot):
+    return mermaid_render.MermaidRenderService(renderer=FakeRenderer())
+
+
+def test_superseded_requests_are_coalesced(service):
+    """Test that only the newest request per key reports a result"""
+    results = []
+    for source in ("a", "b", "c"):
+        service.submit("diagram", source, results.append)
+
+    # "a" started straight away, "b" was replaced by "c" while waiting
+    assert [call[1] for call in service.renderer.calls] == ["a"]
+    service.renderer.finish(1, "<a>")
+    assert results == []
+    assert [call[1] for call in service.renderer.calls] == ["a", "c"]
+
+    service.renderer.finish(2, "<c>")
+    assert [result.svg for result in results] == ["<c>"]
+    assert service.stats['coalesced'] == 2
+
+
+def test_requests_for_other_keys_queue(service):
+    """Test that different diagrams render one after another with their theme"""
+    results = []
+    service.submit("one", "a", results.append, theme="dark")
+    service.submit("two", "b", results.append)
+    service.renderer.finish(1, "<a>")
+    service.renderer.finish(2, "<b>")
+
+    assert [result.svg for result in results] == ["<a>", "<b>"]
+    assert service.renderer.calls[0][2] == "dark"
+
+
+def test_priority_requests_go_first(service):
+    """Test that a priority request skips the waiting ones"""
+    results = []
+    for key in ("one", "two", "three"):
+        service.submit(key, key, results.append)
+    service.submit("focus", "f", results.append, priority=True)
+    service.renderer.finish(1, "<one>")
+
+    assert [call[1] for call in service.renderer.calls] == ["one", "f"]
+
+
+def test_request_timeout(service, qtbot):
+    """Test that a request that never finishes times out and frees the queue"""
+    results = []
+    service.submit("slow", "a", results.append, timeout=10)
+    service.submit("next", "b", results.append)
+
+    qtbot.waitUntil(lambda: len(results) == 1, timeout=1000)
+    assert "timed out" in results[0].error
+    service.renderer.finish(1, "<late>")
+    service.renderer.finish(2, "<b>")
+    assert [result.svg for result in results] == ["", "<b>"]
+    assert service.stats['timed_out'] == 1
+
+
+def test_large_graphs_get_large_config(service):
+    """Test that large sources are rendered in large-graph mode"""
+    edges = "\n".join(f"    n{i} --> n{i + 1}" for i in range(600))
+    service.submit("big", "graph LR\n" + edges)
+    service.submit("small", "graph LR\n    a --> b")
+    service.renderer.finish(1, "<big>")
+
+    big, small = service.renderer.calls
+    assert big[3]['flowchart']['defaultRenderer'] == 'elk'
+    assert not small[3]
+
+
+def test_only_raster_requests_use_svg_labels(service):
+    """Test that PNG and raster requests get SVG text labels and SVG requests keep HTML labels"""
+    service.submit("svg", "graph LR\n    a --> b")
+    service.renderer.finish(1, "<svg>")
+    service.submit("png", "graph LR\n    a --> b", scale=2)
+    service.renderer.finish(2, "<png>")
+    service.submit("tiles", "graph LR\n    a --> b", raster=True,
+                   config={'flowchart': {'defaultRenderer': 'elk'}})
+
+    svg, png, tiles = [call[3] for call in service.renderer.calls]
+    assert not svg
+    assert png == mermaid_render.RASTER_CONFIG
+    assert tiles['flowchart'] == {'defaultRenderer': 'elk', 'htmlLabels': False}
@@ -0,0 +1,128 @@
+# tests/test_server.py
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+
+import pytest
+
+from pymerdoc.server import RenderServer
+
+
+class FakePool:
+    """Stands in for MermaidRenderPool; blocks while ``gate`` is cleared"""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def render_blocking(self, source, scale=0, background="white", theme=None):
+        self.calls.append((source, scale, theme))
+        self.gate.wait(5)
+        if 'crash' in source:
+            raise RuntimeError('render page crashed')
+        if 'fail' in source:
+            return SimpleNamespace(ok=False, svg='', png=b'', error='render failed')
+        svg = (f'<svg id="diagram1"><style>#diagram1 .node{{fill:#fff}}</style>'
+               f'<g>  {len(self.calls)}  </g></svg>')
+        return SimpleNamespace(ok=True, svg=svg, png=b'\x89PNG', error='')
+
+
+@pytest.fixture
+def server():
+    server = RenderServer(FakePool(), port=0, max_concurrent=1, queue_timeout=0.2)
+    server.start()
+    yield server
+    server.pool.gate.set()
+    server.shutdown()
+
+
+def post(server, path, body):
+    request = urllib.request.Request(server.address + path, data=body.encode(), method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, response.headers['Content-Type'], response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers['Content-Type'], e.read()
+
+
+def test_render_svg_and_cache(server):
+    """Test SVG rendering, caching by structure and syntax errors"""
+    status, content_type, body = post(server, '/render/svg?theme=dark', 'graph TD\n  A --> B')
+    assert status == 200 and content_type == 'image/svg+xml'
+    assert body.startswith(b'<svg')
+    assert server.pool.calls == [('graph TD\n  A --> B', 0, 'dark')]
+
+    # Same structure, different whitespace: served from the cache
+    assert post(server, '/render/svg?theme=dark', 'graph TD\n    A-->B')[2] == body
+    assert len(server.pool.calls) == 1
+
+    status, _, body = post(server, '/render/svg', 'graph TD\n  A -->')
+    assert status == 400 and b'line 2' in body
+    assert post(server, '/render/svg', 'graph TD\n  fail --> B')[0] == 422
+    assert post(server, '/render/png?scale=3', 'graph LR\n  A --> B')[1:] == ('image/png', b'\x89PNG')
+    assert post(server, '/render/png?scale=abc', 'graph LR\n  A --> B')[0] == 400
+    assert post(server, '/render/gif', 'graph LR\n  A --> B')[0] == 404
+
+
+@pytest.mark.parametrize("source", [
+    "graph TD\n  accTitle: Big Title\n  A --> B",
+    "graph TD\n  accDescr {\n    Two\n    lines\n  }\n  A --> B",
+    "graph TD\n  A -->|a|b| B",
+    "classDiagram\n  bar ()-- foo",
+])
+def test_valid_syntax_reaches_the_renderer(server, source):
+    """Test that syntax the gate parser used to reject is rendered, not answered with 400"""
+    assert post(server, '/render/svg', source)[0] == 200
+    assert server.pool.calls[-1][0] == source
+
+
+def test_render_html(server):
+    """Test Markdown rendering with inline diagrams"""
+    markdown = "# Title\n\n```mermaid\ngraph TD\n  A --> B\n```\n\ntext\n"
+    status, content_type, body = post(server, '/render/html?title=Doc', markdown)
+    assert status == 200 and content_type.startswith('text/html')
+    assert b'<title>Doc</title>' in body
+    assert b'<div class="diagram"><svg' in body and b'mermaid.min.js' not in body
+
+
+def test_render_html_ids_are_unique(server):
+    """Test that every inlined diagram gets its own IDs, also when served from the cache"""
+    first, second = "graph TD\n  A --> B", "graph TD\n  C --> D"
+    markdown = "\n\n".join(f"```mermaid\n{source}\n```" for source in (first, second, first))
+    body = post(server, '/render/html', markdown)[2].decode()
+    assert re.findall(r'<svg id="([^"]+)"', body) == ['d1-diagram1', 'd2-diagram1', 'd3-diagram1']
+    assert '#d2-diagram1 .node{fill:#fff}' in body
+    assert len(server.pool.calls) == 2
+
+
+def test_concurrency_limit_and_metrics(server):
+    """Test that requests beyond the limit get a 503 and metrics are reported"""
+    server.pool.gate.clear()
+    first = threading.Thread(target=post, args=(server, '/render/svg', 'graph TD\n  A --> B'))
+    first.start()
+    while not server.pool.calls:
+        time.sleep(0.01)
+    assert post(server, '/render/svg', 'graph TD\n  C --> D')[0] == 503
+    server.pool.gate.set()
+    first.join()
+
+    with urllib.request.urlopen(server.address + '/metrics', timeout=10) as response:
+        text = response.read().decode()
+    assert 'pymerdoc_requests_total{endpoint="/render/svg",status="503"} 1' in text
+    assert 'pymerdoc_request_seconds_bucket{endpoint="/render/svg",le="+Inf"} 2' in text
+    assert 'pymerdoc_rejected_total 1' in text
+
+
+def test_unexpected_errors_answer_500(server):
+    """Test that a crashing render is answered with a 500 and counted"""
+    assert post(server, '/render/svg', 'graph TD\n  crash --> B')[0] == 500
+    status, _, body = post(server, '/render/html', '```mermaid\ngraph TD\n  crash --> B\n```\n')
+    assert status == 500 and b'render page crashed' in body
+
+    with urllib.request.urlopen(server.address + '/metrics', timeout=10) as response:
+        text = response.read().decode()
+    assert 'pymerdoc_requests_total{endpoint="/render/html",status="500"} 1' in text
@@ -0,0 +1,87 @@
+# tests/test_svg_optimizer.py
+import xml.dom.minidom
+
+from pymerdoc.svg_optimizer import format_number, main, minify_css, optimize_svg, prefix_ids
+
+MARKER = ('<marker id="{id}" refX="6" viewBox="0 0 10 10" class="marker">'
+          '<path d="M 0 0 L 10 5 L 0 10 z"></path></marker>')
+
+SVG = f"""<svg viewBox="-8 -8 150.123456 200.987654" xmlns="http://www.w3.org/2000/svg" id="mermaid-1">
+  <style>
+    #mermaid-1 .node rect {{ fill: #ECECFF; stroke: #9370DB; }}
+    #mermaid-1 .node rect {{ fill: #ECECFF; stroke: #9370DB; }}
+  </style>
+  <style>
+    #mermaid-1 .node rect {{ fill: #ECECFF; stroke: #9370DB; }}
+    #mermaid-1 .node rect {{ fill: #ECECFF; stroke: #9370DB; }}
+  </style>
+  {MARKER.format(id="end-a")}
+  {MARKER.format(id="end-b")}
+  <path id="L-A-B" marker-end="url(#end-b)" d="M67.0625,34L67.0625,38.16666666666667"></path>
+  <g id="flowchart-A-0" transform="translate(67.06249809265137, 17)">
+    <text><tspan x="0">Hello  world</tspan> <tspan>again</tspan></text>
+  </g>
+</svg>
+"""
+
+
+def test_optimize_svg():
+    """Test dedupe, rounding, ID stripping and whitespace minification"""
+    result = optimize_svg(SVG)
+    svg = result.svg
+    xml.dom.minidom.parseString(svg)
+
+    assert svg.count("<style>") == 1
+    assert svg.count(".node rect") == 1
+    assert svg.count("<marker") == 1
+    assert 'url(#end-a)' in svg
+    assert 'viewBox="-8 -8 150.12 200.99"' in svg
+    assert 'd="M67.06,34L67.06,38.17"' in svg
+    assert 'translate(67.06, 17)' in svg
+    assert 'id="L-A-B"' not in svg and 'id="flowchart-A-0"' not in svg
+    assert 'id="mermaid-1"' in svg and 'id="end-a"' in svg
+    # Whitespace inside text is kept, indentation between tags is not
+    assert '<tspan x="0">Hello  world</tspan> <tspan>again</tspan>' in svg
+    assert "\n" not in svg
+    assert result.optimized_size < result.original_size
+    assert "% smaller" in result.describe()
+
+
+def test_optimize_svg_options():
+    """Test that precision None and strip_ids False leave numbers and IDs alone"""
+    svg = optimize_svg(SVG, precision=None, strip_ids=False).svg
+    assert "38.16666666666667" in svg
+    assert 'id="flowchart-A-0"' in svg
+
+
+def test_format_number_and_css():
+    """Test number rounding and CSS minification"""
+    assert format_number("1.2000", 2) == "1.2"
+    assert format_number("-0.001", 2) == "0"
+    assert format_number("2.5e-1", 1) == "0.2"
+    assert minify_css("a { b: c; }\n a { b: c; }\n@media x { a { b: c; } }") == \
+        "a{b:c}@media x{a{b:c}}"
+
+
+def test_cli_in_place(tmp_path, capsys):
+    """Test that the CLI rewrites a file and reports the savings"""
+    path = tmp_path / "diagram.svg"
+    path.write_text(SVG, encoding="utf-8")
+    assert main([str(path), "--precision", "1"]) == 0
+    assert 'viewBox="-8 -8 150.1 201"' in path.read_text(encoding="utf-8")
+    assert "smaller" in capsys.readouterr().out
+
+
+def test_prefix_ids():
+    """Test that IDs and the references to them are prefixed"""
+    svg = ('<svg id="m1" aria-labelledby="t1"><title id="t1">x</title>'
+           '<style>#m1 .node{fill:#fff}#m1 .edge{stroke:#333}</style>'
+           f'{MARKER.format(id="end")}<path marker-end="url(#end)"/>'
+           '<use href="#end"/><text>#m1</text></svg>')
+    prefixed = prefix_ids(svg, "d2-")
+    xml.dom.minidom.parseString(prefixed)
+    assert '<svg id="d2-m1" aria-labelledby="d2-t1">' in prefixed
+    assert '#d2-m1 .node{fill:#fff}#d2-m1 .edge{stroke:#333}' in prefixed
+    assert 'id="d2-end"' in prefixed and 'url(#d2-end)' in prefixed
+    assert 'href="#d2-end"' in prefixed and '<text>#m1</text>' in prefixed
+    assert prefix_ids("<svg></svg>", "d2-") == "<svg></svg>"
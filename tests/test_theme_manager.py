@@ -0,0 +1,78 @@
+# tests/test_theme_manager.py
+from PyQt6.QtGui import QPalette
+from PyQt6.QtWidgets import QWidget
+
+from pymerdoc import theme_manager
+from pymerdoc.gm import GifMakerDialog
+from pymerdoc.theme_manager import ThemeManager
+
+
+class CountingSettings:
+    def __init__(self, theme):
+        self.theme = theme
+        self.reads = 0
+
+    def value(self, key, default=None):
+        self.reads += 1
+        return self.theme
+
+    def setValue(self, key, value):
+        self.theme = value
+
+
+class Window(QWidget):
+    def update_preview(self):
+        self.previews = getattr(self, 'previews', 0) + 1
+
+
+def test_settings_read_once(qtbot, monkeypatch):
+    """Test that the saved theme is read from QSettings only once"""
+    monkeypatch.setattr(ThemeManager, '_snapshot', {})
+    settings = CountingSettings(ThemeManager.DARK)
+    window = Window()
+    qtbot.addWidget(window)
+    manager = ThemeManager(window)
+    manager._settings = settings
+
+    assert manager.get_theme() == ThemeManager.DARK
+    assert ThemeManager(None).is_dark()
+    assert settings.reads == 1
+
+    manager.set_theme(ThemeManager.LIGHT)
+    assert settings.theme == ThemeManager.LIGHT
+    assert not ThemeManager(None).is_dark()
+    assert settings.reads == 1
+
+
+def test_apply_theme_uses_palette(qtbot, monkeypatch):
+    """Test that themes set a palette and skip identical stylesheets"""
+    window = Window()
+    qtbot.addWidget(window)
+    manager = ThemeManager(window)
+
+    manager.apply_theme(ThemeManager.DARK)
+    assert window.palette().color(QPalette.ColorRole.Window).name() == "#1e1e1e"
+    assert window.styleSheet() == theme_manager.MAIN_WINDOW_STYLESHEETS["dark"]
+
+    calls = []
+    monkeypatch.setattr(window, 'setStyleSheet', calls.append)
+    manager.apply_theme(ThemeManager.DARK)
+    assert calls == []
+
+    monkeypatch.undo()
+    manager.apply_theme(ThemeManager.SYSTEM)
+    assert window.styleSheet() == ""
+    assert window.previews == 3
+
+
+def test_dialog_stylesheet_shared(qtbot, monkeypatch):
+    """Test that dialogs share one stylesheet and color buttons keep their size"""
+    monkeypatch.setattr(ThemeManager, '_snapshot', {'theme': ThemeManager.DARK})
+    dialog = GifMakerDialog()
+    qtbot.addWidget(dialog)
+    dialog.show()
+
+    assert dialog.styleSheet() == theme_manager.dialog_stylesheet(True)
+    assert dialog.add_button.styleSheet() == ""
+    for button in dialog.color_buttons:
+        assert button.size().width() == 30
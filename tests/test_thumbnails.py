@@ -0,0 +1,79 @@
+# tests/test_thumbnails.py
+import os
+
+from PIL import Image
+
+from pymerdoc.thumbnails import ThumbnailCache, fast_downscale
+
+
+def test_fast_downscale_fits_size():
+    """Test that large images are reduced to fit the target box"""
+    img = Image.new('RGB', (1000, 500))
+    thumb = fast_downscale(img, (64, 64))
+    assert thumb.size[0] <= 64 and thumb.size[1] <= 64
+    assert thumb.size[0] == 64
+
+
+def test_small_image_is_not_upscaled():
+    """Test that images already within the box are left alone"""
+    img = Image.new('RGB', (20, 10))
+    assert fast_downscale(img, (64, 64)).size == (20, 10)
+
+
+def test_palette_images_are_downscaled(tmp_path):
+    """Test that palette images are converted before the fast reduce"""
+    source = tmp_path / "palette.png"
+    Image.new('RGB', (800, 800), 'purple').quantize(16).save(source)
+    with Image.open(source) as img:
+        assert img.mode == 'P'
+        thumb = fast_downscale(img, (64, 64))
+    assert thumb.size == (64, 64) and thumb.mode == 'RGB'
+
+    transparent = Image.new('P', (800, 800), 1)
+    transparent.info['transparency'] = 0
+    assert fast_downscale(transparent, (64, 64)).mode == 'RGBA'
+
+    cache = ThumbnailCache(str(tmp_path / "cache"), size=(32, 32))
+    with Image.open(cache.get(str(source))) as thumb:
+        assert thumb.size == (32, 32)
+
+
+def test_cache_reuses_and_invalidates(tmp_path):
+    """Test that thumbnails are cached and refreshed when the source changes"""
+    source = tmp_path / "frame.png"
+    Image.new('RGB', (300, 300), 'red').save(source)
+    cache = ThumbnailCache(str(tmp_path / "cache"), size=(32, 32))
+
+    first = cache.get(str(source))
+    assert cache.get(str(source)) == first
+    with Image.open(first) as thumb:
+        assert thumb.size == (32, 32)
+
+    Image.new('RGB', (300, 200), 'blue').save(source)
+    os.utime(source, ns=(1, 1))
+    second = cache.get(str(source))
+    assert second != first
+    with Image.open(second) as thumb:
+        assert thumb.size[0] == 32 and thumb.size[1] < 32
+
+
+def test_preview_variants_by_width(tmp_path):
+    """Test that wide images get cached width variants and narrow ones none"""
+    from pymerdoc.thumbnails import PreviewImageCache
+
+    wide = tmp_path / "wide.png"
+    Image.new('RGB', (2000, 1000), 'green').save(wide)
+    narrow = tmp_path / "narrow.png"
+    Image.new('RGB', (200, 100)).save(narrow)
+    cache = PreviewImageCache(str(tmp_path / "cache"))
+
+    variant = cache.get(str(wide), 512)
+    assert cache.get(str(wide), 512) == variant
+    assert cache.get(str(wide), 768) != variant
+    with Image.open(variant) as img:
+        assert img.size == (512, 256)
+    assert cache.get(str(narrow), 512) is None
+
+    member = cache.get_member(str(wide), "assets/wide.png", wide.read_bytes(), 1024)
+    with Image.open(member) as img:
+        assert img.size == (1024, 512)
@@ -0,0 +1,87 @@
+# tests/test_webengine.py
+import os
+
+import pytest
+from PyQt6.QtCore import QObject
+
+webengine = pytest.importorskip("pymerdoc.webengine", exc_type=ImportError)
+LifecycleState = webengine.QWebEnginePage.LifecycleState
+
+
+class FakePage(QObject):
+    """Stands in for a QWebEnginePage with a renderer process"""
+
+    def __init__(self, pid, visible=False):
+        super().__init__()
+        self.pid = pid
+        self.visible = visible
+        self.state = LifecycleState.Active
+
+    def renderProcessPid(self):
+        return 0 if self.state == LifecycleState.Discarded else self.pid
+
+    def isVisible(self):
+        return self.visible
+
+    def lifecycleState(self):
+        return self.state
+
+    def setLifecycleState(self, state):
+        self.state = state
+
+
+def test_chromium_flags():
+    """Test the flags of each process model"""
+    assert webengine.chromium_flags('default') == []
+    assert webengine.chromium_flags('limited', 3) == ["--renderer-process-limit=3"]
+    assert webengine.chromium_flags('single') == ["--single-process"]
+    with pytest.raises(ValueError):
+        webengine.chromium_flags('many')
+
+
+def test_configure_keeps_existing_flags(monkeypatch):
+    """Test that configure appends to the Chromium flags once and reads the environment"""
+    monkeypatch.setenv(webengine.FLAGS_ENV, "--disable-gpu")
+    monkeypatch.setenv(webengine.MODEL_ENV, "single")
+    monkeypatch.setenv(webengine.BUDGET_ENV, "256")
+    monkeypatch.setattr(webengine, "memory_budget_mb", webengine.DEFAULT_MEMORY_BUDGET_MB)
+
+    assert webengine.configure() == ["--single-process"]
+    assert webengine.configure() == []
+    assert os.environ[webengine.FLAGS_ENV] == "--disable-gpu --single-process"
+    assert webengine.memory_budget_mb == 256
+
+
+def test_monitor_discards_idle_pages_over_budget(qapp, monkeypatch):
+    """Test that only hidden, idle, discardable pages are discarded, and only over budget"""
+    sizes = {1: 300 * 1024 * 1024, 2: 200 * 1024 * 1024, 3: 100 * 1024 * 1024}
+    monkeypatch.setattr(webengine, "process_memory", sizes.get)
+    monitor = webengine.RendererMonitor(budget_mb=1024, idle_seconds=0)
+    visible, hidden, offscreen = FakePage(1, visible=True), FakePage(2), FakePage(3)
+    monitor.track(visible)
+    monitor.track(hidden)
+    monitor.track(offscreen, discardable=False)
+    measured = []
+    monitor.measured.connect(lambda total, processes: measured.append((total, processes)))
+
+    monitor.check()
+    assert measured == [(600 * 1024 * 1024, 3)]
+    assert hidden.state == LifecycleState.Active
+
+    monitor.budget_mb = 512
+    monitor.check()
+    assert hidden.state == LifecycleState.Discarded
+    assert visible.state == offscreen.state == LifecycleState.Active
+    assert monitor.discarded == 1
+
+    # Shown again, the page is made active and reloads
+    hidden.visible = True
+    monitor.check()
+    assert hidden.state == LifecycleState.Active
+    assert "MB in 3 processes" in webengine.format_memory(*monitor.measure())
+
+
+def test_process_memory_of_this_process():
+    """Test reading the resident memory of a process"""
+    memory = webengine.process_memory(os.getpid())
+    assert memory is None or memory > 1024 * 1024